@@ -1,39 +1,66 @@
+"""
+Editor de imagens e vídeo da webcam com filtros e adesivos: interface (OpenCV + Tkinter), histórico e
+grafo de edição, pipeline da webcam e linha de comando. O motor de filtros (filtros.py), os adesivos
+(adesivos.py), o modo em lote (lote.py), o processamento de vídeos (video.py), o modo pipe (fluxo.py),
+os vários fluxos simultâneos (multiplos_fluxos.py), as fontes de frames (fontes.py), a fila limitada e o
+gravador de vídeo (gravacao.py) e a instrumentação (instrumentacao.py) ficam em módulos próprios,
+importáveis sem a interface.
+"""
+import argparse
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
-from tkinter import Tk, filedialog, Button, Label
+
+import filtros
+from filtros import (nomes_filtros, pool_frames, FILTROS, CUSTO_NULO, CUSTO_ALTO, MOTORES_SUAVIZACAO,
+                     aplicar_filtro_generico, definir_raio_desfoque, imprimir_avaliacao_suavizacao)
+from adesivos import (adesivos, adesivos_preparados, AssetAdesivo, ColocacaoAdesivo, adesivo_em_escala,
+                      aplicar_adesivo, cabe_no_frame, compor_colocacoes, resolver_adesivo)
+from lote import resolver_cadeia, resolver_formato, processar_lote
+from instrumentacao import MedidorDeEtapas
+from gravacao import FilaLimitada, GravadorDeVideo
+from fontes import abrir_fonte
+from video import processar_video
+from fluxo import resolver_tamanho, processar_fluxo
+from multiplos_fluxos import resolver_fluxo, executar_fluxos
 
 # ---------------------------------------
 # Configurações iniciais e variáveis globais
 # ---------------------------------------
 
-# Carregar adesivos com transparência, cada adesivo é lido com canal alfa (IMREAD_UNCHANGED).
-adesivos = {
-    'oculos': cv2.imread('eyeglasses.png', cv2.IMREAD_UNCHANGED),
-    'chapeu': cv2.imread('hat.png', cv2.IMREAD_UNCHANGED),
-    'estrela': cv2.imread('star.png', cv2.IMREAD_UNCHANGED),
-    'arvore': cv2.imread('arvore.png', cv2.IMREAD_UNCHANGED),
-    'alce': cv2.imread('alce.png', cv2.IMREAD_UNCHANGED),
-    'nascimento': cv2.imread('nascimento.png', cv2.IMREAD_UNCHANGED),
-}
-
-# Verifica se os adesivos foram carregados corretamente.
-for nome, adesivo in adesivos.items():
-    if adesivo is None:  # Se algum adesivo não foi carregado.
-        print(f"Erro ao carregar o adesivo: {nome}")  # Imprime mensagem de erro.
-        exit(1)  # Encerra o programa.
-
 # Declaração de variáveis globais utilizadas em todo o programa.
 indice_adesivo_atual = 0  # Indica qual adesivo está selecionado no momento.
 indice_filtro_atual = 0   # Indica qual filtro está selecionado no momento.
-historico_acao = []       # Lista para armazenar o histórico de ações (para desfazer alterações).
 imagem_original = None    # Armazena a imagem original carregada pelo usuário.
 imagem_com_efeitos = None # Armazena a imagem com filtros ou adesivos aplicados.
 escala_visualizacao = None  # Armazena a escala da imagem para exibição na interface.
 miniaturas = []           # Lista de miniaturas de filtros, para exibição na interface.
 usando_webcam = False     # Indica se o programa está no modo de uso de webcam.
-video_writer = None       # Objeto para gravar vídeos com frames processados.
+gravador_video = None     # Gravador assíncrono (GravadorDeVideo) dos frames processados.
 video_filename = None     # Nome do arquivo de vídeo que será salvo.
 gravando_video = False    # Indica se o programa está gravando um vídeo no momento.
+versao_miniaturas = 0     # Incrementada sempre que alguma miniatura de filtro é substituída.
+miniaturas_adesivos = None  # Adesivos já reduzidos para 80x80, exibidos na área de adesivos.
+adesivos_webcam = []      # Adesivos colocados sobre o vídeo da webcam (ColocacaoAdesivo), em ordem.
+orcamento_miniaturas_ms = 4.0  # Tempo por frame que a thread das miniaturas ao vivo pode gastar (webcam).
+politica_fila = 'manter_ultimo'  # Política das filas do pipeline da webcam ('manter_ultimo' ou 'manter_todos').
+tamanho_fila = 2          # Capacidade de cada fila entre os estágios do pipeline da webcam.
+medidor = MedidorDeEtapas()  # Tempo de cada etapa dos frames; desligado, não mede nada.
+mostrar_hud = False       # Desenha FPS, latência e percentis das etapas sobre o vídeo.
+arquivo_tempos = None     # Onde exportar os tempos medidos ao sair (.json para trace do Chrome ou .csv).
+gravacao_resolucao_total = True  # Grava com o filtro em resolução total mesmo se a prévia estiver reduzida.
+fonte_frames = "0"        # Fonte do modo ao vivo: índice da câmera, vídeo, diretório de imagens ou "sintetico".
+ritmo_fonte = 'tempo_real'  # Fontes de arquivo: no ritmo do FPS ('tempo_real') ou o mais rápido possível ('maximo').
+repetir_fonte = False     # Recomeça vídeos e sequências de imagens quando terminam.
+limite_quadros = None     # Encerra o modo ao vivo depois de tantos frames lidos da fonte.
+exibir_janela = True      # False roda o modo ao vivo sem janela (ex.: para medir vazão em CI).
+fps_fonte = None          # FPS da fonte aberta no modo ao vivo, quando ela entrega os frames nesse ritmo.
 
 # Definição de dimensões para a janela e elementos visuais.
 LARGURA_JANELA = 1366
@@ -43,180 +70,76 @@ ALTURA_FRAME = 432
 ALTURA_ADESIVOS = 100
 ALTURA_BARRA = 100
 ALTURA_BOTOES = 50
+ALTURA_MINIATURA = 80
 
-# Lista com os nomes dos filtros disponíveis.
-nomes_filtros = [
-    "Original",             # Filtro 0: Sem alterações na imagem.
-    "Escala de Cinza",      # Filtro 1: Converte a imagem para preto e branco.
-    "Inversão",             # Filtro 2: Inverte as cores da imagem.
-    "Desfoque",             # Filtro 3: Aplica um desfoque na imagem.
-    "Efeito Tumblr",        # Filtro 4: Aplica um efeito de tonalidade rosa.
-    "Efeito Prism",         # Filtro 5: Aplica um efeito de arco-íris.
-    "Vintage",              # Filtro 6: Aplica uma tonalidade sépia para um estilo retrô.
-    "Silly Face",           # Filtro 7: Aumenta o brilho da imagem.
-    "Kyle+Kendall Slim",    # Filtro 8: Aplica suavização à imagem.
-    "Filtro Kodak",         # Filtro 9: Simula cores mais quentes, estilo filme Kodak.
-    "Efeito Preto e Vermelho"  # Filtro 10: Cria um efeito preto e vermelho.
-]
+# Largura de cada miniatura da barra de filtros: a largura da janela dividida entre todos os filtros.
+LARGURA_MINIATURA = LARGURA_JANELA // len(nomes_filtros)
 
 # ---------------------------------------
 # Funções auxiliares
 # ---------------------------------------
 
-def redimensionar_para_visualizacao(imagem):
+def tamanho_visualizacao(imagem):
     """
-    Redimensiona a imagem para caber no quadro de edição, mantendo a proporção.
+    Calcula (largura, altura) da imagem ajustada ao quadro de edição e atualiza a escala de visualização.
     """
     global escala_visualizacao
-    if imagem is None:  # Caso a imagem seja None, retorna None.
-        return None
     altura, largura = imagem.shape[:2]  # Obtém as dimensões da imagem (altura, largura).
     # Calcula a escala máxima para que a imagem caiba dentro das dimensões do frame.
     escala_visualizacao = min(LARGURA_FRAME / largura, ALTURA_FRAME / altura)
     nova_largura = int(largura * escala_visualizacao)  # Calcula a nova largura.
     nova_altura = int(altura * escala_visualizacao)    # Calcula a nova altura.
-    # Redimensiona a imagem para as novas dimensões.
-    return cv2.resize(imagem, (nova_largura, nova_altura))
+    return nova_largura, nova_altura
 
-def aplicar_adesivo(imagem_fundo, adesivo, x, y):
+def redimensionar_para_visualizacao(imagem, destino=None):
     """
-    Aplica um adesivo na posição especificada (x, y) da imagem.
-    Suporta adesivos com canal alfa para transparência.
+    Redimensiona a imagem para caber no quadro de edição, mantendo a proporção.
+    Se 'destino' for informado (ex.: a região do quadro na janela), a imagem é escrita diretamente nele.
     """
-    altura_adesivo, largura_adesivo = adesivo.shape[:2]  # Obtém as dimensões do adesivo.
-
-    if adesivo.shape[2] == 4:  # Verifica se o adesivo possui canal alfa.
-        azul, verde, vermelho, alfa = cv2.split(adesivo)  # Separa os canais RGBA.
-        adesivo_rgb = cv2.merge((azul, verde, vermelho))  # Junta os canais RGB.
-        mascara = alfa  # Define a máscara como o canal alfa.
-    else:  # Caso o adesivo não tenha canal alfa.
-        adesivo_rgb = adesivo  # Usa o adesivo sem alterações.
-        # Cria uma máscara branca do tamanho do adesivo.
-        mascara = np.ones((altura_adesivo, largura_adesivo), dtype=np.uint8) * 255
-
-    # Verifica se o adesivo está dentro dos limites da imagem.
-    if y + altura_adesivo > imagem_fundo.shape[0] or x + largura_adesivo > imagem_fundo.shape[1]:
-        return  # Não aplica o adesivo se estiver fora dos limites.
-
-    # Seleciona a região na imagem onde o adesivo será aplicado.
-    roi = imagem_fundo[y:y + altura_adesivo, x:x + largura_adesivo]
-    # Remove a área onde o adesivo será aplicado usando a máscara invertida.
-    fundo = cv2.bitwise_and(roi, roi, mask=cv2.bitwise_not(mascara))
-    # Combina a área limpa com o adesivo usando a máscara.
-    sobreposicao = cv2.add(fundo, adesivo_rgb)
-    # Insere o adesivo na imagem.
-    imagem_fundo[y:y + altura_adesivo, x:x + largura_adesivo] = sobreposicao
+    if imagem is None:  # Caso a imagem seja None, retorna None.
+        return None
+    # Redimensiona a imagem para as novas dimensões.
+    return cv2.resize(imagem, tamanho_visualizacao(imagem), dst=destino)
 
 def aplicar_adesivo_webcam(imagem_fundo, adesivo, x, y):
     """
-    Aplica um adesivo na imagem de fundo usada na webcam e mantém os adesivos persistentes.
+    Registra um adesivo na lista de adesivos da webcam, que permanecem fixos enquanto o frame muda.
     """
-    global imagem_com_adesivos
-    altura_adesivo, largura_adesivo = adesivo.shape[:2]  # Obtém as dimensões do adesivo.
-
-    if adesivo.shape[2] == 4:  # Verifica se o adesivo possui canal alfa.
-        azul, verde, vermelho, alfa = cv2.split(adesivo)  # Separa os canais RGBA.
-        adesivo_rgb = cv2.merge((azul, verde, vermelho))  # Junta os canais RGB.
-        mascara = alfa  # Define a máscara como o canal alfa.
-    else:  # Caso o adesivo não tenha canal alfa.
-        adesivo_rgb = adesivo  # Usa o adesivo sem alterações.
-        # Cria uma máscara branca do tamanho do adesivo.
-        mascara = np.ones((altura_adesivo, largura_adesivo), dtype=np.uint8) * 255
+    if not isinstance(adesivo, AssetAdesivo):
+        adesivo = AssetAdesivo(adesivo)
 
     # Verifica se o adesivo está dentro dos limites da imagem.
-    if y + altura_adesivo > imagem_fundo.shape[0] or x + largura_adesivo > imagem_fundo.shape[1]:
+    if not cabe_no_frame(adesivo, x, y, imagem_fundo.shape[1], imagem_fundo.shape[0]):
         return  # Não aplica o adesivo se estiver fora dos limites.
 
-    # Seleciona a região na camada de adesivos onde o adesivo será aplicado.
-    roi = imagem_com_adesivos[y:y + altura_adesivo, x:x + largura_adesivo]
-    # Remove a área onde o adesivo será aplicado usando a máscara invertida.
-    fundo = cv2.bitwise_and(roi, roi, mask=cv2.bitwise_not(mascara))
-    # Combina a área limpa (fundo sem adesivo) com o adesivo usando a máscara.
-    # A função cv2.add realiza a soma pixel a pixel do fundo e do adesivo RGB.
-    sobreposicao = cv2.add(fundo, adesivo_rgb)
+    adesivos_webcam.append(ColocacaoAdesivo(adesivo, x, y))
 
-    # Atualiza a camada de adesivos, substituindo a área correspondente pelo adesivo já combinado.
-    # Isso garante que o adesivo permaneça fixo na imagem, mesmo que o frame mude.
-    imagem_com_adesivos[y:y + altura_adesivo, x:x + largura_adesivo] = sobreposicao
-
-def aplicar_filtro_generico(imagem_base, indice_filtro):
+def compor_camada_adesivos(imagem):
     """
-    Aplica um dos filtros predefinidos na imagem base fornecida.
+    Compõe, na própria imagem, os adesivos colocados na webcam, na ordem em que foram colocados.
+    Só as regiões ocupadas por adesivos são tocadas, então o custo acompanha a área dos adesivos.
     """
-    # Verifica se a imagem base é válida (não é None). Se não for, retorna None.
-    if imagem_base is None:
-        return None
+    return compor_colocacoes(imagem, adesivos_webcam)
 
-    # Aplica o filtro correspondente ao índice especificado.
-    if indice_filtro == 0:  # Filtro Original: Retorna a imagem sem alterações.
-        return imagem_base.copy()
-
-    elif indice_filtro == 1:  # Escala de Cinza: Converte a imagem para tons de cinza.
-        # Primeiro, converte para escala de cinza.
-        filtro = cv2.cvtColor(imagem_base, cv2.COLOR_BGR2GRAY)
-        # Em seguida, converte de volta para RGB para compatibilidade com as outras funções.
-        return cv2.cvtColor(filtro, cv2.COLOR_GRAY2BGR)
-
-    elif indice_filtro == 2:  # Inversão: Inverte as cores da imagem.
-        return cv2.bitwise_not(imagem_base)
-
-    elif indice_filtro == 3:  # Desfoque: Aplica um desfoque Gaussian Blur.
-        # Usa um kernel 15x15 e sigma padrão para suavizar a imagem.
-        return cv2.GaussianBlur(imagem_base, (15, 15), 0)
-
-    elif indice_filtro == 4:  # Efeito Tumblr: Aplica um mapa de cores rosa (COLORMAP_PINK).
-        return cv2.applyColorMap(imagem_base, cv2.COLORMAP_PINK)
-
-    elif indice_filtro == 5:  # Efeito Prism: Aplica um mapa de cores em arco-íris.
-        return cv2.applyColorMap(imagem_base, cv2.COLORMAP_RAINBOW)
-
-    elif indice_filtro == 6:  # Vintage: Aplica um efeito sépia para estilo retrô.
-        # Define a matriz de transformação de cores para o efeito sépia.
-        sepia_filter = np.array([[0.272, 0.534, 0.131],
-                                 [0.349, 0.686, 0.168],
-                                 [0.393, 0.769, 0.189]])
-        # Aplica a transformação de cores usando a matriz definida.
-        imagem_vintage = cv2.transform(imagem_base, sepia_filter)
-        # Clipa os valores para que permaneçam no intervalo de 0 a 255 (valores válidos para pixels).
-        return np.clip(imagem_vintage, 0, 255).astype(np.uint8)
-
-    elif indice_filtro == 7:  # Silly Face: Aumenta o brilho da imagem.
-        # Soma uma constante de 30 a todos os pixels da imagem, aumentando o brilho.
-        return cv2.add(imagem_base, np.full_like(imagem_base, 30))
-
-    elif indice_filtro == 8:  # Kyle+Kendall Slim: Aplica um filtro bilateral para suavização.
-        # Usa filtro bilateral com raio 15 e valores para sigmaColor e sigmaSpace iguais a 80.
-        return cv2.bilateralFilter(imagem_base, 15, 80, 80)
-
-    elif indice_filtro == 9:  # Filtro Kodak: Simula um efeito de cor quente.
-        # Cria uma tabela de look-up para aumentar os valores de intensidade.
-        lookup_table = np.array([min(i + 20, 255) for i in range(256)]).astype("uint8")
-        # Aplica a tabela de look-up à imagem, ajustando os valores.
-        return cv2.LUT(imagem_base, lookup_table)
-
-    elif indice_filtro == 10:  # Efeito Preto e Vermelho.
-        # Converte a imagem para escala de cinza.
-        gray = cv2.cvtColor(imagem_base, cv2.COLOR_BGR2GRAY)
-        # Cria uma imagem em vermelho com base na escala de cinza.
-        red_channel = np.zeros_like(gray)
-        # Combina os canais para criar o efeito preto e vermelho.
-        preto_vermelho = cv2.merge((red_channel, red_channel, gray))
-        return preto_vermelho
-
-    # Caso o índice não corresponda a nenhum filtro, retorna a imagem original.
-    return imagem_base
-
-def salvar_imagem(imagem):
+def escolher_caminho_imagem():
     """
-    Salva a imagem atual na pasta que o usuário desejar.
+    Pergunta ao usuário onde salvar a imagem. Retorna uma string vazia se ele cancelar.
     """
+    from tkinter import Tk, filedialog  # Importado só quando um diálogo é necessário.
+
     # Cria uma janela de diálogo para o usuário selecionar onde salvar a imagem.
     Tk().withdraw()  # Oculta a janela principal do Tkinter.
-    caminho_salvar = filedialog.asksaveasfilename(
+    return filedialog.asksaveasfilename(
         title="Salvar imagem como",  # Define o título da janela.
         defaultextension=".png",     # Extensão padrão do arquivo salvo.
         filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]  # Tipos de arquivos permitidos.
     )
+
+def salvar_imagem(imagem):
+    """
+    Salva a imagem atual na pasta que o usuário desejar.
+    """
+    caminho_salvar = escolher_caminho_imagem()
     # Se o usuário escolheu um local para salvar:
     if caminho_salvar:
         # Salva a imagem no caminho especificado.
@@ -228,7 +151,8 @@ def iniciar_video_writer(frame):
     """
     Inicializa o gravador de vídeo após o usuário escolher o local de salvamento.
     """
-    global video_writer, video_filename, gravando_video
+    global gravador_video, video_filename, gravando_video
+    from tkinter import Tk, filedialog  # Importado só quando um diálogo é necessário.
 
     # Exibe uma janela para o usuário escolher onde salvar o vídeo.
     Tk().withdraw()  # Oculta a janela principal do Tkinter.
@@ -243,77 +167,663 @@ def iniciar_video_writer(frame):
         print("Gravação de vídeo cancelada.")  # Exibe uma mensagem de cancelamento.
         return
 
-    # Define o codec de compressão de vídeo (MP4).
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    # Inicializa o objeto VideoWriter com o codec, FPS, e dimensões do frame.
-    video_writer = cv2.VideoWriter(video_filename, fourcc, 30, (frame.shape[1], frame.shape[0]))
+    # Inicializa o gravador assíncrono com as dimensões do frame. O FPS é o da fonte, se conhecido;
+    # senão é medido pelos frames recebidos.
+    gravador_video = GravadorDeVideo(video_filename, (frame.shape[1], frame.shape[0]), fps=fps_fonte, medidor=medidor,
+                                     compor_adesivos=compor_camada_adesivos)
     gravando_video = True  # Define que a gravação está ativa.
     print(f"Gravação de vídeo iniciada: {video_filename}")  # Mensagem de confirmação.
 
-def salvar_frame_webcam(frame):
+def salvar_frame_webcam(frame, instante=None, indice_filtro=None):
     """
-    Salva o frame atual no gravador de vídeo, se a gravação estiver ativa.
+    Envia o frame atual ao gravador de vídeo, se a gravação estiver ativa.
+    'instante' é o momento em que o frame foi capturado. Se 'indice_filtro' for informado, o frame é
+    o capturado, sem efeitos, e o gravador aplica o filtro e os adesivos em resolução total.
     """
-    global video_writer, gravando_video
-
-    # Verifica se a gravação está ativa e o objeto VideoWriter está inicializado.
-    if gravando_video and video_writer is not None:
-        # Adiciona o frame atual ao vídeo.
-        video_writer.write(frame)
+    gravador = gravador_video
+    # Verifica se a gravação está ativa e o gravador está inicializado.
+    if gravando_video and gravador is not None:
+        # Enfileira o frame; a codificação acontece na thread do gravador.
+        gravador.gravar(frame, instante, indice_filtro)
 
 def finalizar_video_writer():
     """
     Finaliza o gravador de vídeo e salva o arquivo.
     """
-    global video_writer, gravando_video, video_filename
+    global gravador_video, gravando_video, video_filename
 
-    # Verifica se a gravação está ativa e o objeto VideoWriter está inicializado.
-    if gravando_video and video_writer is not None:
-        # Libera o recurso do VideoWriter, finalizando o vídeo.
-        video_writer.release()
-        video_writer = None  # Reseta o objeto para None.
+    # Verifica se a gravação está ativa e o gravador está inicializado.
+    if gravando_video and gravador_video is not None:
+        gravador = gravador_video
+        gravador_video = None  # Reseta o gravador para None antes de esvaziar a fila.
         gravando_video = False  # Define que a gravação não está mais ativa.
+        # Codifica os frames restantes e fecha o arquivo.
+        gravador.finalizar()
         # Mensagem confirmando o local onde o vídeo foi salvo.
-        print(f"Vídeo salvo em: {video_filename}")
+        print(f"Vídeo salvo em: {video_filename} ({gravador.codificados} frames a {gravador.fps or 0:.1f} FPS, "
+              f"{gravador.duplicados} repetidos, {gravador.pulados} pulados, {gravador.descartados} descartados)")
+
+class HistoricoDeEdicao:
+    """
+    Histórico de desfazer/refazer que guarda só os blocos da imagem alterados por cada ação, comprimidos.
+
+    A imagem é dividida em blocos de `tamanho_bloco` pixels. Antes de uma ação, `capturar` copia a região que
+    ela pode alterar; depois, `confirmar` compara essa cópia com a imagem e guarda, comprimidos, apenas os blocos
+    que mudaram, junto com um `estado` opcional (no editor, as operações do grafo de edição antes da ação).
+    Cada entrada contém o conteúdo que os blocos devem receber para voltar ao outro estado: ao
+    desfazer, o conteúdo atual desses blocos é comprimido e vira a entrada de refazer, e vice-versa. Assim uma
+    ação só ocupa memória uma vez, e colocar um adesivo custa alguns kilobytes em vez de uma cópia da imagem.
+    O total guardado nas duas pilhas é limitado a `limite_bytes`; quando passa disso, as entradas mais antigas
+    são descartadas primeiro.
+    """
+    def __init__(self, tamanho_bloco=64, limite_bytes=256 * 1024 * 1024, nivel_compressao=1):
+        self.tamanho_bloco = tamanho_bloco
+        self.limite_bytes = limite_bytes
+        self.nivel_compressao = nivel_compressao
+        self.desfazer_pilha = deque()  # Entradas da mais antiga (esquerda) à mais recente (direita).
+        self.refazer_pilha = []        # Entradas a refazer; a próxima fica no fim da lista.
+        self.uso_bytes = 0
+
+    def limpar(self):
+        """
+        Esquece todas as ações, por exemplo ao carregar outra imagem.
+        """
+        self.desfazer_pilha.clear()
+        self.refazer_pilha.clear()
+        self.uso_bytes = 0
+
+    def _regiao_em_blocos(self, imagem, regiao):
+        """
+        Alinha a região (x0, y0, x1, y1) à grade de blocos e a recorta aos limites da imagem.
+        """
+        altura, largura = imagem.shape[:2]
+        if regiao is None:
+            return 0, 0, largura, altura
+        b = self.tamanho_bloco
+        x0, y0, x1, y1 = regiao
+        x0 = max(0, min(largura, (x0 // b) * b))
+        y0 = max(0, min(altura, (y0 // b) * b))
+        x1 = max(x0, min(largura, -(-x1 // b) * b))
+        y1 = max(y0, min(altura, -(-y1 // b) * b))
+        return x0, y0, x1, y1
+
+    def capturar(self, imagem, regiao=None):
+        """
+        Copia a parte da imagem que a próxima ação pode alterar (toda a imagem se `regiao` for None).
+        O resultado deve ser passado para `confirmar` depois que a ação for aplicada.
+        """
+        x0, y0, x1, y1 = self._regiao_em_blocos(imagem, regiao)
+        return (x0, y0, x1, y1), imagem[y0:y1, x0:x1].copy()
+
+    def _comprimir_blocos(self, imagem, blocos):
+        """
+        Comprime o conteúdo atual de cada bloco (x, y, largura, altura) da imagem.
+        """
+        entrada = []
+        for x, y, w, h in blocos:
+            dados = zlib.compress(np.ascontiguousarray(imagem[y:y + h, x:x + w]).data, self.nivel_compressao)
+            entrada.append((x, y, w, h, dados))
+        return entrada
+
+    def _restaurar_blocos(self, imagem, entrada):
+        """
+        Escreve na imagem o conteúdo guardado em uma entrada.
+        """
+        for x, y, w, h, dados in entrada:
+            bloco = np.frombuffer(zlib.decompress(dados), dtype=imagem.dtype)
+            imagem[y:y + h, x:x + w] = bloco.reshape((h, w) + imagem.shape[2:])
+
+    @staticmethod
+    def _tamanho(entrada):
+        return sum(len(dados) for *_, dados in entrada[1])
+
+    def confirmar(self, imagem, captura, estado=()):
+        """
+        Registra a ação aplicada desde `capturar`, guardando o estado anterior apenas dos blocos alterados
+        e o `estado` que deve ser restaurado ao desfazê-la.
+        Retorna False se a ação não mudou nenhum pixel (nada é registrado).
+        """
+        (x0, y0, x1, y1), antes = captura
+        if antes.size == 0:
+            return False
+        b = self.tamanho_bloco
+        # Marca por bloco se algum pixel mudou; os blocos da borda podem ser menores que b.
+        mudou = np.any(antes != imagem[y0:y1, x0:x1], axis=-1) if antes.ndim == 3 else antes != imagem[y0:y1, x0:x1]
+        linhas = np.add.reduceat(mudou, np.arange(0, y1 - y0, b), axis=0)
+        blocos_alterados = np.add.reduceat(linhas, np.arange(0, x1 - x0, b), axis=1)
+        entrada = []
+        for i, j in zip(*np.nonzero(blocos_alterados)):
+            y, x = int(i) * b, int(j) * b
+            h, w = min(b, y1 - y0 - y), min(b, x1 - x0 - x)
+            dados = zlib.compress(np.ascontiguousarray(antes[y:y + h, x:x + w]).data, self.nivel_compressao)
+            entrada.append((x0 + x, y0 + y, w, h, dados))
+        if not entrada:
+            return False
+        # Uma ação nova invalida tudo o que poderia ser refeito.
+        self.uso_bytes -= sum(self._tamanho(e) for e in self.refazer_pilha)
+        self.refazer_pilha.clear()
+        self.desfazer_pilha.append((estado, entrada))
+        self.uso_bytes += self._tamanho((estado, entrada))
+        self._respeitar_limite()
+        return True
+
+    def _respeitar_limite(self):
+        """
+        Descarta as entradas mais antigas até o uso de memória caber no limite (a mais recente é sempre mantida).
+        """
+        while self.uso_bytes > self.limite_bytes and len(self.desfazer_pilha) + len(self.refazer_pilha) > 1:
+            if self.desfazer_pilha:
+                self.uso_bytes -= self._tamanho(self.desfazer_pilha.popleft())
+            else:
+                # Só restam ações a refazer: a mais distante no futuro é a mais velha em relação ao presente.
+                self.uso_bytes -= self._tamanho(self.refazer_pilha.pop(0))
+
+    def _trocar(self, imagem, estado_atual, origem, destino):
+        """
+        Move uma entrada de uma pilha para a outra, guardando o conteúdo atual dos blocos (e o estado atual)
+        antes de restaurá-los. Retorna o estado guardado na entrada.
+        """
+        estado, blocos = origem.pop()
+        inverso = (estado_atual, self._comprimir_blocos(imagem, [(x, y, w, h) for x, y, w, h, _ in blocos]))
+        self._restaurar_blocos(imagem, blocos)
+        destino.append(inverso)
+        self.uso_bytes += self._tamanho(inverso) - self._tamanho((estado, blocos))
+        self._respeitar_limite()
+        return estado
+
+    def desfazer(self, imagem, estado_atual=()):
+        """
+        Desfaz a última ação sobre a imagem (no lugar) e retorna o estado guardado com ela,
+        ou None se não houver o que desfazer. `estado_atual` é guardado para o refazer.
+        """
+        if not self.desfazer_pilha:
+            return None
+        return self._trocar(imagem, estado_atual, self.desfazer_pilha, self.refazer_pilha)
+
+    def refazer(self, imagem, estado_atual=()):
+        """
+        Refaz a última ação desfeita sobre a imagem (no lugar) e retorna o estado guardado com ela,
+        ou None se não houver o que refazer. `estado_atual` é guardado para o desfazer.
+        """
+        if not self.refazer_pilha:
+            return None
+        return self._trocar(imagem, estado_atual, self.refazer_pilha, self.desfazer_pilha)
+
+# Histórico de ações do modo de edição de imagem.
+historico = HistoricoDeEdicao()
+
+class GrafoDeEdicao:
+    """
+    Descreve a imagem editada, sem destruí-la, como uma sequência de operações aplicadas à imagem original.
+
+    A primeira operação é sempre o filtro, ('filtro', índice); as seguintes são os adesivos colocados, na ordem,
+    ('adesivo', nome, x, y). As operações ficam em uma tupla, que serve como estado guardado no histórico.
+    O resultado de cada prefixo que termina em um filtro é memorizado (cache LRU limitado em bytes): trocar o
+    filtro executa só o nó do filtro, ou nem isso se ele já foi usado, e reaplica por cima os adesivos, que são
+    baratos. Assim escolher um filtro não descarta mais os adesivos já colocados.
+
+    As coordenadas das operações são sempre as da original, mas a edição interativa é avaliada sobre um proxy
+    do tamanho do quadro de visualização (`escala_proxy`), com filtros espaciais e adesivos na mesma escala, de
+    modo que a latência de um clique não depende dos megapixels da foto. A resolução completa só é renderizada
+    na exportação (`renderizar(completa=True)`), sem passar pelo cache.
+    """
+    def __init__(self, original=None, limite_bytes=512 * 1024 * 1024):
+        self.limite_bytes = limite_bytes
+        self.memo = OrderedDict()  # Prefixo de operações -> imagem resultante, do menos ao mais recente.
+        self.uso_bytes = 0
+        self._trava_memo = threading.Lock()  # O cache é consultado pelas threads de renderização.
+        self.redefinir(original)
+
+    def redefinir(self, original):
+        """
+        Começa a edição de uma nova imagem original, sem filtro nem adesivos.
+        """
+        self.original = original
+        self.operacoes = (('filtro', 0),)
+        with self._trava_memo:
+            self.memo.clear()
+            self.uso_bytes = 0
+        self._proxies_reduzidos = {}  # Fator de redução -> proxy reduzido, usado nas prévias.
+        self.proxy, self.escala_proxy = original, 1.0
+        if original is not None:
+            # O proxy tem o tamanho em que a imagem é exibida; imagens menores que o quadro não são ampliadas.
+            altura, largura = original.shape[:2]
+            escala = min(LARGURA_FRAME / largura, ALTURA_FRAME / altura)
+            if escala < 1:
+                tamanho = (max(1, int(largura * escala)), max(1, int(altura * escala)))
+                self.proxy = cv2.resize(original, tamanho, interpolation=cv2.INTER_AREA)
+                self.escala_proxy = escala
+
+    @property
+    def filtro(self):
+        return self.operacoes[0][1]
+
+    def definir_filtro(self, indice_filtro):
+        """
+        Troca o nó do filtro, mantendo os adesivos.
+        """
+        self.operacoes = (('filtro', indice_filtro),) + self.operacoes[1:]
+
+    def adicionar_adesivo(self, nome, x, y):
+        """
+        Acrescenta a colocação de um adesivo (pelo nome em `adesivos_preparados`) nas coordenadas da original.
+        """
+        self.operacoes += (('adesivo', nome, x, y),)
+
+    def posicionar_adesivo(self, operacao, escala=None, forma=None):
+        """
+        Retorna (adesivo, x, y) da colocação de um adesivo na escala indicada (a do proxy, por padrão),
+        ou None se o adesivo não cabe na imagem original. Os limites são verificados na resolução completa,
+        para que o proxy e a exportação concordem sobre quais adesivos aparecem. `forma` é a da imagem
+        reduzida em que o adesivo será aplicado (a do proxy, por padrão).
+        """
+        escala = self.escala_proxy if escala is None else escala
+        _, nome, x, y = operacao
+        adesivo = adesivos_preparados[nome]
+        altura, largura = self.original.shape[:2]
+        if not cabe_no_frame(adesivo, x, y, largura, altura):
+            return None
+        if escala == 1.0:
+            return adesivo, x, y
+        adesivo = adesivo_em_escala(nome, escala)
+        altura, largura = (self.proxy.shape if forma is None else forma)[:2]
+        # O arredondamento da escala não pode empurrar o adesivo para fora do proxy.
+        x = max(0, min(round(x * escala), largura - adesivo.largura))
+        y = max(0, min(round(y * escala), altura - adesivo.altura))
+        return adesivo, x, y
+
+    def _memorizar(self, chave, imagem):
+        copia = imagem.copy()
+        with self._trava_memo:
+            if chave in self.memo:
+                return
+            self.memo[chave] = copia
+            self.uso_bytes += copia.nbytes
+            # Descarta os resultados usados há mais tempo, mantendo sempre o mais recente.
+            while self.uso_bytes > self.limite_bytes and len(self.memo) > 1:
+                self.uso_bytes -= self.memo.popitem(last=False)[1].nbytes
+
+    def memorizado(self, operacoes):
+        """
+        Indica se o resultado de algum prefixo das operações que inclui o filtro já está no cache.
+        """
+        with self._trava_memo:
+            return any(operacoes[:k] in self.memo for k in range(1, len(operacoes) + 1))
+
+    def proxy_reduzido(self, reducao):
+        """
+        Retorna o proxy reduzido pelo fator indicado (calculado uma vez por imagem) e a escala dele.
+        """
+        if reducao not in self._proxies_reduzidos:
+            altura, largura = self.proxy.shape[:2]
+            tamanho = (max(1, largura // reducao), max(1, altura // reducao))
+            self._proxies_reduzidos[reducao] = cv2.resize(self.proxy, tamanho, interpolation=cv2.INTER_AREA)
+        reduzido = self._proxies_reduzidos[reducao]
+        return reduzido, self.escala_proxy * reduzido.shape[1] / self.proxy.shape[1]
+
+    def renderizar(self, destino=None, completa=False, operacoes=None, reducao=1):
+        """
+        Avalia as operações (as atuais, por padrão) e retorna a imagem resultante, escrita em `destino` se for
+        fornecido um buffer com a forma certa. Por padrão renderiza o proxy, a partir do maior prefixo já
+        memorizado; com `completa=True`, renderiza a original inteira sem usar o cache, o que permite
+        exportar em outra thread enquanto a edição continua. `reducao` > 1 renderiza, também sem cache,
+        uma prévia do proxy reduzido por esse fator.
+        """
+        operacoes = self.operacoes if operacoes is None else operacoes
+        if completa:
+            base, escala = self.original, 1.0
+        elif reducao > 1:
+            base, escala = self.proxy_reduzido(reducao)
+        else:
+            base, escala = self.proxy, self.escala_proxy
+        usar_cache = not completa and reducao == 1
+        if destino is None:
+            destino = np.empty_like(base)
+        # Procura o maior prefixo cujo resultado já está no cache.
+        inicio = 0
+        if usar_cache:
+            with self._trava_memo:
+                for k in range(len(operacoes), 0, -1):
+                    memorizado = self.memo.get(operacoes[:k])
+                    if memorizado is not None:
+                        self.memo.move_to_end(operacoes[:k])
+                        np.copyto(destino, memorizado)
+                        inicio = k
+                        break
+        for k in range(inicio, len(operacoes)):
+            operacao = operacoes[k]
+            if operacao[0] == 'filtro':
+                # O filtro não pode escrever sobre a própria entrada.
+                fonte = base if k == 0 else destino.copy()
+                aplicar_filtro_generico(fonte, operacao[1], destino=destino, escala=escala)
+                # Só vale memorizar filtros que fazem algum trabalho.
+                if usar_cache and 0 <= operacao[1] < len(FILTROS) and FILTROS[operacao[1]].custo > CUSTO_NULO:
+                    self._memorizar(operacoes[:k + 1], destino)
+            else:
+                colocacao = self.posicionar_adesivo(operacao, escala, base.shape)
+                if colocacao is not None:
+                    aplicar_adesivo(destino, *colocacao)
+        return destino
+
+# Grafo de edição da imagem aberta no modo de edição de imagem.
+grafo_edicao = GrafoDeEdicao()
+
+class RenderizadorProgressivo:
+    """
+    Renderiza o grafo de edição em threads trabalhadoras, para que filtros caros não congelem a janela.
+
+    Cada pedido recebe uma geração; um pedido novo cancela os anteriores, que param no próximo ponto de
+    verificação e cujos resultados são descartados. Para filtros caros que ainda não estão no cache, uma
+    prévia do proxy reduzido `reducao_previa` vezes é entregue primeiro, e o resultado no tamanho do proxy a
+    substitui quando fica pronto (a resolução completa continua reservada à exportação). Os resultados são
+    recolhidos pelo laço principal com `coletar`, sem bloquear, ou esperados com `aguardar`.
+    """
+    def __init__(self, grafo, trabalhadores=2, reducao_previa=4):
+        self.grafo = grafo
+        self.reducao_previa = reducao_previa
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="renderizacao")
+        self.geracao = 0
+        self.resultados = deque()  # (geração, tipo, imagem), tipo 'previa', 'final' ou 'erro'.
+        self._condicao = threading.Condition()
+
+    def solicitar(self, operacoes):
+        """
+        Pede a renderização das operações, cancelando os pedidos anteriores. Retorna a geração do pedido.
+        """
+        with self._condicao:
+            self.geracao += 1
+            self.resultados.clear()
+            geracao = self.geracao
+        self.executor.submit(self._renderizar, operacoes, geracao)
+        return geracao
+
+    def cancelar(self):
+        """
+        Cancela os pedidos em andamento e descarta os resultados ainda não coletados.
+        """
+        with self._condicao:
+            self.geracao += 1
+            self.resultados.clear()
+            self._condicao.notify_all()
+
+    def _entregar(self, geracao, tipo, imagem):
+        with self._condicao:
+            # Resultados de pedidos cancelados não são entregues.
+            if geracao == self.geracao:
+                self.resultados.append((geracao, tipo, imagem))
+                self._condicao.notify_all()
+
+    def _renderizar(self, operacoes, geracao):
+        try:
+            if geracao != self.geracao:
+                return
+            filtro = operacoes[0][1]
+            caro = 0 <= filtro < len(FILTROS) and FILTROS[filtro].custo >= CUSTO_ALTO
+            if caro and self.reducao_previa > 1 and not self.grafo.memorizado(operacoes):
+                self._entregar(geracao, 'previa', self.grafo.renderizar(operacoes=operacoes, reducao=self.reducao_previa))
+                if geracao != self.geracao:
+                    return
+            self._entregar(geracao, 'final', self.grafo.renderizar(operacoes=operacoes))
+        except Exception as erro:
+            self._entregar(geracao, 'erro', erro)
+
+    def coletar(self):
+        """
+        Retorna, sem bloquear, os resultados do pedido atual entregues desde a última coleta.
+        """
+        with self._condicao:
+            resultados = list(self.resultados)
+            self.resultados.clear()
+        return resultados
+
+    def aguardar(self, timeout=None):
+        """
+        Espera o resultado final (ou erro) do pedido atual e retorna todos os resultados ainda não coletados.
+        """
+        with self._condicao:
+            self._condicao.wait_for(lambda: any(tipo != 'previa' for _, tipo, _ in self.resultados), timeout)
+            resultados = list(self.resultados)
+            self.resultados.clear()
+        return resultados
+
+# Renderizador do grafo de edição e a troca de filtro que ainda espera o resultado final:
+# (operações antes da troca, captura do histórico), ou None.
+renderizador_edicao = RenderizadorProgressivo(grafo_edicao)
+acao_pendente = None
+
+def aplicar_resultados_renderizacao(resultados):
+    """
+    Mostra os resultados entregues pelo renderizador. O resultado final é copiado para a imagem editada
+    e a troca de filtro pendente é registrada no histórico.
+    """
+    global acao_pendente
+    for _, tipo, resultado in resultados:
+        if acao_pendente is None:
+            break
+        estado, captura = acao_pendente
+        if tipo == 'previa':
+            # A prévia reduzida é ampliada só para exibição, até o resultado final chegar.
+            cv2.resize(resultado, imagem_com_efeitos.shape[1::-1], dst=imagem_com_efeitos, interpolation=cv2.INTER_LINEAR)
+        elif tipo == 'final':
+            np.copyto(imagem_com_efeitos, resultado)
+            historico.confirmar(imagem_com_efeitos, captura, estado)
+            acao_pendente = None
+        else:
+            # Falhou: volta a imagem e o grafo ao estado anterior à troca de filtro.
+            print(f"Erro ao aplicar o filtro: {resultado}")
+            np.copyto(imagem_com_efeitos, captura[1])
+            grafo_edicao.operacoes = estado
+            acao_pendente = None
+        atualizar_janela()
+
+def concluir_renderizacao():
+    """
+    Espera a troca de filtro pendente terminar, antes de uma ação que depende da imagem final.
+    """
+    while acao_pendente is not None:
+        aplicar_resultados_renderizacao(renderizador_edicao.aguardar())
+
+# Threads de exportação em resolução completa ainda em andamento.
+exportacoes = []
+
+def exportar_edicao():
+    """
+    Pergunta onde salvar e renderiza a edição atual em resolução completa numa thread separada,
+    para que a interface continue respondendo durante a exportação de fotos grandes.
+    """
+    caminho_salvar = escolher_caminho_imagem()
+    if not caminho_salvar:
+        return
+    # As operações são uma tupla imutável: edições feitas durante a exportação não a afetam.
+    operacoes = grafo_edicao.operacoes
+
+    def exportar():
+        inicio = time.perf_counter()
+        cv2.imwrite(caminho_salvar, grafo_edicao.renderizar(completa=True, operacoes=operacoes))
+        print(f"Imagem salva em {caminho_salvar} ({time.perf_counter() - inicio:.1f} s)")
+
+    exportacoes[:] = [thread for thread in exportacoes if thread.is_alive()]
+    thread = threading.Thread(target=exportar, name="exportacao")
+    thread.start()
+    exportacoes.append(thread)
 
 def desfazer_acao():
     """
     Desfaz a última ação do usuário, caso possível.
     """
-    global imagem_com_efeitos, historico_acao  # Referencia as variáveis globais necessárias.
+    global indice_filtro_atual
+    concluir_renderizacao()
+    # Restaura os blocos alterados pela última ação e as operações do grafo de edição antes dela.
+    estado = historico.desfazer(imagem_com_efeitos, grafo_edicao.operacoes)
+    if estado is not None:
+        grafo_edicao.operacoes = estado
+        indice_filtro_atual = grafo_edicao.filtro
+        atualizar_janela()
 
-    # Verifica se há pelo menos uma ação no histórico além do estado inicial.
-    if len(historico_acao) > 1:
-        # Remove a última ação realizada do histórico.
-        historico_acao.pop()
-        # Define a imagem com efeitos como o estado anterior no histórico.
-        imagem_com_efeitos = historico_acao[-1].copy()
-        # Atualiza a interface para refletir as mudanças após desfazer a ação.
+def refazer_acao():
+    """
+    Refaz a última ação desfeita pelo usuário, caso possível.
+    """
+    global indice_filtro_atual
+    concluir_renderizacao()
+    # Reaplica os blocos da última ação desfeita e as operações do grafo de edição depois dela.
+    estado = historico.refazer(imagem_com_efeitos, grafo_edicao.operacoes)
+    if estado is not None:
+        grafo_edicao.operacoes = estado
+        indice_filtro_atual = grafo_edicao.filtro
         atualizar_janela()
 
-def gerar_miniaturas(imagem):
+# Miniaturas já renderizadas, indexadas por (hash do conteúdo, forma, largura, altura), da mais antiga à mais recente.
+cache_miniaturas = OrderedDict()
+LIMITE_CACHE_MINIATURAS = 8  # Quantidade de conjuntos de miniaturas mantidos no cache.
+
+def renderizar_miniaturas(imagem, largura, altura):
+    """
+    Renderiza as miniaturas de todos os filtros a partir de uma única cópia reduzida da imagem.
+    A conversão para cinza é feita uma vez e compartilhada pelos filtros que dependem só da luminância.
+    """
+    # Reduz a imagem uma única vez para o tamanho da miniatura (INTER_AREA evita serrilhado).
+    reduzida = cv2.resize(imagem, (largura, altura), interpolation=cv2.INTER_AREA)
+    # Escala média entre a miniatura e a imagem original, usada para reduzir os kernels dos filtros espaciais.
+    escala = ((largura / imagem.shape[1]) * (altura / imagem.shape[0])) ** 0.5
+    cinza = cv2.cvtColor(reduzida, cv2.COLOR_BGR2GRAY)
+
+    resultado = []
+    for filtro in FILTROS:
+        if filtro.de_cinza is not None:
+            resultado.append(filtro.de_cinza(cinza, None))
+        else:
+            resultado.append(filtro(reduzida, None, escala))
+    return resultado
+
+def gerar_miniaturas(imagem, largura=None, altura=ALTURA_MINIATURA):
     """
     Gera miniaturas dos filtros disponíveis para exibição na barra de filtros.
+    O resultado fica em cache pelo conteúdo da imagem e pelo tamanho pedido.
     """
-    global miniaturas  # Declara a variável global que armazena as miniaturas dos filtros.
+    global miniaturas, versao_miniaturas  # Declara as variáveis globais das miniaturas dos filtros.
+
+    # Define a largura de cada miniatura com base na largura da janela e no número de filtros.
+    largura = largura or LARGURA_MINIATURA
+    # O CRC-32 do conteúdo identifica a imagem independentemente do objeto que a contém
+    # e é várias vezes mais rápido que um hash criptográfico em fotos de dezenas de megapixels.
+    resumo = zlib.crc32(np.ascontiguousarray(imagem))
+    chave = (resumo, imagem.shape, largura, altura)
+
+    if chave in cache_miniaturas:
+        # Reaproveita as miniaturas já renderizadas e marca a entrada como a mais recente.
+        cache_miniaturas.move_to_end(chave)
+    else:
+        cache_miniaturas[chave] = renderizar_miniaturas(imagem, largura, altura)
+        # Descarta as entradas mais antigas quando o cache passa do limite.
+        while len(cache_miniaturas) > LIMITE_CACHE_MINIATURAS:
+            cache_miniaturas.popitem(last=False)
+    miniaturas = cache_miniaturas[chave]
+    versao_miniaturas += 1
+
+class AtualizadorDeMiniaturas(threading.Thread):
+    """
+    Thread que mantém as miniaturas da barra de filtros atualizadas com os frames ao vivo da webcam.
+    A cada frame recebido renderiza, em rodízio, quantas miniaturas couberem no orçamento de tempo;
+    filtros cujo custo medido excede o orçamento passam a ser atualizados a cada vários frames.
+    """
+
+    def __init__(self, miniaturas_iniciais, orcamento_ms=4.0, largura=None, altura=ALTURA_MINIATURA):
+        super().__init__(daemon=True)
+        self.orcamento_ms = orcamento_ms                 # Tempo máximo de renderização por frame recebido.
+        self.largura = largura or LARGURA_MINIATURA
+        self.altura = altura
+        # Lista própria (não a do cache), cujos itens são substituídos à medida que ficam prontos.
+        self.miniaturas = list(miniaturas_iniciais)
+        self.custos_ms = [0.0] * len(FILTROS)            # Custo médio (média móvel) de cada miniatura.
+        self.intervalos = [1] * len(FILTROS)             # A cada quantos frames cada miniatura é atualizada.
+        self._frames_sem_atualizar = [0] * len(FILTROS)
+        self._proximo = 0                                # Próximo filtro do rodízio.
+        self._frame = None                               # Buffer onde o laço principal copia o frame.
+        self._precisa_frame = True
+        self._frame_pronto = threading.Event()
+        self._parar = threading.Event()
+
+    def enviar_frame(self, frame):
+        """
+        Chamado pelo laço principal a cada frame; só copia o frame quando a thread está livre para usá-lo.
+        """
+        if not self._precisa_frame:
+            return
+        if self._frame is None or self._frame.shape != frame.shape:
+            self._frame = np.empty_like(frame)
+        np.copyto(self._frame, frame)
+        self._precisa_frame = False
+        self._frame_pronto.set()
+
+    def parar(self):
+        """
+        Encerra a thread e aguarda o término do ciclo em andamento.
+        """
+        self._parar.set()
+        self._frame_pronto.set()
+        self.join()
+
+    def run(self):
+        while True:
+            self._frame_pronto.wait()
+            self._frame_pronto.clear()
+            if self._parar.is_set():
+                return
+            self._renderizar_ciclo()
+            self._precisa_frame = True
+
+    def _renderizar_ciclo(self):
+        """
+        Renderiza as miniaturas do rodízio que cabem no orçamento a partir do frame recebido.
+        """
+        global versao_miniaturas
+        inicio = time.perf_counter()
+        reduzida = cv2.resize(self._frame, (self.largura, self.altura), interpolation=cv2.INTER_AREA)
+        escala = ((self.largura / self._frame.shape[1]) * (self.altura / self._frame.shape[0])) ** 0.5
+        cinza = None
+        renderizadas = 0
+
+        for _ in range(len(FILTROS)):
+            indice = self._proximo
+            self._frames_sem_atualizar[indice] += 1
+            # Filtros caros aguardam seu intervalo adaptativo antes de consumir o orçamento de novo.
+            if self._frames_sem_atualizar[indice] < self.intervalos[indice]:
+                self._proximo = (indice + 1) % len(FILTROS)
+                continue
+            # Interrompe o ciclo se esta miniatura não couber no que resta do orçamento (ao menos uma
+            # é renderizada por frame para o rodízio sempre avançar); ele recomeça por ela no próximo frame.
+            gasto_ms = (time.perf_counter() - inicio) * 1000
+            if renderizadas > 0 and gasto_ms + min(self.custos_ms[indice], self.orcamento_ms) > self.orcamento_ms:
+                self._frames_sem_atualizar[indice] -= 1
+                break
+
+            inicio_filtro = time.perf_counter()
+            filtro = FILTROS[indice]
+            if filtro.de_cinza is not None:
+                # A conversão para cinza é compartilhada pelos filtros de luminância do mesmo ciclo.
+                if cinza is None:
+                    cinza = cv2.cvtColor(reduzida, cv2.COLOR_BGR2GRAY)
+                self.miniaturas[indice] = filtro.de_cinza(cinza, None)
+            else:
+                self.miniaturas[indice] = filtro(reduzida, None, escala)
+            custo_ms = (time.perf_counter() - inicio_filtro) * 1000
 
-    # Inicializa a lista de miniaturas como vazia.
-    miniaturas = []
+            # Atualiza a média móvel do custo e o intervalo necessário para respeitar o orçamento.
+            self.custos_ms[indice] = custo_ms if self.custos_ms[indice] == 0 else 0.8 * self.custos_ms[indice] + 0.2 * custo_ms
+            self.intervalos[indice] = max(1, int(np.ceil(self.custos_ms[indice] / self.orcamento_ms)))
+            self._frames_sem_atualizar[indice] = 0
+            self._proximo = (indice + 1) % len(FILTROS)
+            renderizadas += 1
 
-    # Itera sobre o número total de filtros disponíveis.
-    for i in range(len(nomes_filtros)):
-        # Aplica o filtro correspondente ao índice atual na imagem base.
-        filtro_aplicado = aplicar_filtro_generico(imagem, i)
-        # Define a largura de cada miniatura com base na largura da janela e no número de filtros.
-        largura_miniatura = LARGURA_JANELA // len(nomes_filtros)
-        # Redimensiona a imagem filtrada para criar uma miniatura de altura fixa (80 pixels).
-        miniatura = cv2.resize(filtro_aplicado, (largura_miniatura, 80))
-        # Adiciona a miniatura gerada à lista global de miniaturas.
-        miniaturas.append(miniatura)
+        # Avisa o compositor de que a barra de filtros precisa ser redesenhada.
+        if renderizadas:
+            versao_miniaturas += 1
 
-def atualizar_janela():
+def atualizar_janela(quadro=None):
     """
     Atualiza a janela principal do editor, incluindo o frame atual e os elementos visuais.
+    'quadro' é o número do frame da webcam exibido, usado só na instrumentação.
     """
     global imagem_com_efeitos, usando_webcam  # Referencia as variáveis globais necessárias.
 
@@ -321,53 +831,87 @@ def atualizar_janela():
     if imagem_com_efeitos is None:
         return
 
-    # Se estiver usando a webcam e a gravação de vídeo estiver ativa:
-    if usando_webcam and video_writer is not None:
-        # Salva o frame atual no arquivo de vídeo.
-        salvar_frame_webcam(imagem_com_efeitos)
-
-    # Redimensiona a imagem para caber no quadro de edição, mantendo as proporções.
-    visualizacao = redimensionar_para_visualizacao(imagem_com_efeitos)
-    # Define a largura total da janela.
-    largura_total = LARGURA_JANELA
-    # Define a altura total da janela.
-    altura_total = ALTURA_JANELA
-
-    # Cria uma janela em branco (preta) com as dimensões da área de edição.
-    janela = np.zeros((altura_total, largura_total, 3), dtype=np.uint8)
-
-    # Calcula o deslocamento horizontal necessário para centralizar o quadro na janela.
-    x_offset_frame = (largura_total - visualizacao.shape[1]) // 2
-    # Define o deslocamento vertical do quadro, abaixo da área reservada aos adesivos.
-    y_offset_frame = ALTURA_ADESIVOS
-
-    # Preenche a parte superior da janela com as miniaturas dos adesivos.
-    janela[:ALTURA_ADESIVOS] = desenhar_area_adesivos(largura_total)
-    # Insere o frame redimensionado na área central da janela, abaixo dos adesivos.
-    janela[y_offset_frame:y_offset_frame + visualizacao.shape[0], x_offset_frame:x_offset_frame + visualizacao.shape[1]] = visualizacao
-    # Preenche a área abaixo do frame com as miniaturas dos filtros.
-    janela[y_offset_frame + visualizacao.shape[0]:y_offset_frame + visualizacao.shape[0] + ALTURA_BARRA] = desenhar_barra_de_filtros(largura_total)
-    # Desenha os botões "Salvar" e "Desfazer" na parte inferior da janela.
-    desenhar_botoes(janela, largura_total, y_offset_frame + visualizacao.shape[0] + ALTURA_BARRA)
+    # Monta a janela reaproveitando os painéis que não mudaram desde a última atualização.
+    inicio = medidor.inicio()
+    janela = compositor_janela.compor(imagem_com_efeitos)
+    medidor.fim('composicao', inicio, quadro)
+    if mostrar_hud and medidor.ativo:
+        desenhar_hud(janela, compositor_janela.regiao_quadro)
 
     # Exibe a janela do editor atualizada com os elementos visuais montados.
-    cv2.imshow("Editor", janela)
+    if exibir_janela:
+        inicio = medidor.inicio()
+        cv2.imshow("Editor", janela)
+        medidor.fim('imshow', inicio, quadro)
 
-def desenhar_area_adesivos(largura):
+# Linhas do HUD e o instante em que foram calculadas; os percentis são recalculados algumas vezes por segundo.
+_hud = (0.0, [])
+
+def desenhar_hud(janela, regiao):
+    """
+    Escreve FPS, latência e os percentis de cada etapa no canto do quadro de vídeo, que é redesenhado
+    a cada composição; os painéis fixos da janela não são tocados.
+    """
+    global _hud
+    agora = time.perf_counter()
+    if agora - _hud[0] > 0.5:
+        linhas = medidor.linhas_hud()
+        if usando_webcam and controlador_qualidade.ativo:
+            linhas.append(controlador_qualidade.descricao(indice_filtro_atual))
+        _hud = (agora, linhas)
+    linhas = _hud[1]
+    if not linhas:
+        return
+    x, y, largura, altura = regiao
+    altura_linha = 16
+    caixa = janela[y:y + min(altura, altura_linha * len(linhas) + 8), x:x + min(largura, 330)]
+    caixa //= 3  # Escurece o fundo para o texto ficar legível sobre qualquer imagem.
+    for i, linha in enumerate(linhas):
+        cv2.putText(janela, linha, (x + 6, y + altura_linha * (i + 1)), cv2.FONT_HERSHEY_PLAIN, 1.0,
+                    (255, 255, 255), 1, cv2.LINE_AA)
+
+def alternar_hud():
+    """
+    Mostra ou esconde o HUD de desempenho; mostrá-lo liga a instrumentação, se estiver desligada.
+    """
+    global mostrar_hud
+    mostrar_hud = not mostrar_hud
+    if mostrar_hud:
+        medidor.ativo = True
+
+def encerrar_instrumentacao():
+    """
+    Ao sair, imprime os percentis das etapas e exporta os eventos, se a instrumentação estiver ligada.
+    """
+    if not medidor.ativo:
+        return
+    medidor.imprimir_resumo()
+    if arquivo_tempos:
+        medidor.exportar(arquivo_tempos)
+
+def desenhar_area_adesivos(largura, destino=None):
     """
     Cria a área horizontal com as miniaturas dos adesivos disponíveis.
+    Se 'destino' for informado, a área é desenhada diretamente nele.
     """
-    # Cria uma área preta (vazia) com altura fixa para exibir os adesivos.
-    area = np.zeros((ALTURA_ADESIVOS, largura, 3), dtype=np.uint8)
+    # Cria (ou limpa) uma área preta com altura fixa para exibir os adesivos.
+    if destino is None:
+        area = np.zeros((ALTURA_ADESIVOS, largura, 3), dtype=np.uint8)
+    else:
+        area = destino
+        area.fill(0)
     # Define o deslocamento horizontal inicial para posicionar os adesivos.
     x_offset = 10
 
-    # Itera sobre os adesivos carregados, junto com seus índices e nomes.
-    for i, (nome, adesivo) in enumerate(adesivos.items()):
-        # Redimensiona o adesivo para um tamanho fixo de 80x80 pixels.
-        adesivo_redimensionado = cv2.resize(adesivo[:, :, :3], (80, 80))
-        # Insere o adesivo redimensionado na área horizontal, com deslocamento calculado.
-        area[10:90, x_offset:x_offset + 80] = adesivo_redimensionado
+    global miniaturas_adesivos
+    # Os adesivos são reduzidos para 80x80 pixels uma única vez e reaproveitados nas próximas chamadas.
+    if miniaturas_adesivos is None:
+        miniaturas_adesivos = [cv2.resize(adesivo[:, :, :3], (80, 80)) for adesivo in adesivos.values()]
+
+    # Itera sobre as miniaturas dos adesivos, junto com seus índices.
+    for i, miniatura_adesivo in enumerate(miniaturas_adesivos):
+        # Copia o adesivo reduzido para a sua posição na área horizontal.
+        area[10:90, x_offset:x_offset + 80] = miniatura_adesivo
         # Desenha um contorno verde ao redor do adesivo selecionado atualmente.
         if i == indice_adesivo_atual:
             cv2.rectangle(area, (x_offset, 10), (x_offset + 80, 90), (0, 255, 0), 2)
@@ -377,14 +921,19 @@ def desenhar_area_adesivos(largura):
     # Retorna a área preenchida com os adesivos e seus contornos.
     return area
 
-def desenhar_barra_de_filtros(largura):
+def desenhar_barra_de_filtros(largura, destino=None):
     """
     Cria a barra horizontal com as miniaturas dos filtros disponíveis.
+    Se 'destino' for informado, a barra é desenhada diretamente nele.
     """
     global miniaturas  # Referencia a lista global de miniaturas.
 
-    # Cria uma área preta (vazia) com altura fixa para exibir as miniaturas dos filtros.
-    barra = np.zeros((ALTURA_BARRA, largura, 3), dtype=np.uint8)
+    # Cria (ou limpa) uma área preta com altura fixa para exibir as miniaturas dos filtros.
+    if destino is None:
+        barra = np.zeros((ALTURA_BARRA, largura, 3), dtype=np.uint8)
+    else:
+        barra = destino
+        barra.fill(0)
     # Define a largura de cada miniatura com base na largura total da janela e no número de filtros.
     largura_miniatura = largura // len(nomes_filtros)
     # Define o deslocamento horizontal inicial para posicionar as miniaturas dos filtros.
@@ -394,10 +943,13 @@ def desenhar_barra_de_filtros(largura):
     for i, miniatura in enumerate(miniaturas):
         # Verifica se a miniatura está disponível (não é None).
         if miniatura is not None:
-            # Redimensiona a miniatura para a largura calculada, mantendo a altura fixa (80 pixels).
-            miniatura_redimensionada = cv2.resize(miniatura, (largura_miniatura, 80))
-            # Insere a miniatura redimensionada na barra, com deslocamento calculado.
-            barra[10:90, x_offset:x_offset + largura_miniatura] = miniatura_redimensionada
+            regiao = barra[10:90, x_offset:x_offset + largura_miniatura]
+            if miniatura.shape[:2] == regiao.shape[:2]:
+                # Miniaturas já geradas no tamanho da barra são apenas copiadas.
+                regiao[:] = miniatura
+            else:
+                # Redimensiona a miniatura para a largura calculada (altura fixa de 80 pixels) direto na barra.
+                cv2.resize(miniatura, (largura_miniatura, ALTURA_MINIATURA), dst=regiao)
         # Desenha um contorno verde ao redor da miniatura correspondente ao filtro selecionado atualmente.
         if i == indice_filtro_atual:
             cv2.rectangle(barra, (x_offset, 10), (x_offset + largura_miniatura, 90), (0, 255, 0), 2)
@@ -405,6 +957,7 @@ def desenhar_barra_de_filtros(largura):
         x_offset += largura_miniatura
 
     return barra  # Retorna a barra preenchida com miniaturas e contornos.
+
 def desenhar_botoes(janela, largura, y_offset):
     """
     Desenha os botões "Salvar" e "Desfazer" na interface, abaixo da barra de filtros.
@@ -428,17 +981,76 @@ def desenhar_botoes(janela, largura, y_offset):
     cv2.rectangle(janela, (x_desfazer, y_offset), (x_desfazer + botao_largura, y_offset + botao_altura), (200, 200, 200), -1)
     # Adiciona o texto "Desfazer" no centro do botão, com uma fonte simples e cor preta.
     cv2.putText(janela, "Desfazer", (x_desfazer + 35, y_offset + 35), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+
+class CompositorDeJanela:
+    """
+    Compositor em modo retido: mantém a janela do editor montada entre atualizações e só
+    redesenha um painel (adesivos, barra de filtros, botões) quando a seleção ou o conteúdo
+    dele muda. A cada frame, apenas a região do vídeo é copiada para a janela.
+    """
+
+    def __init__(self, largura=LARGURA_JANELA, altura=ALTURA_JANELA):
+        self.largura = largura
+        self.altura = altura
+        self.janela = np.zeros((altura, largura, 3), dtype=np.uint8)  # Janela persistente.
+        self._layout = None         # (largura, altura) do quadro de vídeo na última composição.
+        self._chave_adesivos = None  # Adesivo selecionado quando a área de adesivos foi desenhada.
+        self._chave_filtros = None   # (filtro selecionado, versão das miniaturas) da barra desenhada.
+        self.regiao_quadro = (0, 0, 0, 0)  # Região do quadro de vídeo na última composição.
+
+    def invalidar(self):
+        """
+        Força o redesenho de todos os painéis na próxima composição.
+        """
+        self._layout = self._chave_adesivos = self._chave_filtros = None
+
+    def compor(self, imagem):
+        """
+        Atualiza a janela persistente com a imagem atual e retorna a janela montada.
+        """
+        largura_visualizacao, altura_visualizacao = tamanho_visualizacao(imagem)
+        x_offset_frame = (self.largura - largura_visualizacao) // 2
+        y_offset_frame = ALTURA_ADESIVOS
+        y_barra = y_offset_frame + altura_visualizacao
+
+        if self._layout != (largura_visualizacao, altura_visualizacao):
+            # O tamanho do quadro mudou (nova imagem): limpa a janela e redesenha todos os painéis.
+            self.janela.fill(0)
+            self._chave_adesivos = self._chave_filtros = None
+            desenhar_botoes(self.janela, self.largura, y_barra + ALTURA_BARRA)
+            self._layout = (largura_visualizacao, altura_visualizacao)
+
+        if self._chave_adesivos != indice_adesivo_atual:
+            desenhar_area_adesivos(self.largura, destino=self.janela[:ALTURA_ADESIVOS])
+            self._chave_adesivos = indice_adesivo_atual
+
+        chave_filtros = (indice_filtro_atual, versao_miniaturas)
+        if self._chave_filtros != chave_filtros:
+            desenhar_barra_de_filtros(self.largura, destino=self.janela[y_barra:y_barra + ALTURA_BARRA])
+            self._chave_filtros = chave_filtros
+
+        # Região do quadro de vídeo (x, y, largura, altura), onde o HUD pode ser desenhado.
+        self.regiao_quadro = (x_offset_frame, y_offset_frame, largura_visualizacao, altura_visualizacao)
+        # Único trabalho feito em todo frame: redimensionar o vídeo direto para a sua região da janela.
+        redimensionar_para_visualizacao(imagem, destino=self.janela[y_offset_frame:y_barra, x_offset_frame:x_offset_frame + largura_visualizacao])
+        return self.janela
+
+# Compositor único da janela do editor.
+compositor_janela = CompositorDeJanela()
+
 def callback_mouse(evento, x, y, flags, parametros):
     """
     Lida com cliques do mouse na interface, permitindo interação com adesivos, filtros e botões.
     """
-    global imagem_com_efeitos, imagem_original, imagem_com_adesivos, historico_acao
+    global imagem_com_efeitos, imagem_original, acao_pendente
     global indice_adesivo_atual, indice_filtro_atual, gravando_video  # Declara as variáveis globais necessárias.
 
     # Detecta cliques do botão esquerdo do mouse.
     if evento == cv2.EVENT_LBUTTONDOWN:
-        # Calcula a altura da área de visualização, baseada na imagem redimensionada.
-        visualizacao_altura = redimensionar_para_visualizacao(imagem_com_efeitos).shape[0]
+        # Calcula a altura da área de visualização (sem redimensionar a imagem, só o tamanho).
+        visualizacao_altura = tamanho_visualizacao(imagem_com_efeitos)[1]
+        # Escala entre a imagem original e a janela: no modo de imagem, a imagem exibida já é o proxy.
+        escala_janela = escala_visualizacao if usando_webcam else escala_visualizacao * grafo_edicao.escala_proxy
         # Calcula a posição horizontal inicial do quadro redimensionado.
         x_offset_frame = (LARGURA_JANELA - LARGURA_FRAME) // 2
         # Calcula a posição vertical inicial do quadro redimensionado.
@@ -461,24 +1073,38 @@ def callback_mouse(evento, x, y, flags, parametros):
         # Se o clique ocorrer na área do quadro de edição:
         elif y_offset_frame <= y <= y_offset_frame + visualizacao_altura:
             # Calcula a posição horizontal correspondente na imagem original.
-            x_original = int((x - x_offset_frame) / escala_visualizacao)
+            x_original = int((x - x_offset_frame) / escala_janela)
             # Calcula a posição vertical correspondente na imagem original.
-            y_original = int((y - y_offset_frame) / escala_visualizacao)
+            y_original = int((y - y_offset_frame) / escala_janela)
             # Obtém o adesivo selecionado com base no índice atual.
-            adesivo = list(adesivos.values())[indice_adesivo_atual]
+            nome_adesivo = list(adesivos_preparados)[indice_adesivo_atual]
+            adesivo = adesivos_preparados[nome_adesivo]
 
             # Se estiver usando a webcam:
             if usando_webcam:
-                # Aplica o adesivo à camada de adesivos da webcam.
+                # Registra o adesivo na lista de adesivos colocados sobre a webcam.
                 aplicar_adesivo_webcam(imagem_com_efeitos, adesivo, x_original, y_original)
                 # Se o vídeo ainda não estiver sendo gravado, inicia a gravação.
                 if not gravando_video:
                     iniciar_video_writer(imagem_com_efeitos)
             else:
-                # Adiciona o estado atual da imagem ao histórico antes de aplicar o adesivo.
-                historico_acao.append(imagem_com_efeitos.copy())
-                # Aplica o adesivo diretamente na imagem atual.
-                aplicar_adesivo(imagem_com_efeitos, adesivo, x_original, y_original)
+                # O adesivo é aplicado sobre a imagem final do filtro escolhido.
+                concluir_renderizacao()
+                # Acrescenta o adesivo ao grafo de edição, em coordenadas da original.
+                estado = grafo_edicao.operacoes
+                grafo_edicao.adicionar_adesivo(nome_adesivo, x_original, y_original)
+                colocacao = grafo_edicao.posicionar_adesivo(grafo_edicao.operacoes[-1])
+                # Um adesivo fora da imagem não entra no grafo nem no histórico.
+                if colocacao is None:
+                    grafo_edicao.operacoes = estado
+                else:
+                    # O adesivo é o último nó do grafo, então basta aplicá-lo (na escala do proxy) sobre a imagem
+                    # já renderizada; o histórico guarda só a região que ele cobre.
+                    adesivo_proxy, x_proxy, y_proxy = colocacao
+                    captura = historico.capturar(imagem_com_efeitos, (x_proxy, y_proxy, x_proxy + adesivo_proxy.largura,
+                                                                      y_proxy + adesivo_proxy.altura))
+                    aplicar_adesivo(imagem_com_efeitos, *colocacao)
+                    historico.confirmar(imagem_com_efeitos, captura, estado)
 
             # Atualiza a interface para refletir a aplicação do adesivo.
             atualizar_janela()
@@ -500,9 +1126,13 @@ def callback_mouse(evento, x, y, flags, parametros):
                     if not gravando_video:
                         iniciar_video_writer(imagem_com_efeitos)
                 else:
-                    # Aplica o filtro à imagem original e armazena o estado no histórico.
-                    imagem_com_efeitos = aplicar_filtro_generico(imagem_original, indice_filtro_atual)
-                    historico_acao.append(imagem_com_efeitos.copy())
+                    # Troca o filtro do grafo de edição, mantendo os adesivos, e pede a renderização em segundo
+                    # plano; um pedido ainda em andamento é cancelado. Cliques seguidos em filtros formam uma única
+                    # ação no histórico, que é registrada quando o resultado final chega.
+                    if acao_pendente is None:
+                        acao_pendente = (grafo_edicao.operacoes, historico.capturar(imagem_com_efeitos))
+                    grafo_edicao.definir_filtro(indice_filtro_atual)
+                    renderizador_edicao.solicitar(grafo_edicao.operacoes)
 
                 # Atualiza a interface para refletir a aplicação do filtro.
                 atualizar_janela()
@@ -520,8 +1150,11 @@ def callback_mouse(evento, x, y, flags, parametros):
                 # Se estiver usando a webcam e o vídeo estiver sendo gravado, finaliza a gravação.
                 if usando_webcam and gravando_video:
                     finalizar_video_writer()
+                elif not usando_webcam:
+                    # Exporta a edição em resolução completa, em segundo plano.
+                    exportar_edicao()
                 else:
-                    # Salva a imagem atual.
+                    # Salva o frame atual da webcam.
                     salvar_imagem(imagem_com_efeitos)
             # Se o clique ocorrer no botão "Desfazer":
             elif x_desfazer <= x <= x_desfazer + largura_botoes:
@@ -532,7 +1165,8 @@ def carregar_imagem_e_iniciar():
     """
     Permite ao usuário carregar uma imagem do sistema de arquivos e inicializa o editor para manipulação da imagem.
     """
-    global imagem_original, imagem_com_efeitos, miniaturas, historico_acao  # Declara as variáveis globais necessárias.
+    global imagem_original, imagem_com_efeitos, miniaturas, acao_pendente  # Declara as variáveis globais necessárias.
+    from tkinter import Tk, filedialog  # Importado só quando um diálogo é necessário.
 
     # Esconde a janela principal do Tkinter para não interferir na seleção de arquivos.
     Tk().withdraw()
@@ -554,10 +1188,13 @@ def carregar_imagem_e_iniciar():
         print("Erro ao carregar a imagem.")  # Exibe uma mensagem de erro no console.
         return  # Sai da função sem prosseguir.
 
-    # Cria uma cópia da imagem original para ser usada nas manipulações.
-    imagem_com_efeitos = imagem_original.copy()
-    # Inicializa o histórico de ações com a imagem original.
-    historico_acao = [imagem_com_efeitos.copy()]
+    # Começa um grafo de edição e um histórico de ações vazios para a nova imagem.
+    renderizador_edicao.cancelar()
+    acao_pendente = None
+    grafo_edicao.redefinir(imagem_original)
+    historico.limpar()
+    # A imagem manipulada na interface é o proxy do tamanho da visualização; a original só é usada na exportação.
+    imagem_com_efeitos = grafo_edicao.renderizar()
     # Gera miniaturas dos filtros disponíveis para exibição na interface.
     gerar_miniaturas(imagem_original)
 
@@ -571,23 +1208,271 @@ def carregar_imagem_e_iniciar():
     # Loop principal para manter a interface do editor aberta.
     while True:
         # Aguarda por eventos de teclado.
-        if cv2.waitKey(1) & 0xFF == 27:  # Verifica se a tecla "ESC" foi pressionada.
+        tecla = cv2.waitKey(1) & 0xFF
+        # Mostra as prévias e resultados de filtros que ficaram prontos desde a última volta.
+        aplicar_resultados_renderizacao(renderizador_edicao.coletar())
+        if tecla == 27:  # Verifica se a tecla "ESC" foi pressionada.
+            renderizador_edicao.cancelar()
             cv2.destroyAllWindows()  # Fecha todas as janelas abertas pelo OpenCV.
+            # Espera as exportações em andamento terminarem de gravar os arquivos.
+            if any(thread.is_alive() for thread in exportacoes):
+                print("Aguardando o fim da exportação...")
+            for thread in exportacoes:
+                thread.join()
             exit(0)  # Finaliza completamente o programa.
+        elif tecla in (ord('z'), 26):  # "z" ou Ctrl+Z desfaz a última ação.
+            desfazer_acao()
+        elif tecla in (ord('y'), 25):  # "y" ou Ctrl+Y refaz a última ação desfeita.
+            refazer_acao()
+
+# ---------------------------------------
+# Pipeline da webcam (captura -> processamento -> exibição)
+# ---------------------------------------
+
+class ControladorDeQualidade:
+    """
+    Mantém o processamento da webcam dentro do tempo de um frame no FPS alvo. Mede o tempo de
+    filtro + adesivos de cada frame; se a média passar do orçamento, o filtro selecionado passa a
+    ser processado em uma resolução menor (e ampliado para exibição), e volta a subir de nível quando
+    a estimativa para o nível acima couber com folga. O nível e as contagens de frames seguidos são
+    guardados por filtro, então trocar de filtro não herda a redução nem a contagem de outro. Filtros pontuais não são reduzidos: custam tanto quanto o redimensionamento.
+    """
+
+    NIVEIS = (1.0, 0.75, 0.5, 0.35, 0.25)  # Escalas de processamento, da melhor para a mais barata.
+
+    def __init__(self, fps_alvo=30.0, margem=0.85, folga=0.7, suavizacao=0.2,
+                 frames_para_reduzir=5, frames_para_aumentar=30, espera_maxima=600):
+        self.fps_alvo = fps_alvo            # 0 desliga o controle (sempre resolução total).
+        self.margem = margem                # Fração do tempo de um frame que o processamento pode usar.
+        self.folga = folga                  # Só sobe se a estimativa no nível acima usar até esta fração do orçamento.
+        self.suavizacao = suavizacao        # Peso de cada medição na média móvel exponencial.
+        self.frames_para_reduzir = frames_para_reduzir
+        self.frames_para_aumentar = frames_para_aumentar
+        self.espera_maxima = espera_maxima
+        self.niveis = {}                    # Índice do filtro -> posição em NIVEIS.
+        self._media = {}                    # Índice do filtro -> média do tempo por frame no nível atual (s).
+        self._acima = {}                    # Índice do filtro -> frames seguidos acima do orçamento.
+        self._abaixo = {}                   # Índice do filtro -> frames seguidos com folga para subir.
+        # Frames com folga exigidos antes de subir; dobra quando uma subida tem de ser desfeita logo em seguida.
+        self._espera = {}
+        self._frames_desde_subida = {}
+        self._trava = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self.fps_alvo > 0
+
+    @property
+    def orcamento(self):
+        """
+        Tempo de processamento disponível por frame, em segundos.
+        """
+        return self.margem / self.fps_alvo
+
+    def _reduzivel(self, indice_filtro):
+        return self.ativo and 0 <= indice_filtro < len(FILTROS) and FILTROS[indice_filtro].tipo == 'espacial'
+
+    def escala(self, indice_filtro):
+        """
+        Escala em que o filtro deve ser processado agora (1.0 = resolução total).
+        """
+        if not self._reduzivel(indice_filtro):
+            return 1.0
+        return self.NIVEIS[self.niveis.get(indice_filtro, 0)]
+
+    def registrar(self, indice_filtro, duracao):
+        """
+        Registra o tempo de processamento de um frame e ajusta o nível do filtro, se for o caso.
+        """
+        if not self._reduzivel(indice_filtro):
+            return
+        with self._trava:
+            nivel = self.niveis.get(indice_filtro, 0)
+            media = self._media.get(indice_filtro)
+            media = duracao if media is None else media + self.suavizacao * (duracao - media)
+            self._media[indice_filtro] = media
+            self._frames_desde_subida[indice_filtro] = self._frames_desde_subida.get(indice_filtro, 0) + 1
+            espera = self._espera.get(indice_filtro, self.frames_para_aumentar)
+
+            if media > self.orcamento:
+                self._abaixo[indice_filtro] = 0
+                self._acima[indice_filtro] = self._acima.get(indice_filtro, 0) + 1
+                if self._acima[indice_filtro] >= self.frames_para_reduzir and nivel < len(self.NIVEIS) - 1:
+                    # Uma subida que não se sustentou: espera o dobro antes de tentar de novo.
+                    if self._frames_desde_subida[indice_filtro] < espera:
+                        self._espera[indice_filtro] = min(2 * espera, self.espera_maxima)
+                    self._mudar_nivel(indice_filtro, nivel + 1,
+                                      media * (self.NIVEIS[nivel + 1] / self.NIVEIS[nivel]) ** 2)
+                return
+
+            self._acima[indice_filtro] = 0
+            if nivel == 0:
+                return
+            # O custo dos filtros espaciais cresce pelo menos com a área processada.
+            estimativa = media * (self.NIVEIS[nivel - 1] / self.NIVEIS[nivel]) ** 2
+            if estimativa <= self.folga * self.orcamento:
+                self._abaixo[indice_filtro] = self._abaixo.get(indice_filtro, 0) + 1
+                if self._abaixo[indice_filtro] >= espera:
+                    self._mudar_nivel(indice_filtro, nivel - 1, estimativa)
+                    self._frames_desde_subida[indice_filtro] = 0
+            else:
+                self._abaixo[indice_filtro] = 0
+                # Estável no nível atual: a espera volta ao normal.
+                if self._frames_desde_subida[indice_filtro] >= espera:
+                    self._espera[indice_filtro] = self.frames_para_aumentar
+
+    def _mudar_nivel(self, indice_filtro, nivel, media_estimada):
+        """
+        Troca o nível do filtro; a média recomeça da estimativa para o novo nível.
+        """
+        self.niveis[indice_filtro] = nivel
+        self._media[indice_filtro] = media_estimada
+        self._acima[indice_filtro] = self._abaixo[indice_filtro] = 0
+
+    def descricao(self, indice_filtro):
+        """
+        Texto curto para o HUD com a escala atual e o orçamento por frame.
+        """
+        return f"qualidade {self.escala(indice_filtro):4.0%}  orcamento {self.orcamento * 1000:.1f} ms"
+
+controlador_qualidade = ControladorDeQualidade()
+
+def processar_em_escala(frame, indice_filtro, escala, destino):
+    """
+    Aplica o filtro com o frame reduzido para 'escala' e amplia o resultado para o destino, que tem
+    o tamanho do frame. Em escala 1.0 é o mesmo que aplicar_filtro_generico.
+    """
+    if escala >= 1.0:
+        return aplicar_filtro_generico(frame, indice_filtro, destino=destino)
+    altura, largura = frame.shape[:2]
+    largura_reduzida, altura_reduzida = max(1, round(largura * escala)), max(1, round(altura * escala))
+    reduzido = cv2.resize(frame, (largura_reduzida, altura_reduzida), interpolation=cv2.INTER_AREA,
+                          dst=pool_frames.obter((altura_reduzida, largura_reduzida) + frame.shape[2:]))
+    filtrado = aplicar_filtro_generico(reduzido, indice_filtro, destino=pool_frames.obter(reduzido.shape), escala=escala)
+    cv2.resize(filtrado, (largura, altura), dst=destino, interpolation=cv2.INTER_LINEAR)
+    pool_frames.devolver(reduzido)
+    pool_frames.devolver(filtrado)
+    return destino
+
+class PipelineWebcam:
+    """
+    Pipeline em estágios para o modo webcam: uma thread captura, outra aplica filtro e adesivos,
+    e a thread principal exibe. Os estágios são ligados por filas limitadas, e como o OpenCV libera
+    o GIL a vazão tende à do estágio mais lento em vez da soma de todos.
+    """
+
+    def __init__(self, captura, atualizador_miniaturas=None, politica='manter_ultimo', capacidade=2):
+        self.captura = captura
+        self.atualizador_miniaturas = atualizador_miniaturas
+        # Frames descartados pelas filas voltam ao pool para serem reaproveitados.
+        # Os itens das filas são (frame, instante da captura, número do frame).
+        self.fila_captura = FilaLimitada('captura', capacidade, politica, lambda item: pool_frames.devolver(item[0]))
+        self.fila_exibicao = FilaLimitada('exibicao', capacidade, politica, lambda item: pool_frames.devolver(item[0]))
+        self._parar = threading.Event()
+        self._threads = [threading.Thread(target=self._capturar, daemon=True),
+                         threading.Thread(target=self._processar, daemon=True)]
+
+    def iniciar(self):
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self):
+        """
+        Encerra as threads de captura e processamento.
+        """
+        self._parar.set()
+        self.fila_captura.fechar()
+        self.fila_exibicao.fechar()
+        for thread in self._threads:
+            thread.join()
+
+    def metricas(self):
+        """
+        Retorna as métricas das filas entre os estágios.
+        """
+        return [self.fila_captura.metricas(), self.fila_exibicao.metricas()]
+
+    def _capturar(self):
+        """
+        Estágio de captura: lê frames da câmera para buffers do pool.
+        """
+        forma = None
+        numero = 0
+        while not self._parar.is_set():
+            buffer = pool_frames.obter(forma) if forma else None
+            inicio = medidor.inicio()
+            ret, frame = self.captura.read(buffer)
+            if not ret:
+                pool_frames.devolver(buffer)
+                break
+            medidor.fim('captura', inicio, numero)
+            forma = frame.shape
+            if not self.fila_captura.colocar((frame, time.perf_counter(), numero)):
+                break
+            numero += 1
+        self.fila_captura.fechar()
+
+    def _processar(self):
+        """
+        Estágio de processamento: aplica o filtro selecionado e os adesivos colocados e envia
+        o resultado ao gravador, de forma que todo frame processado é gravado uma única vez.
+        """
+        while True:
+            item = self.fila_captura.obter()
+            if item is None:
+                break
+            frame, instante, numero = item
+            indice_filtro = indice_filtro_atual
+            # A escala vem do controle de qualidade; os adesivos são compostos depois, já em resolução total.
+            escala = controlador_qualidade.escala(indice_filtro)
+            inicio = time.perf_counter()
+            processado = processar_em_escala(frame, indice_filtro, escala, pool_frames.obter(frame.shape))
+            filtrado = time.perf_counter()
+            compor_camada_adesivos(processado)
+            fim = time.perf_counter()
+            medidor.registrar('filtro', inicio, filtrado - inicio, numero)
+            medidor.registrar('adesivos', filtrado, fim - filtrado, numero)
+            controlador_qualidade.registrar(indice_filtro, fim - inicio)
+            # Entrega o frame capturado à thread das miniaturas (não bloqueia se ela estiver ocupada).
+            if self.atualizador_miniaturas is not None:
+                self.atualizador_miniaturas.enviar_frame(frame)
+            # Salva o frame no arquivo de vídeo, se a gravação estiver ativa. Com a prévia reduzida, o
+            # gravador recebe o frame capturado e aplica o filtro em resolução total na própria thread,
+            # enquanto der conta do ritmo da captura.
+            inicio = medidor.inicio()
+            gravador = gravador_video
+            if (escala < 1.0 and gravacao_resolucao_total and gravador is not None
+                    and gravador.acompanha_resolucao_total()):
+                salvar_frame_webcam(frame, instante, indice_filtro)
+            else:
+                salvar_frame_webcam(processado, instante)
+            medidor.fim('gravacao', inicio, numero)
+            pool_frames.devolver(frame)
+            if not self.fila_exibicao.colocar((processado, instante, numero)):
+                break
+        self.fila_exibicao.fechar()
 
 def inicializar_webcam():
     """
     Inicializa a webcam para captura de vídeo em tempo real, permitindo a aplicação de filtros e adesivos.
+    A fonte dos frames (câmera, vídeo, sequência de imagens ou frames sintéticos) vem de 'fonte_frames'.
     """
-    global usando_webcam, imagem_com_efeitos, imagem_com_adesivos, miniaturas  # Declara as variáveis globais necessárias.
+    global usando_webcam, imagem_com_efeitos, miniaturas, fps_fonte  # Declara as variáveis globais necessárias.
 
     usando_webcam = True  # Define que o programa está no modo de uso da webcam.
-    # Tenta abrir a webcam para captura de vídeo.
-    captura = cv2.VideoCapture(0)
-    # Verifica se a webcam foi aberta com sucesso.
+    # Tenta abrir a fonte de frames (por padrão, a webcam).
+    try:
+        captura = abrir_fonte(fonte_frames, ritmo_fonte == 'tempo_real', repetir_fonte, limite_quadros)
+    except ValueError as erro:
+        print(erro)
+        return
+    # Verifica se a fonte foi aberta com sucesso.
     if not captura.isOpened():
-        print("Erro ao acessar a webcam.")  # Exibe uma mensagem de erro no console.
+        print(f"Erro ao acessar a fonte de frames: {fonte_frames}")  # Exibe uma mensagem de erro no console.
         return  # Sai da função sem prosseguir.
+    # Câmeras e fontes em tempo real entregam os frames no FPS informado, que o gravador usa. No ritmo
+    # máximo os frames chegam mais rápido que isso, então o gravador mede o FPS pelos frames recebidos.
+    fps_fonte = captura.fps_entrega
 
     # Captura um frame inicial da webcam para configurar a interface.
     ret, frame = captura.read()
@@ -596,45 +1481,161 @@ def inicializar_webcam():
         print("Erro ao capturar o frame inicial.")  # Exibe uma mensagem de erro no console.
         return  # Sai da função sem prosseguir.
 
-    # Inicializa uma camada vazia para armazenar adesivos aplicados na webcam.
-    imagem_com_adesivos = np.zeros_like(frame)
+    # Começa sem nenhum adesivo colocado sobre o vídeo.
+    adesivos_webcam.clear()
     # Gera miniaturas dos filtros disponíveis com base no frame inicial capturado.
     gerar_miniaturas(frame)
-
-    # Cria uma janela OpenCV chamada "Editor" para exibir a interface do editor.
-    cv2.namedWindow("Editor")
-    # Associa a função de callback do mouse à janela do editor para capturar interações do usuário.
-    cv2.setMouseCallback("Editor", callback_mouse)
-
-    # Loop principal para processar frames da webcam em tempo real.
-    while True:
-        # Captura um novo frame da webcam.
-        ret, frame = captura.read()
-        # Se a captura falhar, sai do loop.
-        if not ret:
-            break
-
-        # Aplica o filtro selecionado ao frame capturado.
-        frame_com_filtro = aplicar_filtro_generico(frame, indice_filtro_atual)
-        # Combina o frame com filtro com a camada de adesivos.
-        imagem_com_efeitos = cv2.add(frame_com_filtro, imagem_com_adesivos)
-
-        # Salva o frame processado no arquivo de vídeo, se a gravação estiver ativa.
-        salvar_frame_webcam(imagem_com_efeitos)
-        # Atualiza a interface para exibir o frame processado.
-        atualizar_janela()
-
-        # Verifica se a tecla "ESC" foi pressionada para sair.
-        if cv2.waitKey(1) & 0xFF == 27:  # 27 é o código ASCII para "ESC".
-            captura.release()  # Libera a webcam.
-            finalizar_video_writer()  # Finaliza o arquivo de vídeo, se estiver sendo gravado.
-            cv2.destroyAllWindows()  # Fecha todas as janelas abertas pelo OpenCV.
-            exit(0)  # Finaliza completamente o programa.
+    # A partir daí, as miniaturas são renovadas com os frames ao vivo por uma thread em segundo plano.
+    atualizador_miniaturas = AtualizadorDeMiniaturas(miniaturas, orcamento_miniaturas_ms)
+    miniaturas = atualizador_miniaturas.miniaturas
+    atualizador_miniaturas.start()
+
+    if exibir_janela:
+        # Cria uma janela OpenCV chamada "Editor" para exibir a interface do editor.
+        cv2.namedWindow("Editor")
+        # Associa a função de callback do mouse à janela do editor para capturar interações do usuário.
+        cv2.setMouseCallback("Editor", callback_mouse)
+
+    # Captura e processamento rodam em threads próprias; esta thread só exibe os frames prontos.
+    pipeline = PipelineWebcam(captura, atualizador_miniaturas, politica_fila, tamanho_fila)
+    pipeline.iniciar()
+    frame_exibido = None
+    ultima_exibicao = None
+    exibidos = 0
+    inicio_exibicao = time.perf_counter()
+
+    # Loop principal para exibir os frames da webcam em tempo real.
+    try:
+        while True:
+            # Aguarda o próximo frame processado, sem deixar a interface parada se ele demorar.
+            item = pipeline.fila_exibicao.obter(timeout=0.05)
+            if item is not None:
+                processado, instante, numero = item
+                imagem_com_efeitos = processado
+                # O frame exibido anteriormente volta ao pool para ser reaproveitado pela captura.
+                pool_frames.devolver(frame_exibido)
+                frame_exibido = processado
+                # Atualiza a interface para exibir o frame processado.
+                atualizar_janela(numero)
+                exibidos += 1
+                # Latência da captura até a exibição e intervalo entre frames exibidos (de onde vem o FPS).
+                if medidor.ativo:
+                    agora = time.perf_counter()
+                    medidor.registrar('latencia', instante, agora - instante, numero)
+                    if ultima_exibicao is not None:
+                        medidor.registrar('intervalo', ultima_exibicao, agora - ultima_exibicao, numero)
+                    ultima_exibicao = agora
+            elif pipeline.fila_exibicao.encerrada:
+                # A fonte terminou (fim do vídeo, limite de frames) ou a captura falhou.
+                break
+
+            if not exibir_janela:
+                continue
+            # Verifica se a tecla "ESC" foi pressionada para sair.
+            inicio = medidor.inicio()
+            tecla = cv2.waitKey(1) & 0xFF
+            medidor.fim('waitKey', inicio)
+            if tecla == ord('h'):
+                alternar_hud()
+            elif tecla == 27:  # 27 é o código ASCII para "ESC".
+                break
+    except KeyboardInterrupt:
+        pass  # Sem janela, Ctrl+C encerra o modo ao vivo normalmente.
+
+    duracao = time.perf_counter() - inicio_exibicao
+    pipeline.parar()  # Encerra as threads de captura e processamento.
+    captura.release()  # Libera a webcam.
+    atualizador_miniaturas.parar()  # Encerra a thread das miniaturas.
+    # Exibe a ocupação das filas entre os estágios, útil para achar o estágio mais lento.
+    for metricas in pipeline.metricas():
+        print(metricas)
+    print(f"{exibidos} frames exibidos em {duracao:.2f} s ({exibidos / duracao if duracao > 0 else 0:.1f} FPS)")
+    finalizar_video_writer()  # Finaliza o arquivo de vídeo, se estiver sendo gravado.
+    encerrar_instrumentacao()
+    if exibir_janela:
+        cv2.destroyAllWindows()  # Fecha todas as janelas abertas pelo OpenCV.
+
+def interpretar_argumentos(argumentos=None):
+    """
+    Interpreta os argumentos de linha de comando. Sem argumentos, o programa abre a interface gráfica.
+    """
+    parser = argparse.ArgumentParser(description="Editor de imagens com filtros e adesivos.")
+    parser.add_argument("--lote", nargs="+", metavar="ENTRADA",
+                        help="diretórios, arquivos ou padrões glob a processar sem interface gráfica")
+    parser.add_argument("--video", nargs=2, metavar=("ENTRADA", "SAIDA"),
+                        help="processa um arquivo de vídeo sem interface gráfica, em blocos paralelos, com os "
+                             "filtros de --filtro e os adesivos de --adesivo")
+    parser.add_argument("--fluxo", metavar="LARGxALT",
+                        help="lê frames rawvideo BGR24 deste tamanho da entrada padrão e escreve os frames "
+                             "filtrados na saída padrão, para uso entre comandos do ffmpeg")
+    parser.add_argument("--multiplos", nargs="+", metavar="FLUXO",
+                        help="processa várias fontes ao mesmo tempo, sem interface; cada fluxo é "
+                             "FONTE[;filtro=N][;adesivo=nome:x:y[:escala]][;saida=arq.mp4], ex.: "
+                             "\"0;filtro=8;saida=cam.mp4\" \"sintetico:640x480@30;filtro=Desfoque\"")
+    parser.add_argument("--adesivo", action="append", default=[], metavar="NOME:X:Y[:ESCALA]",
+                        help="adesivo fixo aplicado a todos os frames nos modos --video e --fluxo (pode ser repetido)")
+    parser.add_argument("--quadros-por-bloco", type=int, default=300, metavar="N",
+                        help="frames em cada bloco processado em paralelo no modo --video (padrão: 300)")
+    parser.add_argument("--recomecar", action="store_true",
+                        help="no modo --video, ignora os blocos prontos de uma execução interrompida")
+    parser.add_argument("--filtro", default="0",
+                        help="índice ou nome do filtro aplicado no modo em lote; vários filtros separados "
+                             "por vírgula formam uma cadeia, ex.: 9,6,7 (padrão: 0). Com --fonte, o primeiro "
+                             "é o filtro inicial do modo ao vivo")
+    parser.add_argument("--saida", default="saida", help="diretório onde as imagens processadas são salvas")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="número de processos trabalhadores (padrão: número de núcleos)")
+    parser.add_argument("--threads-opencv", type=int, default=1,
+                        help="threads internas do OpenCV por processo (padrão: 1)")
+    parser.add_argument("--formato", default=None,
+                        help="extensão das imagens de saída, ex.: jpg (padrão: a mesma da entrada)")
+    parser.add_argument("--orcamento-miniaturas", type=float, default=orcamento_miniaturas_ms, metavar="MS",
+                        help="tempo por frame gasto atualizando as miniaturas ao vivo no modo webcam (padrão: 4 ms)")
+    parser.add_argument("--politica-fila", choices=("manter_ultimo", "manter_todos"), default=politica_fila,
+                        help="no modo webcam, descartar frames antigos quando um estágio atrasa ou manter todos")
+    parser.add_argument("--tamanho-fila", type=int, default=tamanho_fila,
+                        help="capacidade das filas entre os estágios do modo webcam (padrão: 2)")
+    parser.add_argument("--motor-suavizacao", choices=tuple(MOTORES_SUAVIZACAO), default=filtros.motor_suavizacao,
+                        help="motor do filtro Kyle+Kendall Slim: bilateral exato, bilateral na imagem reduzida "
+                             "ou filtro guiado (padrão: exato)")
+    parser.add_argument("--avaliar-suavizacao", nargs="+", metavar="IMAGEM",
+                        help="mede o tempo e a PSNR de cada motor de suavização nas imagens e sai")
+    parser.add_argument("--raio-desfoque", type=int, default=filtros.raio_desfoque, metavar="PIXELS",
+                        help="raio do filtro Desfoque; raios grandes usam automaticamente caixas ou pirâmide, "
+                             "conforme o que for mais rápido neste computador (padrão: 7, kernel 15x15)")
+    parser.add_argument("--fps-alvo", type=float, default=controlador_qualidade.fps_alvo,
+                        help="FPS que a webcam tenta manter reduzindo a resolução de processamento "
+                             f"dos filtros pesados; 0 desliga (padrão: {controlador_qualidade.fps_alvo:g})")
+    parser.add_argument("--gravacao", choices=("total", "previa"), default="total",
+                        help="'total' grava com o filtro em resolução total mesmo com a prévia reduzida; "
+                             "'previa' grava os frames exibidos (padrão: total)")
+    parser.add_argument("--fonte", default=None,
+                        help="abre direto o modo ao vivo com esta fonte: índice da câmera (0), arquivo de vídeo, "
+                             "diretório de imagens ou sintetico[:LARGxALT[@FPS]]")
+    parser.add_argument("--ritmo", choices=("tempo_real", "maximo"), default=ritmo_fonte,
+                        help="vídeos, imagens e frames sintéticos no ritmo do FPS ou o mais rápido possível; "
+                             "para medir vazão sem perder frames, use com --politica-fila manter_todos")
+    parser.add_argument("--repetir", action="store_true", help="recomeça vídeos e sequências de imagens ao terminar")
+    parser.add_argument("--quadros", type=int, default=None, metavar="N",
+                        help="encerra o modo ao vivo depois de N frames lidos da fonte")
+    parser.add_argument("--sem-janela", action="store_true",
+                        help="roda o modo ao vivo sem abrir janelas (termina no fim da fonte ou com Ctrl+C)")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help="mede o tempo de cada etapa dos frames e imprime os percentis ao sair")
+    parser.add_argument("--hud", action="store_true",
+                        help="mostra FPS, latência e tempos das etapas sobre o vídeo (tecla h alterna)")
+    parser.add_argument("--exportar-tempos", metavar="ARQUIVO",
+                        help="ao sair, exporta os tempos medidos como trace do Chrome (.json) ou CSV (.csv)")
+    parser.add_argument("--limite-historico", type=float, default=historico.limite_bytes / 2 ** 20, metavar="MB",
+                        help="memória máxima usada pelo histórico de desfazer/refazer (padrão: 256 MB)")
+    return parser.parse_args(argumentos)
 
 def escolher_modo():
     """
     Exibe uma interface gráfica inicial para o usuário escolher entre carregar uma imagem ou usar a webcam.
     """
+    from tkinter import Tk, Button, Label  # Importado só quando a interface gráfica é aberta.
+
     # Cria uma janela do Tkinter para a seleção do modo.
     root = Tk()
     root.title("Escolha o Modo")  # Define o título da janela.
@@ -660,6 +1661,93 @@ def main():
     Ponto de entrada do programa principal.
     Essa função é responsável por iniciar o programa e exibir a interface inicial ao usuário.
     """
+    global orcamento_miniaturas_ms, politica_fila, tamanho_fila, mostrar_hud, arquivo_tempos
+    global gravacao_resolucao_total, indice_filtro_atual, fonte_frames, ritmo_fonte, repetir_fonte, limite_quadros, exibir_janela
+    argumentos = interpretar_argumentos()
+    if argumentos.fonte is not None:
+        fonte_frames = argumentos.fonte
+    ritmo_fonte = argumentos.ritmo
+    repetir_fonte = argumentos.repetir
+    limite_quadros = argumentos.quadros
+    exibir_janela = not argumentos.sem_janela
+    controlador_qualidade.fps_alvo = argumentos.fps_alvo
+    gravacao_resolucao_total = argumentos.gravacao == "total"
+    medidor.ativo = argumentos.instrumentar or argumentos.hud or bool(argumentos.exportar_tempos)
+    mostrar_hud = argumentos.hud
+    arquivo_tempos = argumentos.exportar_tempos
+    filtros.motor_suavizacao = argumentos.motor_suavizacao
+    definir_raio_desfoque(argumentos.raio_desfoque)
+    orcamento_miniaturas_ms = argumentos.orcamento_miniaturas
+    politica_fila = argumentos.politica_fila
+    tamanho_fila = argumentos.tamanho_fila
+    historico.limite_bytes = int(argumentos.limite_historico * 2 ** 20)
+    if argumentos.avaliar_suavizacao:
+        imprimir_avaliacao_suavizacao(argumentos.avaliar_suavizacao)
+        return
+    # Com --lote, processa as imagens sem abrir nenhuma janela.
+    if argumentos.lote:
+        try:
+            cadeia = resolver_cadeia(argumentos.filtro)
+            formato = resolver_formato(argumentos.formato)
+        except ValueError as erro:
+            print(erro)
+            exit(1)
+        processar_lote(argumentos.lote, cadeia, argumentos.saida, argumentos.processos,
+                       argumentos.threads_opencv, formato)
+        return
+    # Com --fluxo, filtra frames brutos da entrada para a saída padrão; mensagens vão para a saída de erro.
+    if argumentos.fluxo:
+        try:
+            largura, altura = resolver_tamanho(argumentos.fluxo)
+            cadeia = resolver_cadeia(argumentos.filtro)
+            colocacoes = [resolver_adesivo(texto) for texto in argumentos.adesivo]
+        except ValueError as erro:
+            print(erro, file=sys.stderr)
+            exit(1)
+        if not processar_fluxo(largura, altura, cadeia, colocacoes):
+            exit(1)
+        return
+    # Com --multiplos, roda um pipeline de webcam por fonte, distribuídos entre processos.
+    if argumentos.multiplos:
+        try:
+            estados = [resolver_fluxo(texto) for texto in argumentos.multiplos]
+        except ValueError as erro:
+            print(erro)
+            exit(1)
+        if executar_fluxos(estados, argumentos.processos, tamanho_fila + 2, argumentos.ritmo == 'tempo_real',
+                           argumentos.repetir, argumentos.quadros, argumentos.threads_opencv) is None:
+            exit(1)
+        return
+    # Com --video, processa o arquivo em blocos paralelos, também sem janelas.
+    if argumentos.video:
+        try:
+            cadeia = resolver_cadeia(argumentos.filtro)
+            colocacoes = [resolver_adesivo(texto) for texto in argumentos.adesivo]
+        except ValueError as erro:
+            print(erro)
+            exit(1)
+        entrada, saida = argumentos.video
+        if not processar_video(entrada, saida, cadeia, colocacoes, argumentos.processos, argumentos.threads_opencv,
+                               argumentos.quadros_por_bloco, recomecar=argumentos.recomecar):
+            exit(1)
+        return
+    # A interface precisa dos adesivos: sem eles, o programa não abre.
+    try:
+        len(adesivos_preparados)
+    except FileNotFoundError as erro:
+        print(erro)
+        exit(1)
+    # Com uma fonte de frames escolhida (ou sem janela), vai direto para o modo ao vivo.
+    if argumentos.fonte is not None or not exibir_janela:
+        try:
+            cadeia = resolver_cadeia(argumentos.filtro)
+        except ValueError as erro:
+            print(erro)
+            exit(1)
+        if cadeia:
+            indice_filtro_atual = cadeia[0]
+        inicializar_webcam()
+        return
     escolher_modo()  # Invoca a função que exibe a interface para o usuário escolher entre carregar uma imagem ou usar a webcam.
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+"""
+Adesivos do editor: carregamento dos PNGs com transparência, pré-processamento para a composição alfa
+e aplicação sobre imagens. Os arquivos são lidos só quando algum adesivo é usado pela primeira vez,
+a partir do diretório deste módulo, e não do diretório de trabalho.
+"""
+import os
+from collections.abc import Mapping
+
+import cv2
+import numpy as np
+
+# Diretório onde estão os arquivos dos adesivos (o mesmo deste módulo).
+DIRETORIO_ADESIVOS = os.path.dirname(os.path.abspath(__file__))
+
+# Arquivo de cada adesivo, na ordem em que aparecem na interface.
+ARQUIVOS_ADESIVOS = {
+    'oculos': 'eyeglasses.png',
+    'chapeu': 'hat.png',
+    'estrela': 'star.png',
+    'arvore': 'arvore.png',
+    'alce': 'alce.png',
+    'nascimento': 'nascimento.png',
+}
+
+class ColecaoPreguicosa(Mapping):
+    """
+    Dicionário somente leitura cujo conteúdo é criado pela função `carregar` na primeira consulta.
+    """
+
+    def __init__(self, carregar):
+        self._carregar = carregar
+        self._itens = None
+
+    def _dados(self):
+        if self._itens is None:
+            self._itens = self._carregar()
+        return self._itens
+
+    def __getitem__(self, nome):
+        return self._dados()[nome]
+
+    def __iter__(self):
+        return iter(self._dados())
+
+    def __len__(self):
+        return len(self._dados())
+
+def _ler_adesivos():
+    """
+    Lê os adesivos com o canal alfa (IMREAD_UNCHANGED). Um arquivo ausente gera FileNotFoundError.
+    """
+    lidos = {}
+    for nome, arquivo in ARQUIVOS_ADESIVOS.items():
+        caminho = os.path.join(DIRETORIO_ADESIVOS, arquivo)
+        adesivo = cv2.imread(caminho, cv2.IMREAD_UNCHANGED)
+        if adesivo is None:  # Se algum adesivo não foi carregado.
+            raise FileNotFoundError(f"Erro ao carregar o adesivo: {nome} ({caminho})")
+        lidos[nome] = adesivo
+    return lidos
+
+# Adesivos com transparência (BGRA), lidos na primeira consulta.
+adesivos = ColecaoPreguicosa(_ler_adesivos)
+
+class AssetAdesivo:
+    """
+    Adesivo pré-processado uma única vez no carregamento: cor BGR já multiplicada pelo alfa e
+    complemento do alfa replicado em três canais, prontos para a composição alfa "over".
+    """
+
+    def __init__(self, imagem):
+        if imagem.shape[2] == 4:  # Verifica se o adesivo possui canal alfa.
+            cor = imagem[:, :, :3]
+            alfa = imagem[:, :, 3]
+        else:  # Adesivos sem canal alfa são totalmente opacos.
+            cor = imagem
+            alfa = np.full(imagem.shape[:2], 255, dtype=np.uint8)
+        alfa3 = cv2.merge((alfa, alfa, alfa))
+        self.altura, self.largura = imagem.shape[:2]
+        self.alfa = alfa                                          # Opacidade (0 a 255) de cada pixel.
+        self.cor = cv2.multiply(cor, alfa3, scale=1 / 255)        # Cor pré-multiplicada: cor * alfa.
+        self.alfa_inverso = cv2.bitwise_not(alfa3)                # 255 - alfa, nos três canais.
+
+def compor_sobre(roi, cor, alfa_inverso):
+    """
+    Composição alfa "over" com cor pré-multiplicada, escrita na própria região:
+    roi = cor + roi * (255 - alfa) / 255. Pixels semitransparentes são misturados corretamente.
+    """
+    cv2.multiply(roi, alfa_inverso, dst=roi, scale=1 / 255)
+    cv2.add(roi, cor, dst=roi)
+
+# Adesivos pré-processados, na mesma ordem do dicionário de adesivos, preparados na primeira consulta.
+adesivos_preparados = ColecaoPreguicosa(lambda: {nome: AssetAdesivo(adesivo) for nome, adesivo in adesivos.items()})
+
+# Adesivos reduzidos para a edição em resolução de visualização, indexados por (nome, escala).
+_adesivos_em_escala = {}
+
+def adesivo_em_escala(nome, escala):
+    """
+    Retorna o adesivo `nome` pré-processado na escala indicada (1.0 devolve o adesivo original).
+    """
+    if escala == 1.0:
+        return adesivos_preparados[nome]
+    chave = (nome, escala)
+    if chave not in _adesivos_em_escala:
+        imagem = adesivos[nome]
+        tamanho = (max(1, round(imagem.shape[1] * escala)), max(1, round(imagem.shape[0] * escala)))
+        interpolacao = cv2.INTER_AREA if escala < 1 else cv2.INTER_LINEAR
+        _adesivos_em_escala[chave] = AssetAdesivo(cv2.resize(imagem, tamanho, interpolation=interpolacao))
+    return _adesivos_em_escala[chave]
+
+def cabe_no_frame(adesivo, x, y, largura, altura):
+    """
+    Indica se o adesivo colocado em (x, y) fica inteiro dentro de um frame largura x altura.
+    """
+    return x >= 0 and y >= 0 and x + adesivo.largura <= largura and y + adesivo.altura <= altura
+
+def aplicar_adesivo(imagem_fundo, adesivo, x, y):
+    """
+    Aplica um adesivo na posição especificada (x, y) da imagem.
+    Suporta adesivos com canal alfa para transparência, inclusive bordas suaves.
+    """
+    # Aceita também a imagem RGBA bruta, pré-processando-a na hora.
+    if not isinstance(adesivo, AssetAdesivo):
+        adesivo = AssetAdesivo(adesivo)
+
+    # Verifica se o adesivo está dentro dos limites da imagem.
+    if not cabe_no_frame(adesivo, x, y, imagem_fundo.shape[1], imagem_fundo.shape[0]):
+        return  # Não aplica o adesivo se estiver fora dos limites.
+
+    # Mistura o adesivo diretamente na região da imagem onde ele será aplicado.
+    compor_sobre(imagem_fundo[y:y + adesivo.altura, x:x + adesivo.largura], adesivo.cor, adesivo.alfa_inverso)
+
+class ColocacaoAdesivo:
+    """
+    Adesivo colocado sobre o vídeo da webcam: posição, asset e região (caixa) que ele ocupa no frame.
+    """
+
+    def __init__(self, adesivo, x, y):
+        self.adesivo = adesivo
+        self.x = x
+        self.y = y
+        # Caixa delimitadora no frame como fatias (linhas, colunas), usada para compor só esta região.
+        self.linhas = slice(y, y + adesivo.altura)
+        self.colunas = slice(x, x + adesivo.largura)
+
+def resolver_adesivo(texto):
+    """
+    Converte "nome:x:y" ou "nome:x:y:escala" (ex.: "chapeu:40:10:0.5") em (nome, x, y, escala).
+    """
+    partes = texto.split(':')
+    if len(partes) not in (3, 4) or partes[0] not in ARQUIVOS_ADESIVOS:
+        raise ValueError(f"Adesivo inválido: {texto} (use nome:x:y[:escala], com nome entre "
+                         f"{', '.join(ARQUIVOS_ADESIVOS)})")
+    try:
+        return partes[0], int(partes[1]), int(partes[2]), float(partes[3]) if len(partes) == 4 else 1.0
+    except ValueError:
+        raise ValueError(f"Adesivo inválido: {texto} (x e y inteiros, escala decimal)")
+
+def adesivos_fora(especificacoes, largura, altura):
+    """
+    Lista (nome, x, y) dos adesivos [(nome, x, y, escala)] que não cabem em um frame largura x altura.
+    """
+    return [(nome, x, y) for nome, x, y, escala in especificacoes
+            if not cabe_no_frame(adesivo_em_escala(nome, escala), x, y, largura, altura)]
+
+def preparar_colocacoes(especificacoes):
+    """
+    Cria as colocações dos adesivos [(nome, x, y, escala)], já pré-processados na escala de cada um.
+    """
+    return [ColocacaoAdesivo(adesivo_em_escala(nome, escala), x, y) for nome, x, y, escala in especificacoes]
+
+def compor_colocacoes(imagem, colocacoes):
+    """
+    Compõe, na própria imagem e em ordem, os adesivos colocados. Só as regiões ocupadas por adesivos
+    são tocadas, então o custo acompanha a área dos adesivos.
+    """
+    for colocacao in colocacoes:
+        compor_sobre(imagem[colocacao.linhas, colocacao.colunas], colocacao.adesivo.cor, colocacao.adesivo.alfa_inverso)
+    return imagem
@@ -0,0 +1,223 @@
+"""
+Benchmark do editor: mede cada filtro de nomes_filtros (via aplicar_filtro_generico), a aplicação de adesivos,
+a geração de miniaturas e a composição da janela em 480p, 1080p, 4K e 24 MP.
+
+Uso:
+    python benchmark.py                               # todas as resoluções, imprime a tabela
+    python benchmark.py --saida atual.json            # também salva os resultados em JSON
+    python benchmark.py --comparar base.json          # falha (código 1) se algum estágio ficou mais lento
+    python benchmark.py --resolucoes 480p,1080p --imagem foto.jpg
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Diretório deste arquivo, onde estão o editor e os adesivos.
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Resoluções medidas: nome -> (largura, altura).
+RESOLUCOES = {
+    '480p': (854, 480),
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+    '24MP': (6000, 4000),
+}
+
+def carregar_editor():
+    """
+    Importa a camada da interface do editor ("Versão Final.py", cujo nome não é um identificador válido) como
+    módulo. Os filtros e adesivos vêm dos módulos filtros e adesivos, que ele importa deste mesmo diretório.
+    """
+    if DIRETORIO not in sys.path:
+        sys.path.insert(0, DIRETORIO)
+    spec = importlib.util.spec_from_file_location("versao_final", os.path.join(DIRETORIO, "Versão Final.py"))
+    editor = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(editor)
+    return editor
+
+def imagem_sintetica(largura, altura):
+    """
+    Imagem de teste determinística com gradientes, bordas e ruído, para que os filtros não encontrem
+    regiões triviais (totalmente planas) que favoreçam algum deles.
+    """
+    gerador = np.random.default_rng(0)
+    y, x = np.mgrid[0:altura, 0:largura].astype(np.float32)
+    imagem = np.empty((altura, largura, 3), dtype=np.float32)
+    imagem[..., 0] = 255 * x / largura
+    imagem[..., 1] = 255 * y / altura
+    imagem[..., 2] = 127.5 + 127.5 * np.sin(x / 37.0) * np.cos(y / 23.0)
+    imagem = imagem.astype(np.uint8)
+    # Retângulos de cores sólidas criam bordas fortes para os filtros espaciais.
+    for _ in range(40):
+        x0, y0 = int(gerador.integers(0, largura)), int(gerador.integers(0, altura))
+        cor = tuple(int(c) for c in gerador.integers(0, 256, 3))
+        cv2.rectangle(imagem, (x0, y0), (x0 + largura // 10, y0 + altura // 10), cor, -1)
+    ruido = gerador.integers(-12, 13, imagem.shape, dtype=np.int16)
+    return np.clip(imagem.astype(np.int16) + ruido, 0, 255).astype(np.uint8)
+
+def medir(funcao, repeticoes, tempo_maximo):
+    """
+    Executa a função uma vez para aquecer (caches, calibrações, alocações) e depois até `repeticoes` vezes,
+    parando antes se passar de `tempo_maximo` segundos. Retorna os tempos em segundos.
+    Estágios cuja primeira execução já passa do limite são medidos só por ela.
+    """
+    inicio = time.perf_counter()
+    funcao()
+    primeira = time.perf_counter() - inicio
+    if primeira > tempo_maximo:
+        return [primeira]
+    amostras = []
+    limite = time.perf_counter() + tempo_maximo
+    while len(amostras) < repeticoes and (not amostras or time.perf_counter() < limite):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append(time.perf_counter() - inicio)
+    return amostras
+
+def estagios(editor, imagem):
+    """
+    Monta a lista (nome, função sem argumentos) dos estágios medidos para a imagem.
+    """
+    destino = np.empty_like(imagem)
+    lista = []
+    for indice, nome in enumerate(editor.nomes_filtros):
+        lista.append((f"filtro {indice}: {nome}",
+                      lambda indice=indice: editor.aplicar_filtro_generico(imagem, indice, destino=destino)))
+
+    # O adesivo é aplicado sempre sobre a mesma cópia; o custo não depende do conteúdo do fundo.
+    fundo = imagem.copy()
+    adesivo = next(iter(editor.adesivos_preparados.values()))
+    x = max(0, (imagem.shape[1] - adesivo.largura) // 2)
+    y = max(0, (imagem.shape[0] - adesivo.altura) // 2)
+    lista.append(("aplicar_adesivo", lambda: editor.aplicar_adesivo(fundo, adesivo, x, y)))
+
+    def gerar_miniaturas():
+        # Sem o cache, para medir a renderização das miniaturas e não só o hash da imagem.
+        editor.cache_miniaturas.clear()
+        editor.gerar_miniaturas(imagem)
+    lista.append(("gerar_miniaturas", gerar_miniaturas))
+
+    # Composição da janela em modo retido, como em cada frame de atualizar_janela (sem o imshow).
+    editor.compositor_janela.invalidar()
+    lista.append(("compor_janela", lambda: editor.compositor_janela.compor(imagem)))
+    return lista
+
+def executar(editor, resolucoes, imagem_base=None, repeticoes=5, tempo_maximo=2.0):
+    """
+    Mede todos os estágios em cada resolução. Retorna {resolução: {estágio: {"ms": ..., "mp_s": ...}}}.
+    """
+    resultados = {}
+    for nome_resolucao in resolucoes:
+        largura, altura = RESOLUCOES[nome_resolucao]
+        if imagem_base is None:
+            imagem = imagem_sintetica(largura, altura)
+        else:
+            imagem = cv2.resize(imagem_base, (largura, altura), interpolation=cv2.INTER_AREA)
+        megapixels = largura * altura / 1e6
+        print(f"\n{nome_resolucao} ({largura}x{altura}, {megapixels:.1f} MP)")
+        print(f"  {'estágio':<36}{'ms/frame':>10}{'MP/s':>10}")
+        resultados[nome_resolucao] = {}
+        for nome_estagio, funcao in estagios(editor, imagem):
+            ms = statistics.median(medir(funcao, repeticoes, tempo_maximo)) * 1000
+            mp_s = megapixels / (ms / 1000) if ms > 0 else float('inf')
+            resultados[nome_resolucao][nome_estagio] = {"ms": round(ms, 3), "mp_s": round(mp_s, 2)}
+            print(f"  {nome_estagio:<36}{ms:>10.2f}{mp_s:>10.1f}")
+    return resultados
+
+def descrever_ambiente():
+    """
+    Informações da máquina e das bibliotecas, salvas junto dos resultados para comparar execuções.
+    """
+    return {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor(),
+        "nucleos": os.cpu_count(),
+        "threads_opencv": cv2.getNumThreads(),
+    }
+
+def comparar(resultados, base, tolerancia):
+    """
+    Compara os tempos com os de uma execução anterior. Retorna a lista de estágios mais lentos que
+    a base além da tolerância (0.15 = 15%); estágios que não existem nas duas execuções são ignorados.
+    """
+    regressoes = []
+    print(f"\nComparação com a base (tolerância {tolerancia:.0%}):")
+    for nome_resolucao, medidas in resultados.items():
+        for nome_estagio, medida in medidas.items():
+            anterior = base.get(nome_resolucao, {}).get(nome_estagio)
+            if anterior is None or anterior["ms"] <= 0:
+                continue
+            razao = medida["ms"] / anterior["ms"]
+            lento = razao > 1 + tolerancia
+            if lento:
+                regressoes.append((nome_resolucao, nome_estagio, anterior["ms"], medida["ms"]))
+            print(f"  {'LENTO' if lento else 'ok':<6}{nome_resolucao:<7}{nome_estagio:<36}"
+                  f"{anterior['ms']:>10.2f} -> {medida['ms']:>10.2f} ms ({razao:.2f}x)")
+    return regressoes
+
+def interpretar_argumentos(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos filtros, adesivos e composição do editor.")
+    parser.add_argument("--resolucoes", default=",".join(RESOLUCOES),
+                        help=f"resoluções separadas por vírgula, entre {', '.join(RESOLUCOES)} (padrão: todas)")
+    parser.add_argument("--imagem", default=None,
+                        help="imagem redimensionada para cada resolução (padrão: imagem sintética)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="execuções medidas por estágio (padrão: 5)")
+    parser.add_argument("--tempo-max", type=float, default=2.0, metavar="S",
+                        help="tempo máximo gasto medindo cada estágio (padrão: 2 s)")
+    parser.add_argument("--threads-opencv", type=int, default=None,
+                        help="threads internas do OpenCV (padrão: o do OpenCV)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON onde os resultados são salvos")
+    parser.add_argument("--comparar", default=None, metavar="BASE",
+                        help="JSON de uma execução anterior; termina com erro se algum estágio ficar mais lento")
+    parser.add_argument("--tolerancia", type=float, default=0.15,
+                        help="aumento de tempo tolerado na comparação, ex.: 0.15 = 15%% (padrão: 0.15)")
+    return parser.parse_args(argumentos)
+
+def main():
+    argumentos = interpretar_argumentos()
+    resolucoes = [nome.strip() for nome in argumentos.resolucoes.split(",") if nome.strip()]
+    desconhecidas = [nome for nome in resolucoes if nome not in RESOLUCOES]
+    if desconhecidas:
+        print(f"Resoluções desconhecidas: {', '.join(desconhecidas)}")
+        sys.exit(2)
+    imagem_base = None
+    if argumentos.imagem:
+        imagem_base = cv2.imread(argumentos.imagem)
+        if imagem_base is None:
+            print(f"Erro ao carregar a imagem: {argumentos.imagem}")
+            sys.exit(2)
+    if argumentos.threads_opencv is not None:
+        cv2.setNumThreads(argumentos.threads_opencv)
+
+    editor = carregar_editor()
+    resultados = executar(editor, resolucoes, imagem_base, argumentos.repeticoes, argumentos.tempo_max)
+
+    if argumentos.saida:
+        with open(argumentos.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": descrever_ambiente(), "resultados": resultados}, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {argumentos.saida}")
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)["resultados"]
+        regressoes = comparar(resultados, base, argumentos.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} estágio(s) mais lento(s) que a base além da tolerância.")
+            sys.exit(1)
+        print("\nNenhuma regressão de desempenho.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+"""
+Motor de filtros do editor: nomes e registro dos filtros, pool de frames reutilizáveis, estratégias de
+desfoque e de suavização e o compilador de cadeias de filtros. Depende apenas do OpenCV e do NumPy,
+para que possa ser importado por processos trabalhadores e serviços sem a interface gráfica.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Lista com os nomes dos filtros disponíveis.
+nomes_filtros = [
+    "Original",             # Filtro 0: Sem alterações na imagem.
+    "Escala de Cinza",      # Filtro 1: Converte a imagem para preto e branco.
+    "Inversão",             # Filtro 2: Inverte as cores da imagem.
+    "Desfoque",             # Filtro 3: Aplica um desfoque na imagem.
+    "Efeito Tumblr",        # Filtro 4: Aplica um efeito de tonalidade rosa.
+    "Efeito Prism",         # Filtro 5: Aplica um efeito de arco-íris.
+    "Vintage",              # Filtro 6: Aplica uma tonalidade sépia para um estilo retrô.
+    "Silly Face",           # Filtro 7: Aumenta o brilho da imagem.
+    "Kyle+Kendall Slim",    # Filtro 8: Aplica suavização à imagem.
+    "Filtro Kodak",         # Filtro 9: Simula cores mais quentes, estilo filme Kodak.
+    "Efeito Preto e Vermelho"  # Filtro 10: Cria um efeito preto e vermelho.
+]
+
+# ---------------------------------------
+# Pool de frames reutilizáveis
+# ---------------------------------------
+
+class PoolDeFrames:
+    """
+    Conjunto de buffers reutilizáveis indexados por forma e tipo, para que o laço da webcam
+    não aloque frames grandes a cada iteração.
+    """
+
+    def __init__(self, limite_por_chave=4):
+        self.limite_por_chave = limite_por_chave  # Máximo de buffers livres guardados por forma/tipo.
+        self.alocacoes = 0                        # Quantidade de buffers realmente alocados até agora.
+        self._livres = {}                         # (forma, tipo) -> lista de buffers disponíveis.
+        self._trava = threading.Lock()            # Permite obter/devolver buffers de várias threads.
+
+    def obter(self, forma, dtype=np.uint8):
+        """
+        Retorna um buffer com a forma e o tipo pedidos; o conteúdo não é inicializado.
+        """
+        chave = (tuple(forma), np.dtype(dtype).str)
+        with self._trava:
+            livres = self._livres.get(chave)
+            if livres:
+                return livres.pop()
+            self.alocacoes += 1
+        return np.empty(forma, dtype)
+
+    def devolver(self, buffer):
+        """
+        Devolve um buffer ao pool para ser reaproveitado por uma próxima chamada de obter.
+        """
+        if buffer is None:
+            return
+        chave = (buffer.shape, buffer.dtype.str)
+        with self._trava:
+            livres = self._livres.setdefault(chave, [])
+            if len(livres) < self.limite_por_chave:
+                livres.append(buffer)
+
+# Pool compartilhado pelos filtros e pela composição da interface.
+pool_frames = PoolDeFrames(limite_por_chave=8)
+
+# ---------------------------------------
+# Registro de filtros pré-compilados
+# ---------------------------------------
+
+# Classes de custo relativo por pixel, usadas para decidir agendamento, miniaturas e divisão em blocos.
+CUSTO_NULO = 0    # Não processa pixels (apenas copia).
+CUSTO_BAIXO = 1   # Uma consulta de tabela ou operação aritmética por pixel.
+CUSTO_MEDIO = 2   # Combinação linear de canais ou conversões de cor.
+CUSTO_ALTO = 3    # Filtros de vizinhança com kernel separável.
+CUSTO_MUITO_ALTO = 4  # Filtros de vizinhança não separáveis (ex.: bilateral).
+
+# Pesos usados pelo OpenCV na conversão BGR -> cinza, na ordem dos canais (azul, verde, vermelho).
+PESOS_CINZA = np.array([0.114, 0.587, 0.299])
+
+def _lut_por_canal(valores):
+    """
+    Monta uma tabela de look-up (256 x 1 x 3, formato do cv2.LUT) aplicando a mesma curva aos três canais.
+    """
+    return np.repeat(np.clip(valores, 0, 255).astype(np.uint8).reshape(256, 1, 1), 3, axis=2)
+
+def _lut_mapa_de_cores(mapa):
+    """
+    Extrai a tabela (256 x 1 x 3) de um mapa de cores do OpenCV aplicando-o a uma rampa de cinza.
+    """
+    rampa = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    return cv2.applyColorMap(rampa, mapa)
+
+# Constantes dos filtros, calculadas uma única vez ao carregar o módulo.
+RAMPA = np.arange(256)
+MATRIZ_CINZA = np.tile(PESOS_CINZA, (3, 1))  # As três saídas recebem a luminância.
+MATRIZ_SEPIA = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]])
+MATRIZ_PRETO_VERMELHO = np.vstack((np.zeros((2, 3)), PESOS_CINZA))  # Só o vermelho recebe a luminância.
+LUT_INVERSAO = _lut_por_canal(255 - RAMPA)
+LUT_SILLY_FACE = _lut_por_canal(RAMPA + 30)
+LUT_KODAK = _lut_por_canal(RAMPA + 20)
+# A mesma curva em uma tabela só (uint8[256]): o cv2.LUT a aplica aos três canais bem mais rápido que a de 3 canais.
+LUT_KODAK_UNICA = np.ascontiguousarray(LUT_KODAK[:, 0, 0])
+LUT_TUMBLR = _lut_mapa_de_cores(cv2.COLORMAP_PINK)
+LUT_PRISM = _lut_mapa_de_cores(cv2.COLORMAP_RAINBOW)
+BRILHO_SILLY_FACE = (30, 30, 30, 0)  # Escalar somado com saturação, sem alocar um frame constante.
+
+class Filtro:
+    """
+    Filtro pré-compilado: guarda a função de aplicação com suas constantes já prontas e
+    metadados que permitem decidir como usá-lo sem tratar índices como casos especiais.
+    """
+
+    def __init__(self, nome, aplicar, tipo, custo, raio=0, estagios=None, de_cinza=None):
+        self.nome = nome          # Nome exibido na interface (o mesmo de nomes_filtros).
+        # Função (imagem_base, destino) que devolve o resultado; filtros espaciais recebem também a escala.
+        self._aplicar = aplicar
+        self.tipo = tipo          # 'identidade', 'pontual' (pixel a pixel) ou 'espacial' (usa vizinhança).
+        self.custo = custo        # Classe de custo relativo por pixel (CUSTO_*).
+        self.raio = raio          # Raio do kernel em pixels; 0 para filtros pontuais.
+        # Estágios ('lut', tabela) / ('matriz', matriz) equivalentes, usados pelo compilador de cadeias.
+        # None indica um filtro que não pode ser fundido com os vizinhos.
+        self.estagios = estagios
+        # Função (cinza, destino) para filtros que dependem apenas da luminância; permite
+        # compartilhar uma única conversão para cinza entre vários filtros (ex.: nas miniaturas).
+        self.de_cinza = de_cinza
+
+    @property
+    def pontual(self):
+        """
+        Indica se cada pixel de saída depende apenas do pixel de entrada na mesma posição.
+        """
+        return self.tipo != 'espacial'
+
+    def __call__(self, imagem_base, destino=None, escala=1.0):
+        """
+        Aplica o filtro. 'escala' é a razão entre a resolução recebida e a resolução de referência;
+        filtros espaciais reduzem o kernel na mesma proporção para manter a aparência.
+        """
+        if self.de_cinza is not None:
+            # Converte para cinza em um buffer temporário do pool e deriva o resultado dele.
+            cinza = cv2.cvtColor(imagem_base, cv2.COLOR_BGR2GRAY, dst=pool_frames.obter(imagem_base.shape[:2]))
+            resultado = self.de_cinza(cinza, destino)
+            pool_frames.devolver(cinza)
+            return resultado
+        if self.tipo == 'espacial':
+            return self._aplicar(imagem_base, destino, escala)
+        return self._aplicar(imagem_base, destino)
+
+    def __repr__(self):
+        return f"Filtro({self.nome!r}, tipo={self.tipo!r}, custo={self.custo}, raio={self.raio})"
+
+def _copiar(imagem_base, destino):
+    """
+    Copia a imagem para o destino (ou para uma nova imagem, se não houver destino).
+    """
+    if destino is None:
+        return imagem_base.copy()
+    np.copyto(destino, imagem_base)
+    return destino
+
+# Planos de zeros do filtro Preto e Vermelho, indexados por forma; só são lidos, então são compartilhados.
+_planos_zero = {}
+
+def _plano_zero(forma):
+    """
+    Retorna um plano de zeros com a forma pedida, criado uma única vez por forma.
+    """
+    plano = _planos_zero.get(forma)
+    if plano is None:
+        if len(_planos_zero) >= 8:
+            _planos_zero.clear()  # Muitos tamanhos diferentes (ex.: no modo em lote): não acumula memória.
+        plano = _planos_zero[forma] = np.zeros(forma, dtype=np.uint8)
+    return plano
+
+def _preto_e_vermelho(cinza, destino):
+    """
+    Coloca a luminância no canal vermelho e zera os canais azul e verde.
+    """
+    # cv2.merge intercala os planos numa só passada; escrever canal a canal no destino é bem mais lento.
+    zeros = _plano_zero(cinza.shape)
+    return cv2.merge((zeros, zeros, cinza), dst=destino)
+
+# Raio do filtro Desfoque em pixels da resolução de referência; 7 equivale ao kernel 15x15 original.
+raio_desfoque = 7
+
+def sigma_do_raio(raio):
+    """
+    Sigma que o OpenCV deriva de um kernel gaussiano de lado 2 * raio + 1 (2.6 para o kernel 15x15).
+    """
+    return 0.3 * (raio - 1) + 0.8
+
+def _desfoque_gaussiano(imagem_base, destino, raio, sigma):
+    """
+    Gaussiano direto: exato, mas o custo cresce com o raio.
+    """
+    return cv2.GaussianBlur(imagem_base, (2 * raio + 1, 2 * raio + 1), sigma, dst=destino)
+
+def _larguras_caixas(sigma, n=3):
+    """
+    Larguras (ímpares) de n médias em caixa cuja sequência tem a mesma variância de um gaussiano de sigma dado.
+    """
+    ideal = (12 * sigma * sigma / n + 1) ** 0.5
+    menor = int(ideal)
+    if menor % 2 == 0:
+        menor -= 1
+    quantos_menores = round((12 * sigma * sigma - n * menor * menor - 4 * n * menor - 3 * n) / (-4 * menor - 4))
+    return [menor if i < quantos_menores else menor + 2 for i in range(n)]
+
+def _desfoque_caixas(imagem_base, destino, raio, sigma):
+    """
+    Três médias em caixa seguidas, que se aproximam de um gaussiano com custo por pixel independente do raio.
+    """
+    larguras = _larguras_caixas(sigma)
+    intermediaria = imagem_base
+    for largura in larguras[:-1]:
+        intermediaria = cv2.boxFilter(intermediaria, -1, (largura, largura))
+    return cv2.boxFilter(intermediaria, -1, (larguras[-1], larguras[-1]), dst=destino)
+
+def _niveis_piramide(sigma, forma):
+    """
+    Quantas reduções pela metade cabem mantendo sigma >= 2 no nível reduzido (e a imagem com alguns pixels).
+    """
+    niveis = 0
+    while sigma / 2 ** (niveis + 1) >= 2 and min(forma[:2]) >> (niveis + 1) >= 8:
+        niveis += 1
+    return niveis
+
+def _desfoque_piramide(imagem_base, destino, raio, sigma):
+    """
+    Reduz a imagem em potências de 2, desfoca o nível pequeno com o sigma proporcional e amplia de volta:
+    o custo fica praticamente constante para qualquer raio grande.
+    """
+    altura, largura = imagem_base.shape[:2]
+    fator = 2 ** _niveis_piramide(sigma, imagem_base.shape)
+    reduzida = cv2.resize(imagem_base, (max(1, largura // fator), max(1, altura // fator)), interpolation=cv2.INTER_AREA)
+    sigma_reduzido = sigma / fator
+    raio_reduzido = max(1, int(3 * sigma_reduzido + 0.5))
+    cv2.GaussianBlur(reduzida, (2 * raio_reduzido + 1, 2 * raio_reduzido + 1), sigma_reduzido, dst=reduzida)
+    return cv2.resize(reduzida, (largura, altura), dst=destino, interpolation=cv2.INTER_LINEAR)
+
+# Estratégias de desfoque e o menor sigma em que cada uma é visualmente equivalente ao gaussiano:
+# abaixo disso, as caixas ficam largas demais em relação ao sigma e a pirâmide não tem nível para reduzir.
+ESTRATEGIAS_DESFOQUE = {
+    'gaussiano': (_desfoque_gaussiano, 0.0),
+    'caixas': (_desfoque_caixas, 3.0),
+    'piramide': (_desfoque_piramide, 4.0),
+}
+
+# Estratégia mais rápida medida neste computador para cada raio efetivo, e onde as medições são guardadas.
+estrategia_por_raio = {}
+_calibracao_carregada = False  # O arquivo de calibração já foi lido (ou as estratégias foram definidas).
+ARQUIVO_CALIBRACAO_DESFOQUE = os.path.join(os.path.expanduser("~"), ".cache", "trabalhogb", "desfoque.json")
+
+def _chave_calibracao():
+    # As medições valem para esta versão do OpenCV neste número de núcleos.
+    return f"{cv2.__version__}-{os.cpu_count()}-{cv2.getNumThreads()}"
+
+def _carregar_calibracao_desfoque():
+    global _calibracao_carregada
+    _calibracao_carregada = True
+    try:
+        with open(ARQUIVO_CALIBRACAO_DESFOQUE) as arquivo:
+            medicoes = json.load(arquivo).get(_chave_calibracao(), {})
+        estrategia_por_raio.update({int(raio): estrategia for raio, estrategia in medicoes.items()})
+    except (OSError, ValueError):
+        pass
+
+def _salvar_calibracao_desfoque():
+    try:
+        os.makedirs(os.path.dirname(ARQUIVO_CALIBRACAO_DESFOQUE), exist_ok=True)
+        try:
+            with open(ARQUIVO_CALIBRACAO_DESFOQUE) as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            dados = {}
+        dados[_chave_calibracao()] = {str(raio): estrategia for raio, estrategia in sorted(estrategia_por_raio.items())}
+        # Grava em um temporário e troca pelo atual: outro processo nunca lê o arquivo pela metade.
+        temporario = f"{ARQUIVO_CALIBRACAO_DESFOQUE}.{os.getpid()}.tmp"
+        with open(temporario, "w") as arquivo:
+            json.dump(dados, arquivo, indent=2)
+        os.replace(temporario, ARQUIVO_CALIBRACAO_DESFOQUE)
+    except OSError:
+        pass  # Sem onde gravar, as medições valem só para esta execução.
+
+def calibrar_desfoque(raio, lado=512, repeticoes=3):
+    """
+    Mede, numa imagem de teste, cada estratégia válida para o raio e retorna a mais rápida.
+    O custo de todas é proporcional ao número de pixels, então a escolha vale para qualquer resolução.
+    """
+    sigma = sigma_do_raio(raio)
+    amostra = np.random.default_rng(0).integers(0, 256, (lado, lado, 3), dtype=np.uint8)
+    destino = np.empty_like(amostra)
+    tempos = {}
+    for nome, (estrategia, sigma_minimo) in ESTRATEGIAS_DESFOQUE.items():
+        if sigma < sigma_minimo:
+            continue
+        estrategia(amostra, destino, raio, sigma)  # Aquecimento.
+        melhor = float('inf')
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            estrategia(amostra, destino, raio, sigma)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        tempos[nome] = melhor
+    return min(tempos, key=tempos.get)
+
+def estrategia_desfoque(raio):
+    """
+    Retorna o nome da estratégia para o raio, medindo-a na primeira vez (o resultado fica guardado em disco).
+    """
+    if not _calibracao_carregada:
+        _carregar_calibracao_desfoque()
+    if raio not in estrategia_por_raio:
+        # O gaussiano direto é o único válido para sigmas pequenos; não há o que medir.
+        if sigma_do_raio(raio) < min(minimo for nome, (_, minimo) in ESTRATEGIAS_DESFOQUE.items() if nome != 'gaussiano'):
+            estrategia_por_raio[raio] = 'gaussiano'
+        else:
+            estrategia_por_raio[raio] = calibrar_desfoque(raio)
+            _salvar_calibracao_desfoque()
+    return estrategia_por_raio[raio]
+
+def definir_estrategias_desfoque(estrategias):
+    """
+    Usa as estratégias {raio: nome} já escolhidas em outro processo, sem ler nem medir a calibração.
+    Processos trabalhadores limitam as threads do OpenCV, o que mudaria a chave da calibração e
+    os faria medir tudo de novo.
+    """
+    global _calibracao_carregada
+    estrategia_por_raio.update(estrategias)
+    _calibracao_carregada = True
+
+def definir_raio_desfoque(raio):
+    """
+    Altera o raio do filtro Desfoque.
+    """
+    global raio_desfoque
+    raio_desfoque = max(1, int(raio))
+    FILTROS[3].raio = raio_desfoque
+
+def _desfoque(imagem_base, destino, escala=1.0):
+    """
+    Desfoque gaussiano com o raio configurado (15x15 por padrão); em resoluções reduzidas o raio e o sigma
+    acompanham a escala. Conforme o raio, usa o gaussiano direto, caixas em sequência ou a pirâmide,
+    a que foi mais rápida nas medições deste computador.
+    """
+    sigma = sigma_do_raio(raio_desfoque) * escala
+    raio = max(1, round(raio_desfoque * escala))
+    estrategia = estrategia_desfoque(raio)
+    if estrategia == 'gaussiano' and escala == 1.0:
+        # Sigma 0: o OpenCV deriva do kernel o mesmo sigma, mantendo o resultado idêntico ao original.
+        return cv2.GaussianBlur(imagem_base, (2 * raio + 1, 2 * raio + 1), 0, dst=destino)
+    return ESTRATEGIAS_DESFOQUE[estrategia][0](imagem_base, destino, raio, sigma)
+
+def _bilateral_exato(imagem_base, destino, escala=1.0):
+    """
+    Filtro bilateral com diâmetro 15 e sigmas 80; em resoluções reduzidas o diâmetro e o
+    sigma espacial acompanham a escala, enquanto o sigma de cor permanece o mesmo.
+    """
+    if escala == 1.0:
+        return cv2.bilateralFilter(imagem_base, 15, 80, 80, dst=destino)
+    diametro = max(3, round(15 * escala) | 1)
+    return cv2.bilateralFilter(imagem_base, diametro, 80, 80 * escala, dst=destino)
+
+def _bilateral_reduzido(imagem_base, destino, escala=1.0, fator=2):
+    """
+    Bilateral calculado na imagem reduzida `fator` vezes e ampliado de volta: cerca de fator³ vezes
+    mais barato, já que o diâmetro do kernel também diminui, ao custo de bordas um pouco mais suaves.
+    """
+    altura, largura = imagem_base.shape[:2]
+    reduzida = cv2.resize(imagem_base, (max(1, largura // fator), max(1, altura // fator)), interpolation=cv2.INTER_AREA)
+    suavizada = _bilateral_exato(reduzida, None, escala / fator)
+    return cv2.resize(suavizada, (largura, altura), dst=destino, interpolation=cv2.INTER_LINEAR)
+
+def _filtro_guiado(imagem_base, destino, escala=1.0, subamostragem=4, eps=15.0 ** 2):
+    """
+    Filtro guiado rápido (cada canal guia a si mesmo) com o mesmo raio do bilateral: só usa médias em caixa,
+    então o custo por pixel é constante. Os coeficientes lineares são calculados na imagem reduzida
+    `subamostragem` vezes e ampliados; `eps` faz o papel do sigma de cor (em níveis de 0 a 255, ao quadrado).
+    """
+    altura, largura = imagem_base.shape[:2]
+    fator = max(1, min(subamostragem, altura // 4, largura // 4))
+    guia = imagem_base.astype(np.float32)
+    reduzida = cv2.resize(guia, (max(1, largura // fator), max(1, altura // fator)), interpolation=cv2.INTER_AREA)
+    raio = max(1, round(7 * escala / fator))
+    janela = (2 * raio + 1, 2 * raio + 1)
+    # Média e variância locais em cada canal.
+    media = cv2.boxFilter(reduzida, -1, janela)
+    variancia = cv2.boxFilter(cv2.multiply(reduzida, reduzida), -1, janela) - cv2.multiply(media, media)
+    # q = a * I + b: onde a variância é grande perto de eps (bordas) a ≈ 1 e a imagem é preservada; em regiões
+    # planas a ≈ 0 e o resultado é a média local.
+    a = cv2.divide(variancia, variancia + eps)
+    b = media - cv2.multiply(a, media)
+    a = cv2.resize(cv2.boxFilter(a, -1, janela), (largura, altura), interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(cv2.boxFilter(b, -1, janela), (largura, altura), interpolation=cv2.INTER_LINEAR)
+    return cv2.convertScaleAbs(cv2.add(cv2.multiply(a, guia), b), dst=destino)
+
+# Motores do filtro Kyle+Kendall Slim, do mais fiel ao mais rápido.
+MOTORES_SUAVIZACAO = {
+    'exato': _bilateral_exato,
+    'reduzido': _bilateral_reduzido,
+    'guiado': _filtro_guiado,
+}
+
+# Motor usado pelo filtro Kyle+Kendall Slim (uma das chaves de MOTORES_SUAVIZACAO).
+motor_suavizacao = 'exato'
+
+def _suavizacao_bilateral(imagem_base, destino, escala=1.0):
+    """
+    Suavização que preserva bordas do filtro Kyle+Kendall Slim, feita pelo motor configurado.
+    """
+    return MOTORES_SUAVIZACAO[motor_suavizacao](imagem_base, destino, escala)
+
+def avaliar_motores_suavizacao(imagem, repeticoes=3):
+    """
+    Mede o tempo de cada motor de suavização na imagem e a fidelidade (PSNR, em dB) em relação ao
+    bilateral exato, para escolher o compromisso entre qualidade e velocidade de cada uso.
+    Retorna {motor: (ms por imagem, megapixels por segundo, PSNR)}.
+    """
+    megapixels = imagem.shape[0] * imagem.shape[1] / 1e6
+    referencia = _bilateral_exato(imagem, None)
+    destino = np.empty_like(imagem)
+    resultados = {}
+    for nome, motor in MOTORES_SUAVIZACAO.items():
+        motor(imagem, destino)  # Aquecimento.
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            motor(imagem, destino)
+        ms = (time.perf_counter() - inicio) * 1000 / repeticoes
+        psnr = cv2.PSNR(referencia, destino) if nome != 'exato' else float('inf')
+        resultados[nome] = (ms, megapixels / (ms / 1000), psnr)
+    return resultados
+
+def imprimir_avaliacao_suavizacao(caminhos, alturas=(480, 1080)):
+    """
+    Imprime a avaliação dos motores de suavização para cada imagem, em cada altura indicada e no tamanho original.
+    """
+    for caminho in caminhos:
+        imagem = cv2.imread(caminho)
+        if imagem is None:
+            print(f"Erro ao carregar a imagem: {caminho}")
+            continue
+        altura, largura = imagem.shape[:2]
+        versoes = [cv2.resize(imagem, (round(largura * alvo / altura), alvo), interpolation=cv2.INTER_AREA)
+                   for alvo in alturas if alvo < altura] + [imagem]
+        for versao in versoes:
+            print(f"{os.path.basename(caminho)} {versao.shape[1]}x{versao.shape[0]}:")
+            for nome, (ms, mp_s, psnr) in avaliar_motores_suavizacao(versao).items():
+                print(f"  {nome:<9} {ms:9.1f} ms {mp_s:8.1f} MP/s   PSNR {psnr:5.1f} dB")
+
+# Registro de filtros na mesma ordem de nomes_filtros; o índice do filtro é a posição na lista.
+FILTROS = [
+    # Filtro 0: Original, apenas copia a imagem.
+    Filtro(nomes_filtros[0], _copiar, 'identidade', CUSTO_NULO, estagios=[]),
+    # Filtro 1: Escala de Cinza, convertida de volta para BGR para compatibilidade com as outras funções.
+    Filtro(nomes_filtros[1], None, 'pontual', CUSTO_MEDIO, estagios=[('matriz', MATRIZ_CINZA)],
+           de_cinza=lambda cinza, destino: cv2.cvtColor(cinza, cv2.COLOR_GRAY2BGR, dst=destino)),
+    # Filtro 2: Inversão das cores.
+    Filtro(nomes_filtros[2], lambda imagem, destino: cv2.bitwise_not(imagem, dst=destino),
+           'pontual', CUSTO_BAIXO, estagios=[('lut', LUT_INVERSAO)]),
+    # Filtro 3: Desfoque gaussiano com o raio configurado (kernel 15x15 e sigma padrão com o raio 7).
+    Filtro(nomes_filtros[3], _desfoque, 'espacial', CUSTO_ALTO, raio=raio_desfoque),
+    # Filtros 4 e 5: mapas de cores; o OpenCV converte para cinza e depois aplica a tabela.
+    Filtro(nomes_filtros[4], None, 'pontual', CUSTO_MEDIO, estagios=[('matriz', MATRIZ_CINZA), ('lut', LUT_TUMBLR)],
+           de_cinza=lambda cinza, destino: cv2.applyColorMap(cinza, cv2.COLORMAP_PINK, dst=destino)),
+    Filtro(nomes_filtros[5], None, 'pontual', CUSTO_MEDIO, estagios=[('matriz', MATRIZ_CINZA), ('lut', LUT_PRISM)],
+           de_cinza=lambda cinza, destino: cv2.applyColorMap(cinza, cv2.COLORMAP_RAINBOW, dst=destino)),
+    # Filtro 6: Vintage, transformação sépia (cv2.transform já satura o resultado em 0..255).
+    Filtro(nomes_filtros[6], lambda imagem, destino: cv2.transform(imagem, MATRIZ_SEPIA, dst=destino),
+           'pontual', CUSTO_MEDIO, estagios=[('matriz', MATRIZ_SEPIA)]),
+    # Filtro 7: Silly Face, soma 30 a todos os canais com saturação.
+    Filtro(nomes_filtros[7], lambda imagem, destino: cv2.add(imagem, BRILHO_SILLY_FACE, dst=destino),
+           'pontual', CUSTO_BAIXO, estagios=[('lut', LUT_SILLY_FACE)]),
+    # Filtro 8: Kyle+Kendall Slim, filtro bilateral com diâmetro 15 e sigmas iguais a 80.
+    Filtro(nomes_filtros[8], _suavizacao_bilateral, 'espacial', CUSTO_MUITO_ALTO, raio=7),
+    # Filtro 9: Kodak, tabela que soma 20 às intensidades.
+    # A tabela de 3 canais fica só para o compilador de cadeias, que compõe as tabelas canal a canal.
+    Filtro(nomes_filtros[9], lambda imagem, destino: cv2.LUT(imagem, LUT_KODAK_UNICA, dst=destino), 'pontual',
+           CUSTO_BAIXO, estagios=[('lut', LUT_KODAK)]),
+    # Filtro 10: Preto e Vermelho.
+    Filtro(nomes_filtros[10], None, 'pontual', CUSTO_MEDIO, estagios=[('matriz', MATRIZ_PRETO_VERMELHO)],
+           de_cinza=_preto_e_vermelho),
+]
+
+def aplicar_filtro_generico(imagem_base, indice_filtro, destino=None, escala=1.0):
+    """
+    Aplica um dos filtros predefinidos na imagem base fornecida.
+    Se 'destino' for um buffer com a mesma forma e tipo da imagem, o resultado é escrito nele
+    e nenhum frame novo é alocado; o destino não pode ser a própria imagem base.
+    'escala' indica que a imagem é uma versão reduzida (ex.: 0.25) da resolução de referência.
+    """
+    # Verifica se a imagem base é válida (não é None). Se não for, retorna None.
+    if imagem_base is None:
+        return None
+    # Caso o índice não corresponda a nenhum filtro, retorna a imagem original.
+    if not 0 <= indice_filtro < len(FILTROS):
+        return imagem_base if destino is None else _copiar(imagem_base, destino)
+    # Aplica o filtro registrado, cujas constantes já foram calculadas na criação do registro.
+    return FILTROS[indice_filtro](imagem_base, destino, escala)
+
+# ---------------------------------------
+# Processos trabalhadores
+# ---------------------------------------
+
+def _escolher_estrategia_desfoque(raio):
+    estrategia_desfoque(raio)
+    return dict(estrategia_por_raio)
+
+def argumentos_trabalhador(indices_filtros, threads_opencv=1):
+    """
+    Argumentos de inicializar_trabalhador para processos que vão aplicar os filtros indicados. Se o
+    Desfoque estiver entre eles, a estratégia é escolhida uma única vez e vai pronta para os trabalhadores
+    (ver definir_estrategias_desfoque). A medição roda em um processo configurado como eles: vale para o
+    mesmo número de threads do OpenCV, e o processo principal não põe o pool de threads do OpenCV para
+    rodar antes de criar os trabalhadores (processos criados por fork depois disso podem cair).
+    """
+    if 3 in indices_filtros:
+        with ProcessPoolExecutor(max_workers=1, initializer=inicializar_trabalhador,
+                                 initargs=(threads_opencv, motor_suavizacao, raio_desfoque)) as calibrador:
+            estrategia_por_raio.update(calibrador.submit(_escolher_estrategia_desfoque, raio_desfoque).result())
+    return threads_opencv, motor_suavizacao, raio_desfoque, dict(estrategia_por_raio)
+
+def inicializar_trabalhador(threads_opencv, motor=None, raio=None, estrategias=None):
+    """
+    Configura o motor de filtros em um processo trabalhador: limita as threads internas do OpenCV, para
+    os trabalhadores não disputarem núcleos, e aplica o motor de suavização, o raio do desfoque e as
+    estratégias de desfoque do processo principal.
+    """
+    global motor_suavizacao
+    cv2.setNumThreads(threads_opencv)
+    if motor is not None:
+        motor_suavizacao = motor
+    if raio is not None:
+        definir_raio_desfoque(raio)
+    if estrategias is not None:
+        definir_estrategias_desfoque(estrategias)
+
+# ---------------------------------------
+# Compilador de cadeias de filtros
+# ---------------------------------------
+
+def decompor_filtro(indice_filtro):
+    """
+    Descreve um filtro como uma lista de estágios ('lut', tabela 256x1x3), ('matriz', matriz 3x3)
+    ou ('filtro', índice) para filtros espaciais que não podem ser fundidos.
+    """
+    if 0 <= indice_filtro < len(FILTROS) and FILTROS[indice_filtro].estagios is not None:
+        return list(FILTROS[indice_filtro].estagios)
+    # Desfoque, Kyle+Kendall Slim e índices desconhecidos são aplicados pelo caminho normal.
+    return [('filtro', indice_filtro)]
+
+def _matriz_sem_saturacao(matriz):
+    """
+    Indica se a matriz leva qualquer pixel 0..255 a valores ainda em 0..255 (coeficientes não negativos
+    e linhas com soma até 1), ou seja, se o cv2.transform nunca precisa saturar o resultado dela.
+    """
+    return bool((matriz >= 0).all() and (matriz.sum(axis=1) <= 1 + 1e-9).all())
+
+def compilar_cadeia(indices_filtros):
+    """
+    Compila uma cadeia ordenada de filtros, fundindo estágios pontuais consecutivos em uma única
+    tabela por canal e estágios lineares consecutivos em uma única matriz. Matrizes só são fundidas
+    quando a anterior não satura (ex.: a sépia satura, a de cinza não): a saturação entre as duas
+    deixaria de acontecer. O resultado fundido pode diferir da aplicação sequencial por arredondamentos.
+    Um filtro pontual sem vizinhos pontuais não tem com quem ser fundido e fica com o caminho direto
+    do registro, mais rápido que os seus estágios e idêntico ao do editor.
+    """
+    compilada = []
+    sequencia = []  # Filtros pontuais consecutivos ainda não compilados.
+    for indice in list(indices_filtros) + [None]:
+        if indice is not None and 0 <= indice < len(FILTROS) and FILTROS[indice].estagios is not None:
+            sequencia.append(indice)
+            continue
+        if len(sequencia) == 1:
+            compilada.append(('filtro', sequencia[0]))
+        elif sequencia:
+            compilada.extend(_fundir_estagios(sequencia))
+        sequencia = []
+        if indice is not None:
+            compilada.append(('filtro', indice))
+    return compilada
+
+def _fundir_estagios(indices_filtros):
+    """
+    Funde os estágios de uma sequência de filtros pontuais (ver compilar_cadeia).
+    Tabelas com a mesma curva nos três canais saem com um canal só, que o cv2.LUT aplica mais rápido.
+    """
+    estagios = []
+    for indice in indices_filtros:
+        for tipo, dados in decompor_filtro(indice):
+            if tipo == 'lut':
+                # Durante a composição as tabelas são manipuladas no formato (256, 3).
+                dados = dados.reshape(256, 3)
+            if estagios and tipo == estagios[-1][0] == 'lut':
+                # Composição de tabelas: o valor de saída da anterior indexa a próxima, canal a canal.
+                estagios[-1] = ('lut', dados[estagios[-1][1], np.arange(3)])
+            elif estagios and tipo == estagios[-1][0] == 'matriz' and _matriz_sem_saturacao(estagios[-1][1]):
+                # Composição de transformações lineares: a matriz mais recente multiplica à esquerda.
+                estagios[-1] = ('matriz', dados @ estagios[-1][1])
+            else:
+                estagios.append((tipo, dados))
+    # As tabelas são guardadas nos formatos esperados pelo cv2.LUT: (256,) ou (256, 1, 3).
+    return [(tipo, _formato_lut(dados) if tipo == 'lut' else dados) for tipo, dados in estagios]
+
+def _formato_lut(tabela):
+    """
+    Converte uma tabela (256, 3) em uma tabela de um canal, se os três canais forem iguais, ou em (256, 1, 3).
+    """
+    if (tabela == tabela[:, :1]).all():
+        return np.ascontiguousarray(tabela[:, 0])
+    return tabela.reshape(256, 1, 3)
+
+def aplicar_cadeia(imagem_base, cadeia_compilada):
+    """
+    Aplica uma cadeia produzida por compilar_cadeia, com uma chamada do OpenCV por estágio fundido.
+    """
+    if imagem_base is None:
+        return None
+    resultado = imagem_base
+    for tipo, dados in cadeia_compilada:
+        if tipo == 'lut':
+            resultado = cv2.LUT(resultado, dados)
+        elif tipo == 'matriz':
+            resultado = cv2.transform(resultado, dados)
+        else:
+            resultado = aplicar_filtro_generico(resultado, dados)
+    # Garante que o chamador sempre receba uma nova imagem, como em aplicar_filtro_generico.
+    return resultado.copy() if resultado is imagem_base else resultado
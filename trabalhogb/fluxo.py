@@ -0,0 +1,179 @@
+"""
+Modo filtro de pipe: lê frames rawvideo BGR24 de um tamanho fixo da entrada padrão, aplica o filtro
+(ou cadeia) e os adesivos, e escreve os frames na saída padrão, para encaixar o editor no meio de um
+pipeline do ffmpeg sem arquivos temporários. Exemplo:
+
+    ffmpeg -i entrada.mp4 -f rawvideo -pix_fmt bgr24 - \\
+      | python "Versão Final.py" --fluxo 1280x720 --filtro 8 \\
+      | ffmpeg -f rawvideo -pix_fmt bgr24 -s 1280x720 -r 30 -i - saida.mp4
+
+Leitura, processamento e escrita rodam em threads próprias ligadas por filas de buffers pré-alocados,
+então a vazão é limitada pelo estágio mais lento. Mensagens vão para a saída de erro: a saída padrão é do vídeo.
+"""
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+from filtros import compilar_cadeia, aplicar_cadeia, aplicar_filtro_generico
+from adesivos import adesivos_fora, preparar_colocacoes, compor_colocacoes
+
+def resolver_tamanho(texto):
+    """
+    Converte "LARGxALT" (ex.: "1280x720") em (largura, altura).
+    """
+    try:
+        largura, altura = (int(valor) for valor in texto.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Tamanho de frame inválido: {texto} (use LARGxALT, ex.: 1280x720)")
+    if largura <= 0 or altura <= 0:
+        raise ValueError(f"Tamanho de frame inválido: {texto}")
+    return largura, altura
+
+def _ler_quadro(entrada, vista):
+    """
+    Preenche a memória do buffer com um frame inteiro usando readinto, sem criar objetos bytes.
+    Retorna o número de bytes lidos (menor que o frame só no fim da entrada).
+    """
+    lidos = 0
+    while lidos < len(vista):
+        quantidade = entrada.readinto(vista[lidos:])
+        if not quantidade:
+            break
+        lidos += quantidade
+    return lidos
+
+class FiltroDePipe:
+    """
+    Os três estágios do modo pipe. Cada estágio pega um buffer livre, trabalha nele e o entrega ao
+    próximo estágio; os buffers voltam às filas de livres depois de usados, então nenhum frame é alocado
+    durante o fluxo. Com 'buffers' frames em cada ponta, leitura e escrita podem adiantar-se ao processamento.
+    """
+
+    def __init__(self, largura, altura, cadeia, colocacoes=(), entrada=None, saida=None, buffers=3):
+        self.forma = (altura, largura, 3)
+        self.cadeia = tuple(cadeia)
+        self.entrada = entrada if entrada is not None else sys.stdin.buffer
+        self.saida = saida if saida is not None else sys.stdout.buffer
+        self.colocacoes = preparar_colocacoes(colocacoes)
+        # Um filtro só é aplicado direto no buffer de saída; cadeias passam pelo compilador.
+        self._cadeia_compilada = compilar_cadeia(self.cadeia) if len(self.cadeia) > 1 else None
+        self._livres_entrada = queue.Queue()
+        self._livres_saida = queue.Queue()
+        for _ in range(buffers):
+            self._livres_entrada.put(np.empty(self.forma, np.uint8))
+            self._livres_saida.put(np.empty(self.forma, np.uint8))
+        # Filas de frames prontos; None sinaliza o fim do fluxo para o estágio seguinte.
+        self._lidos = queue.Queue()
+        self._processados = queue.Queue()
+        self._parar = threading.Event()
+        self.quadros = 0
+        self.erro = None
+        self.saida_fechada = False  # O programa que lia a saída fechou o pipe antes do fim da entrada.
+
+    def executar(self):
+        """
+        Processa a entrada até o fim e retorna o número de frames escritos.
+        """
+        threads = [threading.Thread(target=self._estagio, args=(funcao, seguinte), daemon=True)
+                   for funcao, seguinte in ((self._ler, self._lidos), (self._processar, self._processados))]
+        for thread in threads:
+            thread.start()
+        self._estagio(self._escrever)  # A escrita roda na thread principal.
+        for thread in threads:
+            thread.join()
+        return self.quadros
+
+    def _estagio(self, funcao, seguinte=None):
+        """
+        Executa um estágio e, ao terminar, avisa o fim ao estágio seguinte pela fila 'seguinte'.
+        Uma exceção em qualquer estágio encerra os outros.
+        """
+        try:
+            funcao()
+        except BrokenPipeError:
+            self._parar.set()  # O programa seguinte fechou o pipe: não há para onde escrever.
+            self.saida_fechada = True
+            if self.saida is sys.stdout.buffer:
+                # Evita o erro do Python ao tentar esvaziar a saída padrão na saída do programa.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except Exception as erro:
+            self.erro = erro
+            self._parar.set()
+        finally:
+            if seguinte is not None:
+                seguinte.put(None)
+
+    def _obter(self, fila):
+        """
+        Retira um item da fila, desistindo se o fluxo for interrompido.
+        """
+        while not self._parar.is_set():
+            try:
+                return fila.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _ler(self):
+        tamanho_quadro = int(np.prod(self.forma))
+        while True:
+            buffer = self._obter(self._livres_entrada)
+            if buffer is None:
+                return
+            lidos = _ler_quadro(self.entrada, memoryview(buffer).cast('B'))
+            if lidos < tamanho_quadro:
+                if lidos:
+                    print(f"Entrada terminou no meio de um frame ({lidos} de {tamanho_quadro} bytes); "
+                          f"o frame incompleto foi descartado.", file=sys.stderr)
+                return
+            self._lidos.put(buffer)
+
+    def _processar(self):
+        while True:
+            quadro = self._lidos.get()
+            if quadro is None:
+                return
+            destino = self._obter(self._livres_saida)
+            if destino is None:
+                return
+            if self._cadeia_compilada is None:
+                aplicar_filtro_generico(quadro, self.cadeia[0] if self.cadeia else 0, destino=destino)
+            else:
+                np.copyto(destino, aplicar_cadeia(quadro, self._cadeia_compilada))
+            self._livres_entrada.put(quadro)
+            compor_colocacoes(destino, self.colocacoes)
+            self._processados.put(destino)
+
+    def _escrever(self):
+        while True:
+            quadro = self._processados.get()
+            if quadro is None:
+                break
+            self.saida.write(memoryview(quadro).cast('B'))
+            self.quadros += 1
+            self._livres_saida.put(quadro)
+        self.saida.flush()
+
+def processar_fluxo(largura, altura, cadeia, colocacoes=(), entrada=None, saida=None, buffers=3):
+    """
+    Filtra os frames da entrada padrão para a saída padrão e relata a vazão na saída de erro.
+    Retorna True se o fluxo terminou sem erros.
+    """
+    for nome, x, y in adesivos_fora(colocacoes, largura, altura):
+        print(f"O adesivo {nome} em ({x}, {y}) não cabe no frame ({largura}x{altura}).", file=sys.stderr)
+        return False
+    filtro = FiltroDePipe(largura, altura, cadeia, colocacoes, entrada, saida, buffers)
+    inicio = time.perf_counter()
+    quadros = filtro.executar()
+    duracao = time.perf_counter() - inicio
+    if filtro.erro is not None:
+        print(f"Erro no modo pipe: {filtro.erro!r}", file=sys.stderr)
+        return False
+    print(f"{quadros} frames {largura}x{altura} filtrados em {duracao:.2f} s "
+          f"({quadros / duracao if duracao > 0 else 0:.1f} frames/s)"
+          f"{'; a saída foi fechada antes do fim da entrada' if filtro.saida_fechada else ''}", file=sys.stderr)
+    return True
@@ -0,0 +1,246 @@
+"""
+Fontes de frames para o modo ao vivo: câmera, arquivo de vídeo, diretório com uma sequência de imagens
+e frames sintéticos. Todas seguem a interface de leitura do cv2.VideoCapture (isOpened/read/release),
+que é a usada pelo pipeline, então o pipeline pode ser executado e medido em máquinas sem câmera.
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Extensões de arquivo consideradas imagens ao percorrer diretórios (modo em lote e sequências de imagens).
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif')
+
+def listar_imagens(entradas):
+    """
+    Expande diretórios e padrões glob na lista ordenada de arquivos de imagem (modo em lote e sequências).
+    """
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            # Diretórios são percorridos recursivamente, mantendo apenas arquivos de imagem.
+            for pasta, _, arquivos in os.walk(entrada):
+                for arquivo in sorted(arquivos):
+                    if arquivo.lower().endswith(EXTENSOES_IMAGEM):
+                        caminhos.append(os.path.join(pasta, arquivo))
+        else:
+            # Arquivos e padrões glob (ex.: "fotos/*.jpg") são expandidos pelo módulo glob.
+            caminhos.extend(sorted(c for c in glob.glob(entrada, recursive=True) if os.path.isfile(c)))
+    # Remove duplicatas preservando a ordem em que os arquivos foram encontrados.
+    return list(dict.fromkeys(caminhos))
+
+class FonteDeFrames:
+    """
+    Base das fontes de frames. Fontes de arquivo podem entregar os frames no ritmo do FPS
+    ('tempo_real', como uma câmera) ou tão rápido quanto forem lidos ('maximo', para medir vazão).
+    'limite_quadros' encerra a fonte depois de tantos frames (útil com fontes repetidas ou sintéticas).
+    """
+
+    def __init__(self, fps=30.0, tempo_real=True, limite_quadros=None):
+        self.fps = fps
+        self.tempo_real = tempo_real
+        self.limite_quadros = limite_quadros
+        self.quadros_lidos = 0
+        self._proximo = None   # Instante em que o próximo frame deve ser entregue no modo tempo real.
+
+    def isOpened(self):
+        return True
+
+    @property
+    def fps_entrega(self):
+        """
+        FPS em que os frames chegam de fato, se a fonte segue um ritmo; None no ritmo máximo, em que
+        os frames chegam tão rápido quanto forem lidos.
+        """
+        return self.fps if self.tempo_real else None
+
+    def read(self, imagem=None):
+        """
+        Lê o próximo frame, escrevendo-o em 'imagem' quando for um buffer com a forma certa.
+        Retorna (True, frame) ou (False, None) quando a fonte termina.
+        """
+        if self.limite_quadros is not None and self.quadros_lidos >= self.limite_quadros:
+            return False, None
+        ok, frame = self._ler(imagem)
+        if not ok:
+            return False, None
+        self._aguardar_vez()
+        self.quadros_lidos += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+    def _ler(self, imagem):
+        raise NotImplementedError
+
+    def _aguardar_vez(self):
+        """
+        No modo tempo real, espera até o instante do frame. Se a leitura atrasar, o relógio é
+        reajustado em vez de entregar uma rajada de frames para compensar.
+        """
+        if not self.tempo_real or not self.fps:
+            return
+        agora = time.perf_counter()
+        if self._proximo is not None and self._proximo > agora:
+            time.sleep(self._proximo - agora)
+            agora = self._proximo
+        self._proximo = agora + 1.0 / self.fps
+
+def _no_destino(frame, imagem):
+    """
+    Copia o frame para o buffer recebido, se ele tiver a mesma forma; senão devolve o próprio frame.
+    """
+    if imagem is None or imagem.shape != frame.shape or imagem.dtype != frame.dtype:
+        return frame
+    np.copyto(imagem, frame)
+    return imagem
+
+class FonteCamera(FonteDeFrames):
+    """
+    Câmera pelo índice do dispositivo; o ritmo é o da própria câmera.
+    """
+
+    def __init__(self, indice=0, limite_quadros=None):
+        self.captura = cv2.VideoCapture(indice)
+        super().__init__(self.captura.get(cv2.CAP_PROP_FPS) or 30.0, False, limite_quadros)
+
+    def isOpened(self):
+        return self.captura.isOpened()
+
+    @property
+    def fps_entrega(self):
+        return self.fps  # A própria câmera dita o ritmo.
+
+    def _ler(self, imagem):
+        return self.captura.read(imagem)
+
+    def release(self):
+        self.captura.release()
+
+class FonteVideo(FonteDeFrames):
+    """
+    Arquivo de vídeo (ou qualquer endereço aceito pelo cv2.VideoCapture); o FPS vem do próprio arquivo.
+    Com 'repetir', volta ao início quando o vídeo acaba.
+    """
+
+    def __init__(self, caminho, tempo_real=True, repetir=False, limite_quadros=None):
+        self.caminho = caminho
+        self.repetir = repetir
+        self.captura = cv2.VideoCapture(caminho)
+        super().__init__(self.captura.get(cv2.CAP_PROP_FPS) or 30.0, tempo_real, limite_quadros)
+
+    def isOpened(self):
+        return self.captura.isOpened()
+
+    def _ler(self, imagem):
+        ok, frame = self.captura.read(imagem)
+        if not ok and self.repetir and self.quadros_lidos:
+            self.captura.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.captura.read(imagem)
+        return ok, frame
+
+    def release(self):
+        self.captura.release()
+
+class FonteSequencia(FonteDeFrames):
+    """
+    Imagens de um diretório, em ordem de nome, entregues como frames de um vídeo. Imagens de tamanho
+    diferente da primeira são redimensionadas para ele, já que o pipeline espera frames de tamanho fixo.
+    """
+
+    def __init__(self, diretorio, fps=30.0, tempo_real=True, repetir=False, limite_quadros=None):
+        self.caminhos = listar_imagens([diretorio])
+        self.repetir = repetir
+        self.tamanho = None   # (largura, altura) da primeira imagem.
+        self._posicao = 0
+        super().__init__(fps, tempo_real, limite_quadros)
+
+    def isOpened(self):
+        return bool(self.caminhos)
+
+    def _ler(self, imagem):
+        while True:
+            if self._posicao >= len(self.caminhos):
+                if not self.repetir or not self.quadros_lidos:
+                    return False, None
+                self._posicao = 0
+            caminho = self.caminhos[self._posicao]
+            self._posicao += 1
+            frame = cv2.imread(caminho)
+            if frame is not None:
+                break
+            print(f"Imagem ignorada na sequência (não pôde ser lida): {caminho}")
+        if self.tamanho is None:
+            self.tamanho = (frame.shape[1], frame.shape[0])
+        if (frame.shape[1], frame.shape[0]) != self.tamanho:
+            destino = imagem if imagem is not None and imagem.shape == (self.tamanho[1], self.tamanho[0], 3) else None
+            return True, cv2.resize(frame, self.tamanho, dst=destino, interpolation=cv2.INTER_AREA)
+        return True, _no_destino(frame, imagem)
+
+class FonteSintetica(FonteDeFrames):
+    """
+    Frames gerados: um padrão fixo de gradientes, bordas e ruído deslizando na horizontal. O conteúdo
+    de cada frame depende só do seu número, então execuções diferentes processam exatamente os mesmos frames.
+    """
+
+    def __init__(self, largura=1280, altura=720, fps=30.0, tempo_real=True, limite_quadros=None, velocidade=4):
+        self.largura = largura
+        self.altura = altura
+        self.velocidade = velocidade   # Pixels deslocados por frame.
+        self.padrao = self._gerar_padrao(largura, altura)
+        super().__init__(fps, tempo_real, limite_quadros)
+
+    @staticmethod
+    def _gerar_padrao(largura, altura):
+        gerador = np.random.default_rng(0)
+        y, x = np.mgrid[0:altura, 0:largura].astype(np.float32)
+        padrao = np.empty((altura, largura, 3), dtype=np.uint8)
+        padrao[..., 0] = 255 * x / largura
+        padrao[..., 1] = 255 * y / altura
+        padrao[..., 2] = 127.5 + 127.5 * np.sin(x / 37.0) * np.cos(y / 23.0)
+        for _ in range(30):
+            x0, y0 = int(gerador.integers(0, largura)), int(gerador.integers(0, altura))
+            cor = tuple(int(c) for c in gerador.integers(0, 256, 3))
+            cv2.rectangle(padrao, (x0, y0), (x0 + largura // 10, y0 + altura // 10), cor, -1)
+        ruido = gerador.integers(0, 16, padrao.shape, dtype=np.uint8)
+        return cv2.add(padrao, ruido)
+
+    def _ler(self, imagem):
+        if imagem is None or imagem.shape != self.padrao.shape:
+            imagem = np.empty_like(self.padrao)
+        deslocamento = (self.quadros_lidos * self.velocidade) % self.largura
+        # Rotação horizontal do padrão escrita direto no buffer, sem frames intermediários.
+        imagem[:, :self.largura - deslocamento] = self.padrao[:, deslocamento:]
+        imagem[:, self.largura - deslocamento:] = self.padrao[:, :deslocamento]
+        return True, imagem
+
+def abrir_fonte(especificacao, tempo_real=True, repetir=False, limite_quadros=None):
+    """
+    Abre a fonte descrita por um texto:
+      "0", "1"...                     câmera com esse índice
+      "sintetico[:LARGxALT[@FPS]]"    frames sintéticos (padrão 1280x720 a 30 FPS)
+      um diretório                    sequência de imagens (30 FPS)
+      qualquer outro texto            arquivo de vídeo ou endereço aceito pelo OpenCV
+    """
+    especificacao = str(especificacao).strip()
+    if especificacao.isdigit():
+        return FonteCamera(int(especificacao), limite_quadros)
+    if especificacao.split(':', 1)[0].lower() in ('sintetico', 'sintético'):
+        largura, altura, fps = 1280, 720, 30.0
+        if ':' in especificacao:
+            parametros = especificacao.split(':', 1)[1]
+            try:
+                if '@' in parametros:
+                    parametros, texto_fps = parametros.split('@', 1)
+                    fps = float(texto_fps)
+                if parametros:
+                    largura, altura = (int(valor) for valor in parametros.lower().split('x'))
+            except ValueError:
+                raise ValueError(f"Fonte sintética inválida: {especificacao} (use sintetico:LARGxALT@FPS)")
+        return FonteSintetica(largura, altura, fps, tempo_real, limite_quadros)
+    if os.path.isdir(especificacao):
+        return FonteSequencia(especificacao, tempo_real=tempo_real, repetir=repetir, limite_quadros=limite_quadros)
+    return FonteVideo(especificacao, tempo_real, repetir, limite_quadros)
@@ -0,0 +1,243 @@
+"""
+Fila limitada entre estágios e gravação de vídeo assíncrona, usadas pelo pipeline da webcam e pelos
+vários fluxos simultâneos (multiplos_fluxos.py). Não dependem da interface.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from filtros import pool_frames, aplicar_filtro_generico
+from instrumentacao import MedidorDeEtapas
+
+class FilaLimitada:
+    """
+    Fila limitada entre dois estágios do pipeline, com política de descarte e métricas de ocupação.
+    'manter_ultimo' descarta o item mais antigo quando a fila está cheia (menor latência);
+    'manter_todos' bloqueia o produtor até haver espaço (nenhum frame é perdido).
+    """
+
+    def __init__(self, nome, capacidade=2, politica='manter_ultimo', ao_descartar=None):
+        if politica not in ('manter_ultimo', 'manter_todos'):
+            raise ValueError(f"Política de fila desconhecida: {politica}")
+        self.nome = nome
+        self.capacidade = capacidade
+        self.politica = politica
+        self.ao_descartar = ao_descartar  # Chamada com cada item descartado (ex.: devolver o buffer ao pool).
+        self.inseridos = 0
+        self.descartados = 0
+        self.profundidade_maxima = 0
+        self._soma_profundidade = 0
+        self._itens = deque()
+        self._condicao = threading.Condition()
+        self._fechada = False
+
+    def colocar(self, item):
+        """
+        Insere um item; retorna False se a fila já tiver sido fechada.
+        """
+        descartado = None
+        with self._condicao:
+            if self.politica == 'manter_todos':
+                while len(self._itens) >= self.capacidade and not self._fechada:
+                    self._condicao.wait()
+            if self._fechada:
+                descartado = item
+            else:
+                if len(self._itens) >= self.capacidade:
+                    # Política 'manter_ultimo': o frame mais antigo dá lugar ao mais novo.
+                    descartado = self._itens.popleft()
+                    self.descartados += 1
+                self._itens.append(item)
+                self.inseridos += 1
+                self._soma_profundidade += len(self._itens)
+                self.profundidade_maxima = max(self.profundidade_maxima, len(self._itens))
+                self._condicao.notify_all()
+        if descartado is not None and self.ao_descartar is not None:
+            self.ao_descartar(descartado)
+        return descartado is not item
+
+    def obter(self, timeout=None):
+        """
+        Retira o item mais antigo. Retorna None se o tempo esgotar ou se a fila estiver fechada e vazia.
+        """
+        with self._condicao:
+            if not self._condicao.wait_for(lambda: self._itens or self._fechada, timeout):
+                return None
+            if not self._itens:
+                return None
+            item = self._itens.popleft()
+            self._condicao.notify_all()
+            return item
+
+    def fechar(self):
+        """
+        Fecha a fila: produtores bloqueados são liberados e consumidores recebem None quando ela esvaziar.
+        """
+        with self._condicao:
+            self._fechada = True
+            self._condicao.notify_all()
+
+    @property
+    def profundidade(self):
+        """
+        Número de itens esperando na fila.
+        """
+        with self._condicao:
+            return len(self._itens)
+
+    @property
+    def encerrada(self):
+        """
+        Indica se a fila foi fechada e não tem mais itens a entregar.
+        """
+        with self._condicao:
+            return self._fechada and not self._itens
+
+    def metricas(self):
+        """
+        Retorna as métricas de ocupação acumuladas da fila.
+        """
+        with self._condicao:
+            return {
+                'fila': self.nome,
+                'profundidade_atual': len(self._itens),
+                'profundidade_media': self._soma_profundidade / self.inseridos if self.inseridos else 0.0,
+                'profundidade_maxima': self.profundidade_maxima,
+                'inseridos': self.inseridos,
+                'descartados': self.descartados,
+            }
+
+class GravadorDeVideo:
+    """
+    Gravação de vídeo assíncrona: os frames entram em uma fila limitada e são codificados em uma
+    thread própria, então travadas do codificador não aparecem como engasgos na interface ou no fluxo.
+    O FPS do arquivo é medido a partir dos instantes de captura dos primeiros frames recebidos, e
+    depois cada frame vai para a posição que o seu instante ocupa em uma linha do tempo de FPS constante:
+    lacunas (captura atrasada, frames descartados) são preenchidas repetindo o frame anterior, e frames
+    que chegam antes da vez são pulados, então a duração do vídeo acompanha a da gravação.
+    Frames enviados sem efeitos (com o índice do filtro) são filtrados nesta thread, em resolução
+    total, e recebem os adesivos por 'compor_adesivos' antes de serem codificados; se isso não
+    acompanhar o ritmo da captura, a gravação passa a receber os frames da prévia (ver acompanha_resolucao_total).
+    """
+
+    def __init__(self, caminho, tamanho, capacidade=32, frames_para_medir=10, fps_padrao=30.0, codec='mp4v',
+                 atraso_maximo=4, fps=None, medidor=None, compor_adesivos=None):
+        self.caminho = caminho
+        self.tamanho = tamanho                    # (largura, altura) dos frames gravados.
+        self.frames_para_medir = frames_para_medir
+        self.fps_padrao = fps_padrao              # Usado se não houver frames suficientes para medir.
+        self.codec = codec
+        self.fps = fps                            # FPS gravado no arquivo; medido pelos frames se None.
+        self.codificados = 0                      # Frames escritos no arquivo, contando as repetições.
+        self.duplicados = 0                       # Repetições escritas para preencher lacunas.
+        self.pulados = 0                          # Frames que chegaram antes da sua posição e não foram escritos.
+        self.atraso_maximo = atraso_maximo        # Frames na fila a partir dos quais a resolução total está atrasada.
+        self.resolucao_total = True               # False depois que o filtro em resolução total ficou para trás.
+        self.medidor = medidor if medidor is not None else MedidorDeEtapas()  # Mede a etapa 'codificacao'.
+        self.compor_adesivos = compor_adesivos    # Compõe os adesivos nos frames filtrados aqui (ou None).
+        # Se o codificador não acompanhar, os frames mais antigos da fila são descartados (e contados).
+        self.fila = FilaLimitada('gravacao', capacidade, 'manter_ultimo', lambda item: pool_frames.devolver(item[0]))
+        self._writer = None
+        self._pendentes = []                      # Frames guardados enquanto o FPS ainda está sendo medido.
+        self._inicio = None                       # Instante do primeiro frame, a posição 0 da linha do tempo.
+        self._ultimo = None                       # Último frame escrito, repetido para preencher lacunas.
+        self._thread = threading.Thread(target=self._codificar, daemon=True)
+        self._thread.start()
+
+    @property
+    def descartados(self):
+        """
+        Frames descartados porque o codificador ficou para trás.
+        """
+        return self.fila.descartados
+
+    def acompanha_resolucao_total(self):
+        """
+        Indica se o gravador ainda pode receber frames sem efeitos para filtrá-los em resolução total.
+        Quando a fila acumula 'atraso_maximo' frames, filtro e codificação não estão acompanhando a captura;
+        a partir daí a gravação usa os frames da prévia, com um aviso, em vez de deixar a fila descartar frames.
+        O limite é baixo para que os frames ainda por filtrar sejam escritos antes de a fila encher.
+        """
+        if self.resolucao_total and self.fila.profundidade >= self.atraso_maximo:
+            self.resolucao_total = False
+            print("Aviso: o filtro em resolução total não acompanha a captura; "
+                  "a gravação continua com os frames da prévia.")
+        return self.resolucao_total
+
+    def gravar(self, frame, instante=None, indice_filtro=None):
+        """
+        Enfileira uma cópia do frame para codificação; 'instante' é o momento da captura (perf_counter).
+        Com 'indice_filtro', o frame ainda não tem efeitos e o filtro é aplicado antes da codificação.
+        """
+        copia = pool_frames.obter(frame.shape)
+        np.copyto(copia, frame)
+        return self.fila.colocar((copia, time.perf_counter() if instante is None else instante, indice_filtro))
+
+    def finalizar(self):
+        """
+        Codifica os frames que ainda estão na fila e fecha o arquivo.
+        """
+        self.fila.fechar()
+        self._thread.join()
+
+    def _codificar(self):
+        while True:
+            item = self.fila.obter()
+            if item is None:
+                break
+            if self._writer is None:
+                self._pendentes.append(item)
+                if self.fps is not None or len(self._pendentes) >= self.frames_para_medir:
+                    self._abrir()
+            else:
+                self._escrever(item)
+        # Gravações curtas: abre o arquivo com o que foi possível medir.
+        if self._writer is None and self._pendentes:
+            self._abrir()
+        if self._writer is not None:
+            self._writer.release()
+        pool_frames.devolver(self._ultimo)
+        self._ultimo = None
+
+    def _abrir(self):
+        """
+        Mede o FPS pelos instantes dos frames pendentes (se não foi informado), abre o arquivo e escreve esses frames.
+        """
+        if self.fps is None:
+            intervalos = np.diff([item[1] for item in self._pendentes])
+            intervalo = float(np.median(intervalos)) if len(intervalos) else 0.0
+            self.fps = 1.0 / intervalo if intervalo > 0 else self.fps_padrao
+        self._inicio = self._pendentes[0][1]
+        self._writer = cv2.VideoWriter(self.caminho, cv2.VideoWriter_fourcc(*self.codec), self.fps, self.tamanho)
+        for item in self._pendentes:
+            self._escrever(item)
+        self._pendentes = []
+
+    def _escrever(self, item):
+        frame, instante, indice_filtro = item
+        # Posição do frame na linha do tempo de FPS constante que começa no primeiro frame.
+        posicao = round((instante - self._inicio) * self.fps)
+        if posicao < self.codificados:
+            # A posição já foi ocupada: escrever o frame adiantaria o resto do vídeo.
+            self.pulados += 1
+            pool_frames.devolver(frame)
+            return
+        if indice_filtro is not None:
+            processado = aplicar_filtro_generico(frame, indice_filtro, destino=pool_frames.obter(frame.shape))
+            if self.compor_adesivos is not None:
+                self.compor_adesivos(processado)
+            pool_frames.devolver(frame)
+            frame = processado
+        inicio = self.medidor.inicio()
+        while self._ultimo is not None and self.codificados < posicao:
+            self._writer.write(self._ultimo)
+            self.codificados += 1
+            self.duplicados += 1
+        self._writer.write(frame)
+        self.medidor.fim('codificacao', inicio)
+        self.codificados += 1
+        pool_frames.devolver(self._ultimo)
+        self._ultimo = frame
@@ -0,0 +1,132 @@
+"""
+Instrumentação por etapa dos frames: duração de cada etapa (captura, filtro, adesivos, gravação, composição,
+exibição...) com percentis móveis, texto para o HUD da janela e exportação dos eventos em formato de trace
+do Chrome (chrome://tracing, Perfetto) ou CSV. Desligada, cada medição custa só uma chamada de função.
+"""
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+class MedidorDeEtapas:
+    """
+    Registra quanto tempo cada etapa levou em cada frame.
+
+    Uso: `inicio = medidor.inicio()` antes da etapa e `medidor.fim('filtro', inicio, quadro)` depois.
+    As últimas `janela` durações de cada etapa alimentam os percentis (p50/p95/p99); os eventos completos,
+    até `limite_eventos`, ficam guardados para exportação. Pode ser usado por várias threads ao mesmo tempo.
+    """
+
+    def __init__(self, ativo=False, janela=300, limite_eventos=200000):
+        self.ativo = ativo
+        self.janela = janela
+        self.duracoes = {}                            # Etapa -> deque das últimas durações (s).
+        self.eventos = deque(maxlen=limite_eventos)   # (etapa, id da thread, início, duração, quadro).
+        self.nomes_threads = {}                       # Id da thread -> nome, para o trace.
+        self.origem = time.perf_counter()             # Instante zero dos eventos exportados.
+        self._trava = threading.Lock()
+
+    def inicio(self):
+        """
+        Instante de início de uma etapa (0.0 se a instrumentação estiver desligada).
+        """
+        return time.perf_counter() if self.ativo else 0.0
+
+    def fim(self, etapa, inicio, quadro=None):
+        """
+        Registra a etapa que começou em `inicio` e terminou agora.
+        """
+        if not self.ativo or not inicio:
+            return
+        agora = time.perf_counter()
+        self.registrar(etapa, inicio, agora - inicio, quadro)
+
+    def registrar(self, etapa, inicio, duracao, quadro=None):
+        """
+        Registra uma duração já medida (ex.: a latência da captura até a exibição).
+        """
+        if not self.ativo:
+            return
+        duracoes = self.duracoes.get(etapa)
+        if duracoes is None:
+            with self._trava:
+                duracoes = self.duracoes.setdefault(etapa, deque(maxlen=self.janela))
+        duracoes.append(duracao)
+        thread = threading.get_ident()
+        if thread not in self.nomes_threads:
+            self.nomes_threads[thread] = threading.current_thread().name
+        self.eventos.append((etapa, thread, inicio, duracao, quadro))
+
+    def percentis(self, etapa, quantis=(50, 95, 99)):
+        """
+        Percentis, em milissegundos, das últimas durações da etapa (None se ainda não houver medições).
+        """
+        duracoes = self.duracoes.get(etapa)
+        if not duracoes:
+            return None
+        return tuple(np.percentile(np.fromiter(list(duracoes), float), quantis) * 1000)
+
+    def resumo(self):
+        """
+        Retorna {etapa: (p50, p95, p99, quantidade na janela)}, com os tempos em milissegundos.
+        """
+        resumo = {}
+        for etapa in list(self.duracoes):
+            p50, p95, p99 = self.percentis(etapa)
+            resumo[etapa] = (p50, p95, p99, len(self.duracoes[etapa]))
+        return resumo
+
+    def linhas_hud(self, etapa_intervalo='intervalo', etapa_latencia='latencia'):
+        """
+        Linhas de texto do HUD: FPS (pelo intervalo entre frames exibidos), latência e o p50/p95/p99 de cada etapa.
+        """
+        linhas = []
+        intervalo = self.percentis(etapa_intervalo)
+        latencia = self.percentis(etapa_latencia)
+        if intervalo is not None:
+            texto = f"FPS {1000 / intervalo[0]:5.1f}" if intervalo[0] > 0 else "FPS  -"
+            if latencia is not None:
+                texto += f"   latencia p50 {latencia[0]:5.1f}  p95 {latencia[1]:5.1f} ms"
+            linhas.append(texto)
+        for etapa, (p50, p95, p99, _) in self.resumo().items():
+            if etapa in (etapa_intervalo, etapa_latencia):
+                continue
+            linhas.append(f"{etapa:<11}{p50:7.1f}{p95:7.1f}{p99:7.1f} ms")
+        return linhas
+
+    def imprimir_resumo(self):
+        """
+        Imprime a tabela de percentis de todas as etapas.
+        """
+        print(f"{'etapa':<12}{'p50':>8}{'p95':>8}{'p99':>8}  (ms, últimos frames)")
+        for etapa, (p50, p95, p99, quantidade) in self.resumo().items():
+            print(f"{etapa:<12}{p50:8.2f}{p95:8.2f}{p99:8.2f}  ({quantidade})")
+
+    def exportar(self, caminho):
+        """
+        Exporta os eventos registrados: em CSV se o caminho terminar em .csv, senão como trace do Chrome (JSON).
+        """
+        eventos = list(self.eventos)
+        if caminho.lower().endswith('.csv'):
+            with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+                escritor = csv.writer(arquivo)
+                escritor.writerow(['quadro', 'etapa', 'thread', 'inicio_ms', 'duracao_ms'])
+                for etapa, thread, inicio, duracao, quadro in eventos:
+                    escritor.writerow(['' if quadro is None else quadro, etapa, self.nomes_threads.get(thread, thread),
+                                       f"{(inicio - self.origem) * 1000:.3f}", f"{duracao * 1000:.3f}"])
+        else:
+            # Eventos "X" (completos) com início e duração em microssegundos, mais os nomes das threads.
+            trace = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": thread, "args": {"name": nome}}
+                     for thread, nome in self.nomes_threads.items()]
+            for etapa, thread, inicio, duracao, quadro in eventos:
+                evento = {"name": etapa, "ph": "X", "pid": 1, "tid": thread,
+                          "ts": round((inicio - self.origem) * 1e6, 1), "dur": round(duracao * 1e6, 1)}
+                if quadro is not None:
+                    evento["args"] = {"quadro": quadro}
+                trace.append(evento)
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, arquivo)
+        print(f"{len(eventos)} eventos de tempo exportados para {caminho}")
@@ -0,0 +1,118 @@
+"""
+Modo em lote: aplica um filtro ou uma cadeia de filtros a muitas imagens em um pool de processos,
+sem interface gráfica. Só depende do motor de filtros (e da listagem de imagens de fontes.py).
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from filtros import nomes_filtros, compilar_cadeia, aplicar_cadeia, argumentos_trabalhador, inicializar_trabalhador
+from fontes import listar_imagens
+
+def resolver_filtro(identificador):
+    """
+    Converte um índice ("3") ou nome ("Desfoque") de filtro no índice correspondente em nomes_filtros.
+    """
+    identificador = str(identificador).strip()
+    # Aceita o índice numérico diretamente, desde que esteja dentro da faixa de filtros.
+    if identificador.isdigit():
+        indice = int(identificador)
+        if indice < len(nomes_filtros):
+            return indice
+    # Caso contrário, procura o nome do filtro ignorando maiúsculas e minúsculas.
+    for indice, nome in enumerate(nomes_filtros):
+        if nome.lower() == identificador.lower():
+            return indice
+    raise ValueError(f"Filtro desconhecido: {identificador}")
+
+def resolver_cadeia(texto):
+    """
+    Converte uma lista de filtros separados por vírgula ("9,Vintage,7") na lista de índices correspondente.
+    """
+    return [resolver_filtro(parte) for parte in texto.split(',') if parte.strip()]
+
+def resolver_formato(formato):
+    """
+    Confere se o OpenCV consegue gravar imagens no formato (extensão, com ou sem ponto) e o retorna
+    sem o ponto; None mantém a extensão de cada imagem de entrada.
+    """
+    if not formato:
+        return None
+    formato = formato.strip().lstrip('.')
+    if not formato or not cv2.haveImageWriter(f"saida.{formato}"):
+        raise ValueError(f"Formato de saída não suportado pelo OpenCV: {formato}")
+    return formato
+
+# Cadeias já compiladas em cada processo trabalhador, indexadas pela tupla de índices de filtros.
+_cadeias_compiladas = {}
+
+def _processar_imagem_lote(tarefa):
+    """
+    Decodifica, filtra e codifica uma imagem no processo trabalhador. Retorna (caminho, pixels, erro).
+    """
+    caminho_entrada, caminho_saida, cadeia = tarefa
+    imagem = cv2.imread(caminho_entrada)
+    if imagem is None:
+        return caminho_entrada, 0, "erro ao carregar a imagem"
+    # A cadeia é compilada uma única vez por processo e reutilizada nas imagens seguintes.
+    if cadeia not in _cadeias_compiladas:
+        _cadeias_compiladas[cadeia] = compilar_cadeia(cadeia)
+    resultado = aplicar_cadeia(imagem, _cadeias_compiladas[cadeia])
+    try:
+        if not cv2.imwrite(caminho_saida, resultado):
+            return caminho_entrada, 0, "erro ao salvar a imagem"
+    except (cv2.error, OSError) as erro:
+        # Ex.: extensão sem codificador no OpenCV; a falha fica restrita a esta imagem.
+        return caminho_entrada, 0, f"erro ao salvar a imagem: {getattr(erro, 'err', None) or erro}"
+    return caminho_entrada, imagem.shape[0] * imagem.shape[1], None
+
+def processar_lote(entradas, cadeia, pasta_saida, processos=None, threads_opencv=1, formato=None):
+    """
+    Aplica uma cadeia de filtros (lista de índices) a todas as imagens das entradas usando um conjunto
+    de processos e relata a vazão.
+    """
+    cadeia = tuple(cadeia)
+    caminhos = listar_imagens(entradas)
+    if not caminhos:
+        print("Nenhuma imagem encontrada nas entradas informadas.")
+        return
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    # Monta as tarefas com nomes de saída únicos (arquivos homônimos de pastas diferentes recebem sufixo).
+    tarefas = []
+    nomes_usados = set()
+    for caminho in caminhos:
+        base, extensao = os.path.splitext(os.path.basename(caminho))
+        extensao = f".{formato.lstrip('.')}" if formato else extensao
+        nome, sufixo = base + extensao, 1
+        while nome in nomes_usados:
+            nome = f"{base}_{sufixo}{extensao}"
+            sufixo += 1
+        nomes_usados.add(nome)
+        tarefas.append((caminho, os.path.join(pasta_saida, nome), cadeia))
+
+    processos = processos or os.cpu_count() or 1
+    # Agrupa várias imagens por envio para reduzir o custo de comunicação entre processos.
+    tamanho_bloco = max(1, len(tarefas) // (processos * 8))
+    nomes_cadeia = " -> ".join(nomes_filtros[indice] for indice in cadeia) or nomes_filtros[0]
+    print(f"Processando {len(tarefas)} imagens com '{nomes_cadeia}' em {processos} processos...")
+    argumentos = argumentos_trabalhador(cadeia, threads_opencv)
+
+    inicio = time.perf_counter()
+    processadas, pixels_total, erros = 0, 0, 0
+    with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_trabalhador,
+                             initargs=argumentos) as executor:
+        for caminho, pixels, erro in executor.map(_processar_imagem_lote, tarefas, chunksize=tamanho_bloco):
+            if erro:
+                erros += 1
+                print(f"{caminho}: {erro}")
+            else:
+                processadas += 1
+                pixels_total += pixels
+    duracao = max(time.perf_counter() - inicio, 1e-9)
+
+    # Relata a vazão obtida em imagens por segundo e megapixels por segundo.
+    print(f"{processadas} imagens processadas ({erros} erros) em {duracao:.2f} s: "
+          f"{processadas / duracao:.1f} imagens/s, {pixels_total / 1e6 / duracao:.1f} MP/s")
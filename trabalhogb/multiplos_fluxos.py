@@ -0,0 +1,401 @@
+"""
+Vários fluxos de vídeo ao mesmo tempo, sem interface: cada fonte tem um processo de captura, e os
+fluxos são distribuídos entre processos trabalhadores que aplicam filtro, adesivos e gravação como no
+modo webcam. Os frames passam da captura para o processamento por filas circulares em memória
+compartilhada (multiprocessing.shared_memory), sem serializar arrays. O filtro e os adesivos de cada
+fluxo ficam em um EstadoDoFluxo, e não nas variáveis globais da interface, que só comportam um fluxo.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from filtros import nomes_filtros, aplicar_filtro_generico, argumentos_trabalhador, inicializar_trabalhador
+from adesivos import resolver_adesivo, adesivos_fora, preparar_colocacoes, compor_colocacoes
+from fontes import abrir_fonte
+from gravacao import GravadorDeVideo
+from lote import resolver_filtro
+
+# Cabeçalho de cada posição da fila: número do frame e instante da captura.
+TIPO_CABECALHO = np.dtype([('numero', '<i8'), ('instante', '<f8')])
+
+class AnelDeQuadros:
+    """
+    Fila circular de frames em memória compartilhada entre um produtor e um consumidor (processos
+    diferentes). O semáforo 'livres' conta as posições que o produtor pode preencher e 'prontos' as que
+    o consumidor pode ler; como os dois percorrem as posições na mesma ordem, cada lado só guarda a sua.
+    O frame é lido da fonte direto na memória compartilhada e processado dali, sem cópias intermediárias.
+    O fim do fluxo é sinalizado pelo evento 'terminado', fora das posições: o produtor não precisa
+    esperar uma posição livre para avisar que acabou, mesmo com a fila cheia e o consumidor lento.
+    """
+
+    def __init__(self, forma, posicoes=4, nome=None, livres=None, prontos=None, terminado=None):
+        self.forma = tuple(forma)
+        self.posicoes = posicoes
+        tamanho_cabecalhos = posicoes * TIPO_CABECALHO.itemsize
+        tamanho = tamanho_cabecalhos + posicoes * int(np.prod(self.forma))
+        self.dono = nome is None
+        if self.dono:
+            self.memoria = shared_memory.SharedMemory(create=True, size=tamanho)
+        else:
+            try:
+                self.memoria = shared_memory.SharedMemory(name=nome, track=False)
+            except TypeError:  # Python < 3.13 não tem 'track'.
+                self.memoria = shared_memory.SharedMemory(name=nome)
+        self.cabecalhos = np.ndarray((posicoes,), TIPO_CABECALHO, buffer=self.memoria.buf)
+        self.quadros = np.ndarray((posicoes,) + self.forma, np.uint8, buffer=self.memoria.buf,
+                                  offset=tamanho_cabecalhos)
+        self.livres = livres if livres is not None else multiprocessing.Semaphore(posicoes)
+        self.prontos = prontos if prontos is not None else multiprocessing.Semaphore(0)
+        self.terminado = terminado if terminado is not None else multiprocessing.Event()
+        self._posicao = 0  # Próxima posição deste lado (produtor ou consumidor).
+
+    def descricao(self):
+        """
+        O que outro processo precisa para se conectar à mesma fila (os semáforos vão junto ao criar o processo).
+        """
+        return self.memoria.name, self.forma, self.posicoes, self.livres, self.prontos, self.terminado
+
+    @classmethod
+    def conectar(cls, descricao):
+        nome, forma, posicoes, livres, prontos, terminado = descricao
+        return cls(forma, posicoes, nome, livres, prontos, terminado)
+
+    def reservar(self, timeout=None):
+        """
+        Produtor: retorna a próxima posição livre, ou None se nenhuma liberar dentro do timeout
+        (timeout 0 não espera).
+        """
+        if timeout == 0:
+            disponivel = self.livres.acquire(False)
+        else:
+            disponivel = self.livres.acquire(True, timeout)
+        if not disponivel:
+            return None
+        posicao = self._posicao
+        self._posicao = (self._posicao + 1) % self.posicoes
+        return posicao
+
+    def publicar(self, posicao, numero, instante):
+        """
+        Produtor: entrega ao consumidor o frame escrito na posição.
+        """
+        self.cabecalhos[posicao] = (numero, instante)
+        self.prontos.release()
+
+    def encerrar(self):
+        """
+        Produtor: avisa que não haverá mais frames. Não bloqueia.
+        """
+        self.terminado.set()
+
+    def obter(self, timeout=None):
+        """
+        Consumidor: retorna a posição do próximo frame, ou None se nenhum chegar dentro do timeout.
+        """
+        if timeout == 0:
+            disponivel = self.prontos.acquire(False)
+        else:
+            disponivel = self.prontos.acquire(True, timeout)
+        if not disponivel:
+            return None
+        posicao = self._posicao
+        self._posicao = (self._posicao + 1) % self.posicoes
+        return posicao
+
+    @property
+    def esgotado(self):
+        """
+        Consumidor: indica se o produtor terminou; os frames publicados antes do aviso continuam
+        disponíveis em obter() até acabarem.
+        """
+        return self.terminado.is_set()
+
+    def liberar(self, posicao):
+        """
+        Consumidor: devolve a posição ao produtor depois de usar o frame.
+        """
+        self.livres.release()
+
+    def fechar(self):
+        """
+        Desconecta este processo da memória; quem criou a fila também a remove do sistema.
+        """
+        self.cabecalhos = self.quadros = None
+        self.memoria.close()
+        if self.dono:
+            self.memoria.unlink()
+
+class EstadoDoFluxo:
+    """
+    Estado de um fluxo: fonte, filtro, adesivos colocados e arquivo de gravação. Substitui, para
+    cada fluxo, indice_filtro_atual e adesivos_webcam da interface, que valem para um fluxo só.
+    """
+
+    def __init__(self, nome, fonte, indice_filtro=0, adesivos=(), saida=None):
+        self.nome = nome
+        self.fonte = fonte                       # Especificação aceita por abrir_fonte.
+        self.indice_filtro = indice_filtro
+        self.adesivos = list(adesivos)           # (nome, x, y, escala) de cada adesivo, em ordem.
+        self.saida = saida                       # Arquivo de vídeo gravado, ou None.
+        self.fps = None                          # FPS em que a fonte entrega os frames; None mede pela gravação.
+        self._colocacoes = None                  # Adesivos preparados, criados no processo que compõe.
+
+    def __getstate__(self):
+        # Os adesivos preparados não vão para outros processos; cada um os prepara na primeira composição.
+        estado = self.__dict__.copy()
+        estado['_colocacoes'] = None
+        return estado
+
+    def adesivos_fora(self, largura, altura):
+        """
+        Lista os adesivos que não cabem em um frame do tamanho informado.
+        """
+        return adesivos_fora(self.adesivos, largura, altura)
+
+    def filtrar(self, frame, destino):
+        """
+        Aplica o filtro do fluxo no destino. Depois disso o frame de entrada não é mais lido.
+        """
+        return aplicar_filtro_generico(frame, self.indice_filtro, destino=destino)
+
+    def compor_adesivos(self, destino):
+        """
+        Compõe os adesivos do fluxo sobre o frame já filtrado.
+        """
+        if self._colocacoes is None:
+            self._colocacoes = preparar_colocacoes(self.adesivos)
+        return compor_colocacoes(destino, self._colocacoes)
+
+def resolver_fluxo(texto, nome=None):
+    """
+    Converte "FONTE[;filtro=N][;adesivo=nome:x:y[:escala]]...[;saida=arquivo.mp4]" em um EstadoDoFluxo.
+    Ex.: "0;filtro=8;adesivo=chapeu:10:10:0.5;saida=camera.mp4" ou "sintetico:640x480@30;filtro=Desfoque".
+    """
+    partes = [parte.strip() for parte in texto.split(';')]
+    if not partes[0]:
+        raise ValueError(f"Fluxo sem fonte: {texto}")
+    estado = EstadoDoFluxo(nome or partes[0], partes[0])
+    for parte in partes[1:]:
+        chave, _, valor = parte.partition('=')
+        if chave == 'filtro':
+            estado.indice_filtro = resolver_filtro(valor)
+        elif chave == 'adesivo':
+            estado.adesivos.append(resolver_adesivo(valor))
+        elif chave == 'saida':
+            estado.saida = valor
+        elif chave == 'nome':
+            estado.nome = valor
+        else:
+            raise ValueError(f"Opção de fluxo desconhecida: {parte} (use filtro=, adesivo=, saida= ou nome=)")
+    return estado
+
+def _capturar_fluxo(indice, especificacao, descricao_anel, tempo_real, repetir, limite_quadros, parar, resultados):
+    """
+    Processo de captura: lê os frames da fonte direto nas posições da fila compartilhada. Se o
+    processamento atrasar, fontes em tempo real descartam o frame novo (como uma câmera faria);
+    com o ritmo 'maximo', a captura espera uma posição livre e nenhum frame é perdido.
+    """
+    anel = AnelDeQuadros.conectar(descricao_anel)
+    fonte = None
+    lidos, descartados = 0, 0
+    erro = None
+    try:
+        fonte = abrir_fonte(especificacao, tempo_real, repetir, limite_quadros)
+        descarte = np.empty(anel.forma, np.uint8)
+        while not parar.is_set():
+            posicao = anel.reservar(timeout=0) if tempo_real else anel.reservar(timeout=0.1)
+            if posicao is None and not tempo_real:
+                continue
+            destino = descarte if posicao is None else anel.quadros[posicao]
+            ret, frame = fonte.read(destino)
+            if not ret:
+                break
+            instante = time.perf_counter()
+            if frame is not destino:
+                # A fonte entregou outro buffer (ex.: tamanho diferente do sondado): copia ou redimensiona.
+                if frame.shape == destino.shape:
+                    np.copyto(destino, frame)
+                else:
+                    cv2.resize(frame, (anel.forma[1], anel.forma[0]), dst=destino)
+            lidos += 1
+            if posicao is None:
+                descartados += 1
+            else:
+                anel.publicar(posicao, lidos - 1, instante)
+    except KeyboardInterrupt:
+        pass
+    except Exception as excecao:
+        erro = repr(excecao)
+    finally:
+        # Avisa o fim do fluxo ao trabalhador em qualquer caso (fim da fonte, interrupção ou erro),
+        # sem depender de uma posição livre na fila.
+        anel.encerrar()
+        if fonte is not None:
+            fonte.release()
+        resultados.put((indice, 'captura', {'lidos': lidos, 'descartados': descartados, 'erro_captura': erro}))
+        anel.fechar()
+
+def _processar_fluxo(indice, estado, descricao_anel, parar, resultados):
+    """
+    Thread de um fluxo no processo trabalhador: filtra e compõe cada frame da fila e grava o resultado.
+    A gravação é a mesma do modo webcam: fila e codificação em outra thread e linha do tempo pelos
+    instantes de captura, então frames descartados não encurtam o vídeo.
+    """
+    anel = AnelDeQuadros.conectar(descricao_anel)
+    gravador = None
+    latencias = []
+    processados = 0
+    inicio = None
+    erro = None
+    try:
+        destino = np.empty(anel.forma, np.uint8)
+        if estado.saida:
+            gravador = GravadorDeVideo(estado.saida, (anel.forma[1], anel.forma[0]), fps=estado.fps)
+        while True:
+            posicao = anel.obter(timeout=0.1)
+            if posicao is None:
+                # A captura terminou: sai depois de consumir os frames publicados antes do aviso.
+                if anel.esgotado:
+                    posicao = anel.obter(timeout=0)
+                    if posicao is None:
+                        break
+                elif parar.is_set():
+                    break  # Interrompido e a captura não respondeu (ex.: processo encerrado à força).
+                else:
+                    continue
+            numero, instante = anel.cabecalhos[posicao]
+            if inicio is None:
+                inicio = time.perf_counter()
+            estado.filtrar(anel.quadros[posicao], destino)
+            # O filtro já escreveu no destino: a posição volta para a captura antes dos adesivos e da gravação.
+            anel.liberar(posicao)
+            estado.compor_adesivos(destino)
+            if gravador is not None:
+                gravador.gravar(destino, instante)
+            processados += 1
+            latencias.append(time.perf_counter() - instante)
+    except Exception as excecao:
+        erro = repr(excecao)
+    finally:
+        duracao = time.perf_counter() - inicio if inicio is not None else 0.0
+        anel.fechar()
+        metricas = {'processados': processados, 'duracao': duracao, 'erro': erro}
+        if gravador is not None:
+            gravador.finalizar()
+            metricas['gravacao'] = (gravador.codificados, gravador.fps or 0.0, gravador.duplicados,
+                                    gravador.pulados, gravador.descartados)
+        latencia = np.percentile(latencias, (50, 95)) * 1000 if latencias else (0.0, 0.0)
+        metricas.update(latencia_p50=float(latencia[0]), latencia_p95=float(latencia[1]))
+        resultados.put((indice, 'processamento', metricas))
+
+def _trabalhador_fluxos(tarefas, parar, resultados, argumentos):
+    """
+    Processo trabalhador: uma thread por fluxo atribuído. Como o OpenCV libera o GIL, os fluxos
+    de um mesmo processo avançam em paralelo. 'argumentos' vem de argumentos_trabalhador.
+    """
+    inicializar_trabalhador(*argumentos)
+    threads = [threading.Thread(target=_processar_fluxo, args=(indice, estado, descricao, parar, resultados))
+               for indice, estado, descricao in tarefas]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        parar.set()
+        for thread in threads:
+            thread.join()
+
+def executar_fluxos(estados, processos=None, posicoes=4, tempo_real=True, repetir=False, limite_quadros=None,
+                    threads_opencv=1):
+    """
+    Executa os fluxos até todas as fontes terminarem (ou até Ctrl+C) e imprime as métricas de cada um.
+    Os fluxos são distribuídos em rodízio entre 'processos' trabalhadores. Retorna as métricas por fluxo.
+    """
+    # Sonda cada fonte para saber o tamanho dos frames e dimensionar a fila compartilhada.
+    aneis = []
+    for estado in estados:
+        fonte = abrir_fonte(estado.fonte, tempo_real=tempo_real)
+        ret, frame = fonte.read() if fonte.isOpened() else (False, None)
+        estado.fps = fonte.fps_entrega
+        fonte.release()
+        if not ret:
+            print(f"Erro ao acessar a fonte de frames: {estado.fonte}")
+            for anel in aneis:
+                anel.fechar()
+            return None
+        fora = estado.adesivos_fora(frame.shape[1], frame.shape[0])
+        if fora:
+            print(f"Adesivos que não cabem no fluxo {estado.nome} ({frame.shape[1]}x{frame.shape[0]}): {fora}")
+            for anel in aneis:
+                anel.fechar()
+            return None
+        aneis.append(AnelDeQuadros(frame.shape, posicoes))
+
+    processos = max(1, min(processos or os.cpu_count() or 1, len(estados)))
+    parar = multiprocessing.Event()
+    resultados = multiprocessing.Queue()
+    argumentos = argumentos_trabalhador([estado.indice_filtro for estado in estados], threads_opencv)
+    grupos = [[] for _ in range(processos)]
+    for indice, (estado, anel) in enumerate(zip(estados, aneis)):
+        grupos[indice % processos].append((indice, estado, anel.descricao()))
+    trabalhadores = [multiprocessing.Process(target=_trabalhador_fluxos, daemon=True,
+                                             args=(grupo, parar, resultados, argumentos))
+                     for grupo in grupos]
+    capturas = [multiprocessing.Process(target=_capturar_fluxo, daemon=True,
+                                        args=(indice, estado.fonte, anel.descricao(), tempo_real, repetir,
+                                              limite_quadros, parar, resultados))
+                for indice, (estado, anel) in enumerate(zip(estados, aneis))]
+    print(f"{len(estados)} fluxos em {processos} processos trabalhadores:")
+    for indice, estado in enumerate(estados):
+        print(f"  [{indice}] {estado.nome}: {estado.fonte}, {nomes_filtros[estado.indice_filtro]}, "
+              f"{len(estado.adesivos)} adesivos{', gravando em ' + estado.saida if estado.saida else ''}")
+
+    for processo in trabalhadores + capturas:
+        processo.start()
+    metricas = {indice: {} for indice in range(len(estados))}
+    pendentes = 2 * len(estados)
+    try:
+        while pendentes:
+            try:
+                indice, etapa, dados = resultados.get(timeout=0.5)
+            except queue.Empty:
+                # Um processo encerrado à força não manda suas métricas; sem nenhum vivo, não há o que esperar.
+                if not any(processo.is_alive() for processo in trabalhadores + capturas):
+                    break
+                continue
+            except KeyboardInterrupt:
+                parar.set()
+                continue
+            metricas[indice].update(dados)
+            pendentes -= 1
+    finally:
+        parar.set()
+        for processo in capturas + trabalhadores:
+            processo.join(timeout=5)
+        for anel in aneis:
+            anel.fechar()
+
+    print(f"{'fluxo':<24}{'lidos':>8}{'descart.':>10}{'proc.':>8}{'FPS':>8}{'latência p50':>15}{'p95':>11}")
+    for indice, estado in enumerate(estados):
+        dados = metricas[indice]
+        duracao = dados.get('duracao', 0.0)
+        fps = dados.get('processados', 0) / duracao if duracao > 0 else 0.0
+        print(f"{estado.nome[:23]:<24}{dados.get('lidos', 0):>8}{dados.get('descartados', 0):>10}"
+              f"{dados.get('processados', 0):>8}{fps:>8.1f}{dados.get('latencia_p50', 0.0):>12.1f} ms"
+              f"{dados.get('latencia_p95', 0.0):>8.1f} ms")
+        if dados.get('gravacao'):
+            codificados, fps_video, duplicados, pulados, descartados = dados['gravacao']
+            print(f"  {estado.nome}: {estado.saida} com {codificados} frames a {fps_video:.1f} FPS "
+                  f"({duplicados} repetidos, {pulados} pulados, {descartados} descartados)")
+        for chave in ('erro_captura', 'erro'):
+            if dados.get(chave):
+                print(f"  {estado.nome}: {'captura' if chave == 'erro_captura' else 'processamento'} "
+                      f"interrompido por {dados[chave]}")
+    return metricas
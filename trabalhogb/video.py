@@ -0,0 +1,264 @@
+"""
+Processamento de vídeos sem interface: o vídeo é dividido em blocos de frames consecutivos que processos
+trabalhadores decodificam, filtram, cobrem com os adesivos e codificam em paralelo; no fim, os blocos são
+emendados em ordem em um único arquivo. Um manifesto no diretório de trabalho registra os blocos prontos,
+então uma execução interrompida continua de onde parou.
+"""
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+import filtros
+from filtros import nomes_filtros, compilar_cadeia, aplicar_cadeia, argumentos_trabalhador, inicializar_trabalhador
+from adesivos import adesivos_fora, preparar_colocacoes, compor_colocacoes
+
+NOME_MANIFESTO = 'manifesto.json'
+
+def contar_quadros(caminho):
+    """
+    Retorna (quadros, fps, largura, altura) do vídeo. Se o contêiner não informar o número de frames,
+    eles são contados percorrendo o vídeo sem decodificar as imagens.
+    """
+    captura = cv2.VideoCapture(caminho)
+    if not captura.isOpened():
+        raise ValueError(f"Erro ao abrir o vídeo: {caminho}")
+    quadros = int(captura.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = captura.get(cv2.CAP_PROP_FPS) or 30.0
+    largura = int(captura.get(cv2.CAP_PROP_FRAME_WIDTH))
+    altura = int(captura.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if quadros <= 0:
+        quadros = 0
+        while captura.grab():
+            quadros += 1
+    captura.release()
+    return quadros, fps, largura, altura
+
+def _posicionar(captura, caminho, quadro):
+    """
+    Leva a captura até o frame pedido. Se o decodificador não conseguir buscar com precisão,
+    reabre o vídeo e descarta os frames anteriores.
+    """
+    if quadro == 0:
+        return captura
+    captura.set(cv2.CAP_PROP_POS_FRAMES, quadro)
+    if int(captura.get(cv2.CAP_PROP_POS_FRAMES)) == quadro:
+        return captura
+    captura.release()
+    captura = cv2.VideoCapture(caminho)
+    for _ in range(quadro):
+        if not captura.grab():
+            break
+    return captura
+
+def _processar_bloco_video(tarefa):
+    """
+    Processa os frames [inicio, fim) no processo trabalhador e grava o bloco em 'caminho_parte'
+    (fim None: até o fim do vídeo). O arquivo só recebe o nome final quando o bloco termina, então
+    um bloco interrompido nunca é confundido com um pronto. Retorna (índice, frames, erro).
+    """
+    indice, entrada, caminho_parte, inicio, fim, cadeia, colocacoes, fps, codec = tarefa
+    captura = _posicionar(cv2.VideoCapture(entrada), entrada, inicio)
+    if not captura.isOpened():
+        return indice, 0, "erro ao abrir o vídeo"
+    cadeia_compilada = compilar_cadeia(cadeia)
+    colocacoes = preparar_colocacoes(colocacoes)
+    raiz, extensao = os.path.splitext(caminho_parte)
+    temporario = f"{raiz}.parcial{extensao}"
+    writer = None
+    quadros = 0
+    frame = None
+    while fim is None or inicio + quadros < fim:
+        ret, frame = captura.read(frame)
+        if not ret:
+            break
+        resultado = compor_colocacoes(aplicar_cadeia(frame, cadeia_compilada), colocacoes)
+        if writer is None:
+            writer = cv2.VideoWriter(temporario, cv2.VideoWriter_fourcc(*codec), fps,
+                                     (resultado.shape[1], resultado.shape[0]))
+        writer.write(resultado)
+        quadros += 1
+    captura.release()
+    if writer is None:
+        return indice, 0, None  # Bloco além do fim real do vídeo (contagem do contêiner imprecisa).
+    writer.release()
+    os.replace(temporario, caminho_parte)
+    return indice, quadros, None
+
+def _salvar_manifesto(caminho, manifesto):
+    """
+    Grava o manifesto em um arquivo temporário e o troca pelo atual, para nunca deixá-lo pela metade.
+    """
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=1, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def _emendar_ffmpeg(partes, entrada, saida, diretorio):
+    """
+    Emenda os blocos sem recodificar (demuxer concat do ffmpeg) e copia o áudio do vídeo original, se houver.
+    """
+    lista = os.path.join(diretorio, 'partes.txt')
+    with open(lista, 'w', encoding='utf-8') as arquivo:
+        for parte in partes:
+            arquivo.write("file '{}'\n".format(os.path.abspath(parte).replace("'", "'\\''")))
+    comando = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', lista, '-i', entrada,
+               '-map', '0:v', '-map', '1:a?', '-c', 'copy', '-shortest', saida]
+    resultado = subprocess.run(comando, capture_output=True, text=True)
+    os.remove(lista)
+    if resultado.returncode != 0:
+        print(f"ffmpeg falhou ao emendar os blocos: {resultado.stderr.strip()}")
+        return False
+    return True
+
+def _emendar_opencv(partes, saida, fps, codec):
+    """
+    Emenda os blocos recodificando os frames em sequência (sem ffmpeg; o áudio não é preservado).
+    """
+    writer = None
+    for parte in partes:
+        captura = cv2.VideoCapture(parte)
+        frame = None
+        while True:
+            ret, frame = captura.read(frame)
+            if not ret:
+                break
+            if writer is None:
+                writer = cv2.VideoWriter(saida, cv2.VideoWriter_fourcc(*codec), fps, (frame.shape[1], frame.shape[0]))
+            writer.write(frame)
+        captura.release()
+    if writer is not None:
+        writer.release()
+    return writer is not None
+
+def processar_video(entrada, saida, cadeia, colocacoes=(), processos=None, threads_opencv=1,
+                    quadros_por_bloco=300, diretorio_trabalho=None, codec='mp4v', recomecar=False):
+    """
+    Aplica uma cadeia de filtros (lista de índices) e adesivos fixos [(nome, x, y, escala)] a um vídeo,
+    processando blocos de 'quadros_por_bloco' frames em paralelo. Blocos já prontos de uma execução
+    anterior com os mesmos parâmetros são reaproveitados, a menos que 'recomecar' seja verdadeiro.
+    Retorna True se o vídeo de saída foi gerado.
+    """
+    cadeia = tuple(cadeia)
+    colocacoes = [tuple(colocacao) for colocacao in colocacoes]
+    try:
+        total, fps, largura, altura = contar_quadros(entrada)
+    except ValueError as erro:
+        print(erro)
+        return False
+    if total == 0:
+        print(f"O vídeo não tem frames: {entrada}")
+        return False
+    # Adesivos que não cabem no frame seriam ignorados em silêncio; melhor avisar antes de começar.
+    for nome, x, y in adesivos_fora(colocacoes, largura, altura):
+        print(f"O adesivo {nome} em ({x}, {y}) não cabe no vídeo ({largura}x{altura}).")
+        return False
+
+    diretorio_trabalho = diretorio_trabalho or saida + '.partes'
+    os.makedirs(diretorio_trabalho, exist_ok=True)
+    caminho_manifesto = os.path.join(diretorio_trabalho, NOME_MANIFESTO)
+    estado_entrada = os.stat(entrada)
+    parametros = {
+        'entrada': os.path.abspath(entrada),
+        'tamanho_entrada': estado_entrada.st_size,
+        'modificacao_entrada': estado_entrada.st_mtime,
+        'cadeia': list(cadeia),
+        'adesivos': [list(colocacao) for colocacao in colocacoes],
+        'quadros_por_bloco': quadros_por_bloco,
+        'codec': codec,
+        'motor_suavizacao': filtros.motor_suavizacao,
+        'raio_desfoque': filtros.raio_desfoque,
+    }
+    # Retoma os blocos prontos apenas se o manifesto descrever exatamente o mesmo trabalho.
+    prontos = {}
+    if not recomecar and os.path.exists(caminho_manifesto):
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        if anterior.get('parametros') == parametros:
+            prontos = {int(indice): quadros for indice, quadros in anterior.get('blocos', {}).items()}
+        else:
+            print("Manifesto de outra configuração encontrado; recomeçando do zero.")
+    extensao = os.path.splitext(saida)[1] or '.mp4'
+
+    def caminho_parte(indice):
+        return os.path.join(diretorio_trabalho, f"parte_{indice:05d}{extensao}")
+
+    prontos = {indice: quadros for indice, quadros in prontos.items()
+               if quadros == 0 or os.path.exists(caminho_parte(indice))}
+    manifesto = {'parametros': parametros, 'blocos': {str(indice): quadros for indice, quadros in prontos.items()}}
+    _salvar_manifesto(caminho_manifesto, manifesto)
+
+    # O último bloco vai até o fim real do vídeo, mesmo que a contagem do contêiner esteja errada.
+    blocos = (total + quadros_por_bloco - 1) // quadros_por_bloco
+    tarefas = []
+    for indice in range(blocos):
+        if indice in prontos:
+            continue
+        inicio = indice * quadros_por_bloco
+        fim = None if indice == blocos - 1 else inicio + quadros_por_bloco
+        tarefas.append((indice, entrada, caminho_parte(indice), inicio, fim, cadeia, colocacoes, fps, codec))
+
+    processos = max(1, min(processos or os.cpu_count() or 1, len(tarefas) or 1))
+    nomes_cadeia = " -> ".join(nomes_filtros[indice] for indice in cadeia) or nomes_filtros[0]
+    print(f"{entrada}: {total} frames ({largura}x{altura} a {fps:.2f} FPS) em {blocos} blocos, "
+          f"'{nomes_cadeia}' e {len(colocacoes)} adesivos")
+    if prontos:
+        print(f"Retomando: {len(prontos)} blocos já prontos de uma execução anterior.")
+    argumentos = argumentos_trabalhador(cadeia, threads_opencv)
+
+    inicio_execucao = time.perf_counter()
+    feitos = sum(prontos.values())
+    novos, erros = 0, 0
+    if tarefas:
+        with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_trabalhador,
+                                 initargs=argumentos) as executor:
+            futuros = [executor.submit(_processar_bloco_video, tarefa) for tarefa in tarefas]
+            for futuro in as_completed(futuros):
+                indice, quadros, erro = futuro.result()
+                if erro:
+                    erros += 1
+                    print(f"Bloco {indice}: {erro}")
+                    continue
+                # O manifesto é atualizado a cada bloco pronto: é o ponto de retomada após uma falha.
+                manifesto['blocos'][str(indice)] = quadros
+                _salvar_manifesto(caminho_manifesto, manifesto)
+                novos += quadros
+                feitos += quadros
+                decorrido = time.perf_counter() - inicio_execucao
+                vazao = novos / decorrido if decorrido > 0 else 0.0
+                restante = (total - feitos) / vazao if vazao > 0 else 0.0
+                print(f"[{len(manifesto['blocos']):>{len(str(blocos))}}/{blocos} blocos] {feitos}/{total} frames, "
+                      f"{vazao:.1f} frames/s ({vazao / fps:.1f}x o tempo real), restam ~{restante:.0f} s")
+    if erros:
+        print(f"{erros} blocos falharam; execute de novo para tentar apenas os que faltam.")
+        return False
+
+    # Emenda os blocos na ordem; sem ffmpeg, recodifica com o OpenCV.
+    partes = [caminho_parte(indice) for indice in range(blocos) if manifesto['blocos'].get(str(indice))]
+    inicio_emenda = time.perf_counter()
+    if shutil.which('ffmpeg'):
+        emendado = _emendar_ffmpeg(partes, entrada, saida, diretorio_trabalho)
+    else:
+        print("ffmpeg não encontrado; emendando os blocos com o OpenCV (mais lento e sem áudio).")
+        emendado = _emendar_opencv(partes, saida, fps, codec)
+    if not emendado:
+        print(f"Os blocos continuam em {diretorio_trabalho}.")
+        return False
+
+    # Remove os blocos (inclusive os parciais de execuções interrompidas) e o manifesto;
+    # o diretório só é apagado se não tiver outros arquivos.
+    for nome in os.listdir(diretorio_trabalho):
+        if nome.startswith('parte_'):
+            os.remove(os.path.join(diretorio_trabalho, nome))
+    os.remove(caminho_manifesto)
+    if not os.listdir(diretorio_trabalho):
+        os.rmdir(diretorio_trabalho)
+    duracao = time.perf_counter() - inicio_execucao
+    print(f"Vídeo salvo em {saida}: {novos} frames processados nesta execução em {duracao:.1f} s "
+          f"({novos / duracao / fps if duracao > 0 else 0:.1f}x o tempo real, "
+          f"emenda {time.perf_counter() - inicio_emenda:.1f} s)")
+    return True